@@ -123,4 +123,7 @@ from app.models.user import User, VerificationDocument
 from app.models.wallet import Wallet
 from app.models.transaction import Transaction
 from app.models.user_settings import UserSettings
-from app.models.support_ticket import SupportTicket, TicketResponse  # Add this line
\ No newline at end of file
+from app.models.support_ticket import SupportTicket, TicketResponse  # Add this line
+from app.models.job_lock import JobLock
+from app.models.ohlcv_candle import OHLCVCandle
+from app.models.ledger import LedgerAccount, JournalEntry, LedgerPosting, LedgerSnapshot
@@ -41,6 +41,102 @@ class Config:
     # CoinGecko API settings
     COINGECKO_API_KEY = os.environ.get('COINGECKO_API_KEY', 'CG-xM4oVPrLjBmcUKq7Yv1J821D')
     
+    # Outbound HTTP client settings (pooled sessions for CoinGecko, Binance, SMS/push)
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))  # seconds
+    HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))  # seconds
+    HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 3))  # retries on 429/5xx for idempotent requests
+    HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', 0.5))  # exponential backoff factor
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 20))  # keep-alive connections per host
+    ASYNC_FETCH_CONCURRENCY = int(os.environ.get('ASYNC_FETCH_CONCURRENCY', 8))  # max upstream requests in flight per fan-out
+    
+    # Cache settings ('memory' keeps caches per worker, 'redis' shares them across workers)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'investro')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))  # in-process LRU bound
+    CACHE_LOCK_TIMEOUT = float(os.environ.get('CACHE_LOCK_TIMEOUT', 10))  # seconds one worker may hold a key's load lock
+    MARKET_CACHE_TTL = float(os.environ.get('MARKET_CACHE_TTL', 60))  # market snapshot fetches, overview pages past it, coin details
+    RATES_CACHE_TTL = float(os.environ.get('RATES_CACHE_TTL', 30))  # exchange rates
+    DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', 60))  # home page market fragments
+    PORTFOLIO_CACHE_TTL = float(os.environ.get('PORTFOLIO_CACHE_TTL', 300))  # per-user valuations (also invalidated by balance changes and new price snapshots)
+    
+    # Price oracle settings (shared in-process quote cache)
+    PRICE_ORACLE_REFRESH_INTERVAL = float(os.environ.get('PRICE_ORACLE_REFRESH_INTERVAL', 15))  # seconds between batched refreshes
+    PRICE_ORACLE_MAX_STALENESS = float(os.environ.get('PRICE_ORACLE_MAX_STALENESS', 60))  # quotes older than this are refreshed before use
+    PRICE_ORACLE_BACKGROUND_REFRESH = os.environ.get('PRICE_ORACLE_BACKGROUND_REFRESH', 'True').lower() == 'true'
+    PRICE_ORACLE_PAIRS = [
+        'BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'XRP/USDT', 'SOL/USDT',
+        'ADA/USDT', 'DOGE/USDT', 'DOT/USDT', 'MATIC/USDT', 'AVAX/USDT'
+    ]
+    
+    # Price sources (in preference order) with circuit breakers and hedged requests
+    PRICE_SOURCES = [source for source in os.environ.get('PRICE_SOURCES', 'coingecko,binance').split(',') if source]
+    PRICE_SOURCE_TIMEOUT = float(os.environ.get('PRICE_SOURCE_TIMEOUT', 5))  # seconds a caller waits for any source to answer
+    PRICE_HEDGE_DELAY = float(os.environ.get('PRICE_HEDGE_DELAY', 0.5))  # seconds before hedging while a source has no latency history (then its p95)
+    PRICE_HEDGE_MIN_DELAY = float(os.environ.get('PRICE_HEDGE_MIN_DELAY', 0.05))
+    PRICE_SOURCE_WORKERS = int(os.environ.get('PRICE_SOURCE_WORKERS', 8))  # threads making source requests
+    BREAKER_WINDOW = int(os.environ.get('BREAKER_WINDOW', 50))  # recent calls per source the breaker judges
+    BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', 10))  # calls in the window before the breaker may open
+    BREAKER_ERROR_THRESHOLD = float(os.environ.get('BREAKER_ERROR_THRESHOLD', 0.5))  # share of failed or slow calls that opens it
+    BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('BREAKER_SLOW_CALL_SECONDS', 2))  # calls slower than this count as failures
+    BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 30))  # seconds open before a half-open probe
+
+    # Binance ticker stream settings
+    BINANCE_STREAM_ENABLED = os.environ.get('BINANCE_STREAM_ENABLED', 'False').lower() == 'true'
+    BINANCE_STREAM_URL = os.environ.get('BINANCE_STREAM_URL', 'wss://stream.binance.com:9443/stream?streams=!miniTicker@arr')
+    BINANCE_STREAM_RECORDING = os.environ.get('BINANCE_STREAM_RECORDING')  # replay a recorded stream file instead of connecting
+    
+    # Cross-rate matrix settings
+    RATE_GRAPH_MAX_AGE = float(os.environ.get('RATE_GRAPH_MAX_AGE', 30))  # seconds before the matrix is rebuilt from a new ticker snapshot
+    RATE_GRAPH_RETRY_INTERVAL = float(os.environ.get('RATE_GRAPH_RETRY_INTERVAL', 5))  # minimum seconds between rebuild attempts
+    RATE_GRAPH_HARD_MAX_AGE = float(os.environ.get('RATE_GRAPH_HARD_MAX_AGE', 120))  # past this (e.g. while Binance is down) the matrix quotes nothing and callers use live lookups
+    
+    # Market snapshot settings (one /coins/markets fetch per 250 coins, shared by every market list)
+    MARKET_SNAPSHOT_SIZE = int(os.environ.get('MARKET_SNAPSHOT_SIZE', 1000))  # top coins by market cap held in the snapshot (the market page catalogue)
+    MARKET_SNAPSHOT_INTERVAL = float(os.environ.get('MARKET_SNAPSHOT_INTERVAL', 60))  # seconds before the snapshot is refetched
+    MARKET_SNAPSHOT_RETRY_INTERVAL = float(os.environ.get('MARKET_SNAPSHOT_RETRY_INTERVAL', 10))  # minimum seconds between failed fetch attempts
+    MARKET_SNAPSHOT_BACKGROUND_REFRESH = os.environ.get('MARKET_SNAPSHOT_BACKGROUND_REFRESH', 'True').lower() == 'true'
+    MARKET_CATALOGUE_MAX_PAGE_SIZE = int(os.environ.get('MARKET_CATALOGUE_MAX_PAGE_SIZE', 250))
+    
+    # OHLCV candle store settings
+    CANDLE_BACKFILL_LIMIT = int(os.environ.get('CANDLE_BACKFILL_LIMIT', 1000))  # candles fetched on first use of a symbol/interval (daily candles go back to listing for the 'max' range)
+    CANDLE_SYNC_INTERVAL = float(os.environ.get('CANDLE_SYNC_INTERVAL', 60))  # seconds between tail fetches per symbol/interval
+    CANDLE_MAX_FETCH_PAGES = int(os.environ.get('CANDLE_MAX_FETCH_PAGES', 10))  # Binance kline pages (1000 each) per sync
+    
+    # Memory-mapped price history used by the signal backtester
+    PRICE_HISTORY_DIR = os.environ.get('PRICE_HISTORY_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'price_history'))
+    
+    # Coin icon proxy (content-addressed on-disk cache)
+    ICON_CACHE_DIR = os.environ.get('ICON_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'icons'))
+    ICON_REFRESH_INTERVAL = float(os.environ.get('ICON_REFRESH_INTERVAL', 86400))  # seconds before a coin's upstream icon is checked for changes
+    ICON_MAX_AGE = int(os.environ.get('ICON_MAX_AGE', 3600))  # browser cache lifetime of unversioned icon URLs (versioned ones are immutable)
+    ICON_RESIZE_WORKERS = int(os.environ.get('ICON_RESIZE_WORKERS', 2))  # background threads generating resized variants
+    
+    # Tick-to-candle aggregator settings (runs in the worker)
+    CANDLE_AGGREGATOR_ENABLED = os.environ.get('CANDLE_AGGREGATOR_ENABLED', 'True').lower() == 'true'
+    CANDLE_AGGREGATOR_SYMBOLS = [symbol for symbol in os.environ.get('CANDLE_AGGREGATOR_SYMBOLS', '').split(',') if symbol]  # defaults to PRICE_ORACLE_PAIRS bases
+    CANDLE_RING_SIZE = int(os.environ.get('CANDLE_RING_SIZE', 500))  # closed candles kept in memory per symbol and resolution
+    CANDLE_POLL_INTERVAL = float(os.environ.get('CANDLE_POLL_INTERVAL', 5))  # seconds between ticker snapshots when not streaming
+    CANDLE_FLUSH_INTERVAL = float(os.environ.get('CANDLE_FLUSH_INTERVAL', 30))  # seconds between batched writes of closed candles
+    
+    # Double-entry ledger settings
+    LEDGER_SNAPSHOT_INTERVAL = int(os.environ.get('LEDGER_SNAPSHOT_INTERVAL', 100))  # postings between running-balance snapshots per account
+    WALLET_MUTATION_ATTEMPTS = int(os.environ.get('WALLET_MUTATION_ATTEMPTS', 10))  # tries per wallet mutation on lock conflicts
+    WALLET_RETRY_BACKOFF = float(os.environ.get('WALLET_RETRY_BACKOFF', 0.01))  # seconds before the first retry, doubled per attempt up to 1s
+    
+    # Order matching settings
+    MATCHING_ENGINE_CHUNK_SIZE = int(os.environ.get('MATCHING_ENGINE_CHUNK_SIZE', 500))  # fills committed per transaction
+    
+    # Background worker settings (python -m app.worker), intervals in seconds
+    WORKER_ORDER_TICK_INTERVAL = float(os.environ.get('WORKER_ORDER_TICK_INTERVAL', 5))
+    WORKER_ORDER_SWEEP_INTERVAL = float(os.environ.get('WORKER_ORDER_SWEEP_INTERVAL', 60))
+    WORKER_SIGNAL_RESOLUTION_INTERVAL = float(os.environ.get('WORKER_SIGNAL_RESOLUTION_INTERVAL', 5))
+    WORKER_PRICE_WARM_INTERVAL = float(os.environ.get('WORKER_PRICE_WARM_INTERVAL', 30))
+    WORKER_REFERRAL_RECONCILE_INTERVAL = float(os.environ.get('WORKER_REFERRAL_RECONCILE_INTERVAL', 600))
+    WORKER_LEDGER_RECONCILE_INTERVAL = float(os.environ.get('WORKER_LEDGER_RECONCILE_INTERVAL', 600))
+    WORKER_JITTER = float(os.environ.get('WORKER_JITTER', 0.1))  # fraction of the interval
+    WORKER_LOCK_TTL = float(os.environ.get('WORKER_LOCK_TTL', 300))  # lease length for job locks
+    
     # SMS API settings (placeholder for development)
     SMS_PROVIDER = os.environ.get('SMS_PROVIDER', 'twilio')
     SMS_API_KEY = os.environ.get('SMS_API_KEY')
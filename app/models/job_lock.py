@@ -0,0 +1,17 @@
+# app/models/job_lock.py
+from datetime import datetime
+from app import db
+
+class JobLock(db.Model):
+    """Lease lock so only one worker process runs a scheduled job at a time."""
+    __tablename__ = 'job_lock'
+    
+    name = db.Column(db.String(64), primary_key=True)  # Job name
+    owner = db.Column(db.String(128), nullable=True)  # host:pid of the worker holding the lease
+    expires_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Lease is free after this time
+    last_started_at = db.Column(db.DateTime, nullable=True)
+    last_finished_at = db.Column(db.DateTime, nullable=True)
+    last_duration = db.Column(db.Float, nullable=True)  # Seconds
+    
+    def __repr__(self):
+        return f"JobLock({self.name}, Owner: {self.owner}, Expires: {self.expires_at})"
@@ -0,0 +1,78 @@
+# app/models/ledger.py
+from datetime import datetime
+from app import db
+from app.utils.money import SCALE
+
+# Exact amounts: 20 integer digits, 8 decimals (satoshi precision)
+Amount = db.Numeric(28, SCALE)
+
+class LedgerAccount(db.Model):
+    """One balance in the ledger: a user's spot/funding/futures wallet for a
+    currency, or a system account (external, trading, exchange, ...)."""
+    __tablename__ = 'ledger_account'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), unique=True, nullable=False)  # e.g., 'spot:USDT:42' or 'external:USDT'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # None for system accounts
+    currency = db.Column(db.String(10), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # spot, funding, futures or a system account name
+    balance = db.Column(Amount, nullable=False, default=0)  # Running balance after the last posting
+    posting_count = db.Column(db.BigInteger, nullable=False, default=0)  # Sequence of the last posting
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"LedgerAccount({self.key}, Balance: {self.balance})"
+
+class JournalEntry(db.Model):
+    """A balanced set of postings: amounts sum to zero per currency."""
+    __tablename__ = 'journal_entry'
+
+    id = db.Column(db.Integer, primary_key=True)
+    entry_type = db.Column(db.String(30), nullable=False)  # deposit, withdrawal, transfer, convert, trade, ...
+    reference = db.Column(db.String(64), nullable=True, index=True)  # e.g., 'transaction:<transaction_id>'
+    description = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    postings = db.relationship('LedgerPosting', backref='entry', lazy=True)
+
+    def __repr__(self):
+        return f"JournalEntry({self.id}, {self.entry_type}, {self.reference})"
+
+class LedgerPosting(db.Model):
+    """An append-only change to one account's balance."""
+    __tablename__ = 'ledger_posting'
+
+    id = db.Column(db.Integer, primary_key=True)
+    entry_id = db.Column(db.Integer, db.ForeignKey('journal_entry.id'), nullable=False, index=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('ledger_account.id'), nullable=False)
+    sequence = db.Column(db.BigInteger, nullable=False)  # 1, 2, 3, ... per account
+    amount = db.Column(Amount, nullable=False)  # Positive credits the account, negative debits it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'sequence', name='unique_ledger_posting_sequence'),
+        db.Index('ix_ledger_posting_account_time', 'account_id', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"LedgerPosting(Account: {self.account_id}, #{self.sequence}, Amount: {self.amount})"
+
+class LedgerSnapshot(db.Model):
+    """Running balance of an account after every Nth posting, so balances as
+    of a point in time never replay more than N postings."""
+    __tablename__ = 'ledger_snapshot'
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('ledger_account.id'), nullable=False)
+    sequence = db.Column(db.BigInteger, nullable=False)  # Posting the balance includes
+    balance = db.Column(Amount, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)  # Time of that posting
+
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'sequence', name='unique_ledger_snapshot_sequence'),
+        db.Index('ix_ledger_snapshot_account_time', 'account_id', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"LedgerSnapshot(Account: {self.account_id}, #{self.sequence}, Balance: {self.balance})"
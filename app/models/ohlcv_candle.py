@@ -0,0 +1,29 @@
+# app/models/ohlcv_candle.py
+from datetime import datetime
+from app import db
+
+class OHLCVCandle(db.Model):
+    """One OHLCV candle for a symbol at a given resolution."""
+    __tablename__ = 'ohlcv_candle'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(20), nullable=False)  # e.g., 'BTC'
+    interval = db.Column(db.String(5), nullable=False)  # '1m', '5m', '15m', '1h', '4h', '1d'
+    open_time = db.Column(db.BigInteger, nullable=False)  # Candle start, epoch milliseconds
+    open = db.Column(db.Float, nullable=False)
+    high = db.Column(db.Float, nullable=False)
+    low = db.Column(db.Float, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    volume = db.Column(db.Float, default=0.0)
+    source = db.Column(db.String(20), nullable=True)  # 'binance', 'coingecko', 'ticks'
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # The unique index also serves range queries (symbol, interval, time range)
+    __table_args__ = (db.UniqueConstraint('symbol', 'interval', 'open_time', name='unique_ohlcv_candle'),)
+    
+    def to_list(self):
+        """Candle as [timestamp, open, high, low, close, volume] for chart clients."""
+        return [self.open_time, self.open, self.high, self.low, self.close, self.volume or 0.0]
+    
+    def __repr__(self):
+        return f"OHLCVCandle({self.symbol}, {self.interval}, {self.open_time}, Close: {self.close})"
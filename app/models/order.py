@@ -1,6 +1,7 @@
 # Add this to app/models/order.py
 from datetime import datetime
 from app import db
+from app.utils.money import Money
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -8,9 +9,9 @@ class Order(db.Model):
     currency_pair = db.Column(db.String(20), nullable=False)  # e.g., BTC/USDT
     order_type = db.Column(db.String(20), nullable=False)  # limit, stop, stop-limit
     side = db.Column(db.String(10), nullable=False)  # buy, sell
-    price = db.Column(db.Float, nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    filled_amount = db.Column(db.Float, default=0.0)
+    price = db.Column(Money, nullable=False)
+    amount = db.Column(Money, nullable=False)
+    filled_amount = db.Column(Money, default=0.0)
     status = db.Column(db.String(20), default='open')  # open, filled, canceled
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
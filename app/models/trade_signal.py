@@ -1,6 +1,7 @@
 # app/models/trade_signal.py
 from datetime import datetime
 from app import db
+from app.utils.money import Money
 
 class TradeSignal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -28,12 +29,12 @@ class TradeSignal(db.Model):
 class TradePosition(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    signal_id = db.Column(db.Integer, db.ForeignKey('trade_signal.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    entry_price = db.Column(db.Float, nullable=False)
+    signal_id = db.Column(db.Integer, db.ForeignKey('trade_signal.id'), nullable=False, index=True)
+    amount = db.Column(Money, nullable=False)
+    entry_price = db.Column(Money, nullable=False)
     status = db.Column(db.String(20), default='open')  # open, closed
-    close_price = db.Column(db.Float, nullable=True)
-    profit_loss = db.Column(db.Float, nullable=True)
+    close_price = db.Column(Money, nullable=True)
+    profit_loss = db.Column(Money, nullable=True)
     profit_loss_percentage = db.Column(db.Float, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     closed_at = db.Column(db.DateTime, nullable=True)
@@ -2,6 +2,7 @@
 from datetime import datetime
 import uuid
 from app import db
+from app.utils.money import Money
 
 class Transaction(db.Model):
     __tablename__ = 'transaction'
@@ -13,8 +14,8 @@ class Transaction(db.Model):
     transaction_type = db.Column(db.String(20), nullable=False)  # deposit, withdrawal, transfer, convert, pay
     status = db.Column(db.String(20), nullable=False, default='pending')  # pending, completed, failed, cancelled
     currency = db.Column(db.String(10), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    fee = db.Column(db.Float, default=0.0)
+    amount = db.Column(Money, nullable=False)
+    fee = db.Column(Money, default=0.0)
     from_wallet = db.Column(db.String(20), nullable=True)  # spot, funding, external
     to_wallet = db.Column(db.String(20), nullable=True)  # spot, funding, external
     address = db.Column(db.String(255), nullable=True)  # blockchain address or user ID for internal transfers
@@ -4,6 +4,7 @@ import uuid
 import random
 import string
 from app import db, bcrypt, login_manager
+from app.utils.money import Money
 from flask_login import UserMixin
 
 @login_manager.user_loader
@@ -110,17 +111,15 @@ class User(db.Model, UserMixin):
         """
         from app.models.transaction import Transaction
         
-        deposits = Transaction.query.filter_by(
+        # Summed in SQL over the fixed-point amount column
+        total_amount = db.session.query(db.func.sum(Transaction.amount)).filter_by(
             user_id=self.id,
             transaction_type='deposit',
             status='completed',
             currency='USDT'  # Only count USDT deposits for referral qualification
-        ).all()
+        ).scalar()
         
-        # Sum all deposits
-        total_amount = sum(deposit.amount for deposit in deposits) if deposits else 0
-        
-        return total_amount
+        return total_amount or 0
     
     def __repr__(self):
         return f"User('{self.username}', '{self.email}')"
@@ -174,7 +173,7 @@ class ReferralReward(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     referrer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     referred_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     currency = db.Column(db.String(10), nullable=False)
     status = db.Column(db.String(20), default='completed')  # pending, completed, failed
     transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=True)
@@ -1,6 +1,7 @@
 # app/models/wallet.py
 from datetime import datetime
 from app import db
+from app.utils.money import Money
 
 class Wallet(db.Model):
     __tablename__ = 'wallet'
@@ -8,14 +9,19 @@ class Wallet(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     currency = db.Column(db.String(10), nullable=False)
-    spot_balance = db.Column(db.Float, default=0.0)
-    funding_balance = db.Column(db.Float, default=0.0)
-    futures_balance = db.Column(db.Float, default=0.0)  # Added futures_balance
+    spot_balance = db.Column(Money, default=0.0)
+    funding_balance = db.Column(Money, default=0.0)
+    futures_balance = db.Column(Money, default=0.0)  # Added futures_balance
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)  # Bumped on every balance change
     
     # Each user can have multiple wallet entries, one for each currency
     __table_args__ = (db.UniqueConstraint('user_id', 'currency'),)
     
+    # Optimistic locking: an ORM update of a wallet changed since it was
+    # loaded raises StaleDataError instead of overwriting the other write
+    __mapper_args__ = {'version_id_col': version}
+    
     def __repr__(self):
         return f"Wallet(User ID: {self.user_id}, Currency: {self.currency}, Spot: {self.spot_balance}, Funding: {self.funding_balance}, Futures: {self.futures_balance})"
\ No newline at end of file
@@ -5,13 +5,22 @@ from app import db
 from app.models.user import User, VerificationDocument
 from app.models.wallet import Wallet
 from app.models.transaction import Transaction
-from app.models.trade_signal import TradeSignal, TradePosition
+from app.models.trade_signal import TradeSignal
 from app.models.announcement import Announcement
+from app.services.admin_service import (
+    process_deposit as process_deposit_transaction,
+    process_withdrawal as process_withdrawal_transaction,
+    update_signal_result
+)
 from app.services.market_service import get_current_price
 from datetime import datetime, timedelta
 from functools import wraps
 import logging
 from app.config import Config
+from app.utils.cache import get_cache_stats
+from app.utils.http_client import http_client
+from app.utils.price_oracle import price_oracle
+from app.utils.price_sources import price_router
 from app.models.support_ticket import SupportTicket, TicketResponse
 
 # Add this line after the existing imports
@@ -70,6 +79,21 @@ def dashboard():
                           recent_transactions=recent_transactions,
                           stats={'open_tickets': open_tickets})  # Add this line
 
+@admin.route('/system/upstreams')
+@login_required
+@admin_required
+def upstreams():
+    """
+    Upstream health: price-source circuit breakers and hedging counters,
+    HTTP latency per host, price oracle status and cache hit rates.
+    """
+    return jsonify({
+        'price_sources': price_router.stats(),
+        'price_oracle': price_oracle.stats(),
+        'http': http_client.stats(),
+        'caches': get_cache_stats()
+    })
+
 @admin.route('/users')
 @login_required
 @admin_required
@@ -243,26 +267,13 @@ def process_deposit(tx_id):
     if action not in ['approve', 'reject']:
         return jsonify({'success': False, 'message': 'Invalid action.'})
     
-    # Update transaction status
-    transaction.status = 'completed' if action == 'approve' else 'failed'
-    transaction.admin_notes = admin_notes
-    transaction.updated_at = datetime.utcnow()
-    
-    # If approved, add funds to user's wallet
-    if action == 'approve':
-        wallet = Wallet.query.filter_by(user_id=transaction.user_id, currency=transaction.currency).first()
-        
-        if not wallet:
-            wallet = Wallet(user_id=transaction.user_id, currency=transaction.currency, spot_balance=0)
-            db.session.add(wallet)
-        
-        wallet.spot_balance += transaction.amount
-    
-    db.session.commit()
+    success, message = process_deposit_transaction(tx_id, action, admin_notes)
+    if not success:
+        return jsonify({'success': False, 'message': message})
     
     return jsonify({
         'success': True,
-        'message': f"Deposit {transaction.status}.",
+        'message': message,
         'status': transaction.status
     })
 
@@ -301,24 +312,13 @@ def process_withdrawal(tx_id):
     if action not in ['approve', 'reject']:
         return jsonify({'success': False, 'message': 'Invalid action.'})
     
-    # Update transaction status
-    transaction.status = 'completed' if action == 'approve' else 'failed'
-    transaction.blockchain_txid = blockchain_txid if action == 'approve' else None
-    transaction.admin_notes = admin_notes
-    transaction.updated_at = datetime.utcnow()
-    
-    # If rejected, return funds to user's wallet
-    if action == 'reject':
-        wallet = Wallet.query.filter_by(user_id=transaction.user_id, currency=transaction.currency).first()
-        
-        if wallet:
-            wallet.spot_balance += transaction.amount + transaction.fee
-    
-    db.session.commit()
+    success, message = process_withdrawal_transaction(tx_id, action, blockchain_txid, admin_notes)
+    if not success:
+        return jsonify({'success': False, 'message': message})
     
     return jsonify({
         'success': True,
-        'message': f"Withdrawal {transaction.status}.",
+        'message': message,
         'status': transaction.status
     })
 
@@ -425,38 +425,13 @@ def update_signal(signal_id):
         except (ValueError, TypeError):
             return jsonify({'success': False, 'message': 'Invalid profit percentage.'})
         
-        signal.result = result
-        signal.profit_percentage = profit_percentage
-        signal.is_active = False
-        db.session.commit()
-        
-        # Update all user positions for this signal
-        positions = TradePosition.query.filter_by(signal_id=signal_id, status='open').all()
-        
-        for position in positions:
-            # Calculate profit/loss
-            position_profit = position.amount * (profit_percentage / 100)
-            
-            if result == 'loss':
-                position_profit = -position_profit
-            
-            # Update position
-            position.status = 'closed'
-            position.profit_loss = position_profit
-            position.profit_loss_percentage = profit_percentage if result == 'profit' else -profit_percentage
-            position.closed_at = datetime.utcnow()
-            
-            # Update user's wallet
-            wallet = Wallet.query.filter_by(user_id=position.user_id, currency=signal.currency_pair.split('/')[1]).first()
-            
-            if wallet:
-                wallet.spot_balance += position.amount + position_profit
-        
-        db.session.commit()
+        success, message = update_signal_result(signal_id, result, profit_percentage)
+        if not success:
+            return jsonify({'success': False, 'message': message})
         
         return jsonify({
             'success': True,
-            'message': f'Signal result updated to {result} with {profit_percentage}% {result}.',
+            'message': message,
             'result': signal.result,
             'profit_percentage': signal.profit_percentage
         })
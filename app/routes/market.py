@@ -1,10 +1,12 @@
 # app/routes/market.py
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, send_file
 from flask_login import login_required, current_user
 from app.services.market_service import (
-    get_market_data, get_coin_data, get_chart_data_service,
+    get_market_data, get_market_catalogue_page, get_coin_data, get_chart_data_service, search_coins_service,
     get_top_gainers_service, get_top_losers_service, get_top_volume_service
 )
+from app.services.icon_service import VERSION_LENGTH, get_icon, icon_url, normalize_size
+from app.config import Config
 import logging
 
 # Setup logger
@@ -12,10 +14,39 @@ logger = logging.getLogger(__name__)
 
 market = Blueprint('market', __name__)
 
+# Query parameters that select the paginated catalogue response
+CATALOGUE_PARAMS = ('sort', 'order', 'cursor', 'q', 'min_price', 'max_price', 'min_market_cap', 'min_volume', 'change')
+
 @market.route('/data')
 @login_required
 def market_data():
-    """Get market data for cryptocurrency listings"""
+    """
+    Get market data for cryptocurrency listings.
+    
+    With any of sort, order, cursor or a filter (q, min_price, max_price,
+    min_market_cap, min_volume, change=up|down) the response is a catalogue
+    page: {success, data, next_cursor, total}. Otherwise it is the plain
+    array of the top coins by market cap.
+    """
+    if any(param in request.args for param in CATALOGUE_PARAMS):
+        order = request.args.get('order')
+        try:
+            page = get_market_catalogue_page(
+                sort=request.args.get('sort', 'rank'),
+                descending=None if order not in ('asc', 'desc') else order == 'desc',
+                limit=request.args.get('limit', 100, type=int),
+                cursor=request.args.get('cursor'),
+                query=request.args.get('q'),
+                min_price=request.args.get('min_price', type=float),
+                max_price=request.args.get('max_price', type=float),
+                min_market_cap=request.args.get('min_market_cap', type=float),
+                min_volume=request.args.get('min_volume', type=float),
+                change=request.args.get('change')
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, **page})
+    
     try:
         limit = request.args.get('limit', 100, type=int)
         offset = request.args.get('offset', 0, type=int)
@@ -53,6 +84,12 @@ def coin_data(symbol):
                 'message': f'Coin {symbol} not found'
             }), 404
         
+        # Copy before adjusting; the details dict is shared through the cache
+        data = dict(data)
+        
+        # Icons are served through the local icon proxy
+        data['image'] = icon_url(symbol)
+        
         # Ensure critical fields are present
         if 'symbol' not in data:
             data['symbol'] = symbol
@@ -77,15 +114,18 @@ def coin_data(symbol):
         }), 500
 
 @market.route('/chart/<symbol>')
+@market.route('/chart-data/<symbol>')
 @login_required
 def chart_data(symbol):
     """Get chart data for a specific coin"""
     try:
-        interval = request.args.get('interval', '1d')  # 1d, 7d, 14d, 30d, 90d, 180d, 365d, max
+        interval = request.args.get('interval', '1d')  # 1d, 7d, 14d, 30d, 90d, 180d, 365d, max or 1m, 5m, 15m, 1h, 4h
         limit = request.args.get('limit', 100, type=int)
+        start = request.args.get('start', type=int)  # epoch milliseconds
+        end = request.args.get('end', type=int)
         
-        # Get chart data for a specific coin
-        data = get_chart_data_service(symbol, interval, limit)
+        # Get chart data for a specific coin from the local candle store
+        data = get_chart_data_service(symbol.upper(), interval, limit, start=start, end=end)
         
         # For backward compatibility, return the data directly if it's already in the expected format
         if isinstance(data, list) and len(data) > 0 and isinstance(data[0], list):
@@ -103,6 +143,47 @@ def chart_data(symbol):
             'message': str(e)
         }), 500
 
+@market.route('/icon/<symbol>')
+def icon(symbol):
+    """
+    Serve a coin icon from the local icon cache. Public, so browsers and
+    proxies can cache it; URLs carrying the icon's version are immutable.
+    Coins outside the market snapshot and coin index get a 404.
+    """
+    size = normalize_size(request.args.get('size'))
+    try:
+        result = get_icon(symbol, size)
+    except Exception as e:
+        logger.error(f"Error serving icon for {symbol}: {str(e)}")
+        result = None
+    if result is None:
+        return '', 404
+    
+    path, digest, is_variant = result
+    response = send_file(path, etag=f"{digest[:VERSION_LENGTH]}-{size if is_variant else 'original'}",
+                         conditional=True, max_age=Config.ICON_MAX_AGE)
+    if is_variant and request.args.get('v') == digest[:VERSION_LENGTH]:
+        # Content-addressed: this URL will never serve different bytes
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    elif not is_variant:
+        # The resized variant replaces this shortly
+        response.cache_control.max_age = 60
+    response.cache_control.public = True
+    return response
+
+@market.route('/search')
+@login_required
+def search():
+    """Autocomplete coins by symbol, name or id"""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    
+    return jsonify({
+        'success': True,
+        'data': search_coins_service(query, limit)
+    })
+
 @market.route('/gainers')
 @login_required
 def top_gainers():
@@ -5,8 +5,14 @@ from app import db
 from app.models.trade_signal import TradeSignal, TradePosition
 from app.models.wallet import Wallet
 from app.models.order import Order
-from app.services.market_service import get_current_price_service as get_current_price
-from datetime import datetime
+from app.services.ledger_service import InsufficientFunds
+from app.services.order_book import order_book
+from app.services.order_service import cancel_order as release_order, place_order as create_order
+from app.services.signal_engine import close_position as settle_position, open_position
+from app.services.market_service import (
+    get_current_price_service as get_current_price,
+    get_current_prices_service as get_current_prices
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -81,24 +87,10 @@ def follow_signal():
         # Extract base currency from pair (e.g., BTC from BTC/USDT)
         base_currency = signal.currency_pair.split('/')[1]
         
-        # Check if user has enough balance in the FUTURES wallet
+        # Check that the user has a futures wallet for the quote currency
         wallet = Wallet.query.filter_by(user_id=current_user.id, currency=base_currency).first()
         if not wallet:
             return jsonify({'success': False, 'message': f'No {base_currency} wallet found.'})
-            
-        # Check specifically for futures balance
-        if not hasattr(wallet, 'futures_balance') or wallet.futures_balance is None:
-            return jsonify({'success': False, 'message': f'Futures wallet for {base_currency} not available.'})
-            
-        # Ensure futures_balance is a float
-        futures_balance = float(wallet.futures_balance) if wallet.futures_balance is not None else 0.0
-        
-        # Check if there's enough balance in futures wallet
-        if futures_balance < amount:
-            return jsonify({
-                'success': False, 
-                'message': f'Insufficient {base_currency} balance in futures wallet. Available: {futures_balance}, Required: {amount}'
-            })
         
         # Get current price
         try:
@@ -106,20 +98,16 @@ def follow_signal():
         except Exception as e:
             logger.error(f"Error getting current price: {str(e)}")
             return jsonify({'success': False, 'message': f'Error getting current price: {str(e)}'})
-            
-        # Create position
-        position = TradePosition(
-            user_id=current_user.id,
-            signal_id=signal_id,
-            amount=amount,
-            entry_price=current_price
-        )
-        
-        # Deduct amount from user's FUTURES wallet
-        wallet.futures_balance -= amount
         
-        db.session.add(position)
-        db.session.commit()
+        # Create the position and deduct the stake from the FUTURES wallet;
+        # the balance is checked under the wallet lock
+        try:
+            position = open_position(current_user.id, signal, amount, current_price)
+        except InsufficientFunds:
+            return jsonify({
+                'success': False,
+                'message': f'Insufficient {base_currency} balance in futures wallet. Required: {amount}'
+            })
         
         return jsonify({
             'success': True,
@@ -144,16 +132,26 @@ def positions():
         # Get user's open positions
         open_positions = TradePosition.query.filter_by(user_id=current_user.id, status='open').all()
         
+        # Load all referenced signals in one query
+        signal_ids = {position.signal_id for position in open_positions}
+        signals_by_id = {
+            signal.id: signal
+            for signal in TradeSignal.query.filter(TradeSignal.id.in_(signal_ids)).all()
+        } if signal_ids else {}
+        
+        # Get current prices for all pairs in one batched lookup
+        prices = get_current_prices([signal.currency_pair for signal in signals_by_id.values()])
+        
         positions_data = []
         for position in open_positions:
             # Get signal data, handle case where signal could be deleted
-            signal = TradeSignal.query.get(position.signal_id)
+            signal = signals_by_id.get(position.signal_id)
             if not signal:
                 continue
             
             try:
                 # Get current price
-                current_price = get_current_price(signal.currency_pair)
+                current_price = prices.get(signal.currency_pair, 0)
                 
                 # Calculate profit/loss
                 if signal.signal_type == 'buy':
@@ -238,36 +236,14 @@ def close_position():
             # Get current price
             current_price = get_current_price(signal.currency_pair)
             
-            # Calculate profit/loss
-            if signal.signal_type == 'buy':
-                profit_loss_percentage = ((current_price - position.entry_price) / position.entry_price) * 100 * signal.leverage
-            else:  # signal_type == 'sell'
-                profit_loss_percentage = ((position.entry_price - current_price) / position.entry_price) * 100 * signal.leverage
-            
-            profit_loss = position.amount * (profit_loss_percentage / 100)
-            
-            # Update position
-            position.status = 'closed'
-            position.close_price = current_price
-            position.profit_loss = profit_loss
-            position.profit_loss_percentage = profit_loss_percentage
-            position.closed_at = datetime.utcnow()
-            
-            # Return amount + profit to user's FUTURES wallet (or deduct loss)
-            wallet = Wallet.query.filter_by(user_id=current_user.id, currency=base_currency).first()
+            # Close the position and return amount plus profit (or minus loss,
+            # at most the whole stake) to the user's FUTURES wallet
+            position = settle_position(position_id, current_user.id, signal, current_price)
+            if position is None:
+                return jsonify({'success': False, 'message': 'Position not found or already closed.'})
             
-            if not wallet:
-                wallet = Wallet(user_id=current_user.id, currency=base_currency, futures_balance=0)
-                db.session.add(wallet)
-            
-            # Ensure futures_balance exists and is a float
-            if not hasattr(wallet, 'futures_balance') or wallet.futures_balance is None:
-                wallet.futures_balance = 0.0
-            
-            # Return original amount plus profit (or minus loss) to futures wallet
-            wallet.futures_balance += position.amount + profit_loss
-            
-            db.session.commit()
+            profit_loss = position.profit_loss
+            profit_loss_percentage = position.profit_loss_percentage
             
             return jsonify({
                 'success': True,
@@ -392,11 +368,14 @@ def orders():
         # Get orders for current page
         open_orders = pagination.items
         
+        # Get current market prices for all pairs on this page in one batched lookup
+        prices = get_current_prices([order.currency_pair for order in open_orders])
+        
         orders_data = []
         for order in open_orders:
             try:
                 # Get current market price for this pair
-                current_price = get_current_price(order.currency_pair)
+                current_price = prices.get(order.currency_pair, 0)
                 
                 # Calculate fill proximity only if we have valid prices
                 if current_price > 0 and order.price > 0:
@@ -500,61 +479,19 @@ def place_order():
                 'message': 'Invalid side'
             }), 400
         
-        # Check if user has enough balance (for buy orders)
-        if side == 'buy':
-            # Extract the quote currency (e.g., USDT from BTC/USDT)
-            quote_currency = currency_pair.split('/')[1]
-            
-            # Total cost = price * amount
-            total_cost = price * amount
-            
-            # Check user's wallet balance
-            wallet = Wallet.query.filter_by(
-                user_id=current_user.id,
-                currency=quote_currency
-            ).first()
-            
-            if not wallet or wallet.spot_balance < total_cost:
-                return jsonify({
-                    'success': False,
-                    'message': f'Insufficient {quote_currency} balance'
-                }), 400
-            
-            # Reserve the funds by subtracting from available balance
-            wallet.spot_balance -= total_cost
-        
-        # For sell orders, check if user has the base currency
-        if side == 'sell':
-            # Extract the base currency (e.g., BTC from BTC/USDT)
-            base_currency = currency_pair.split('/')[0]
-            
-            # Check user's wallet balance
-            wallet = Wallet.query.filter_by(
-                user_id=current_user.id,
-                currency=base_currency
-            ).first()
-            
-            if not wallet or wallet.spot_balance < amount:
-                return jsonify({
-                    'success': False,
-                    'message': f'Insufficient {base_currency} balance'
-                }), 400
-            
-            # Reserve the funds by subtracting from available balance
-            wallet.spot_balance -= amount
-        
-        # Create the order
-        order = Order(
-            user_id=current_user.id,
-            currency_pair=currency_pair,
-            order_type=order_type,
-            side=side,
-            price=price,
-            amount=amount
-        )
+        # Create the order and reserve its funds (quote currency for buys,
+        # base currency for sells) under the wallet lock
+        try:
+            order = create_order(current_user.id, currency_pair, order_type, side, price, amount)
+        except InsufficientFunds:
+            currency = currency_pair.split('/')[1] if side == 'buy' else currency_pair.split('/')[0]
+            return jsonify({
+                'success': False,
+                'message': f'Insufficient {currency} balance'
+            }), 400
         
-        db.session.add(order)
-        db.session.commit()
+        # Keep the in-memory order book in sync
+        order_book.add_order(order)
         
         return jsonify({
             'success': True,
@@ -604,12 +541,8 @@ def cancel_order():
                 'message': 'Invalid order ID'
             }), 400
         
-        # Find the order
-        order = Order.query.filter_by(
-            id=order_id,
-            user_id=current_user.id,
-            status='open'
-        ).first()
+        # Cancel the order and return its reserved funds to the user's wallet
+        order = release_order(order_id, current_user.id)
         
         if not order:
             return jsonify({
@@ -617,38 +550,8 @@ def cancel_order():
                 'message': 'Order not found or already filled/canceled'
             }), 404
         
-        # Update order status
-        order.status = 'canceled'
-        order.updated_at = datetime.utcnow()
-        
-        # Return reserved funds to user's wallet
-        if order.side == 'buy':
-            # For buy orders, return the quote currency (e.g., USDT)
-            quote_currency = order.currency_pair.split('/')[1]
-            total_cost = order.price * (order.amount - order.filled_amount)
-            
-            wallet = Wallet.query.filter_by(
-                user_id=current_user.id,
-                currency=quote_currency
-            ).first()
-            
-            if wallet:
-                wallet.spot_balance += total_cost
-        
-        elif order.side == 'sell':
-            # For sell orders, return the base currency (e.g., BTC)
-            base_currency = order.currency_pair.split('/')[0]
-            remaining_amount = order.amount - order.filled_amount
-            
-            wallet = Wallet.query.filter_by(
-                user_id=current_user.id,
-                currency=base_currency
-            ).first()
-            
-            if wallet:
-                wallet.spot_balance += remaining_amount
-        
-        db.session.commit()
+        # Keep the in-memory order book in sync
+        order_book.remove_order(order.id, order.currency_pair)
         
         return jsonify({
             'success': True,
@@ -7,9 +7,11 @@ from app.models.wallet import Wallet
 from app.models.announcement import Announcement
 from app.services.market_service import (
     get_market_data, 
-    get_popular_coins_service as get_popular_coins, 
-    get_new_listings_service as get_new_listings
+    get_market_catalogue_page,
+    get_home_market_fragments
 )
+from app.services.portfolio_service import get_price_snapshot
+from markupsafe import Markup
 import os
 from werkzeug.utils import secure_filename
 from app.config import Config
@@ -55,18 +57,8 @@ def home():
             (Announcement.expiry_date.is_(None) | (Announcement.expiry_date >= datetime.utcnow()))
         ).order_by(Announcement.priority.desc(), Announcement.created_at.desc()).all()
         
-        # Get popular coins and new listings
-        try:
-            popular_coins = get_popular_coins()
-        except Exception as e:
-            logger.error(f"Error getting popular coins: {str(e)}")
-            popular_coins = []
-            
-        try:
-            new_listings = get_new_listings()
-        except Exception as e:
-            logger.error(f"Error getting new listings: {str(e)}")
-            new_listings = []
+        # Popular coins and new listings, rendered once and shared across users
+        market_fragments = get_home_market_fragments()
         
         # Get user's wallets
         wallets = Wallet.query.filter_by(user_id=current_user.id).all()
@@ -74,8 +66,8 @@ def home():
         return render_template('user/home.html', 
                               title='Home', 
                               announcements=announcements,
-                              popular_coins=popular_coins,
-                              new_listings=new_listings,
+                              popular_coins_html=Markup(market_fragments['popular_coins']),
+                              new_listings_html=Markup(market_fragments['new_listings']),
                               wallets=wallets)
     except Exception as e:
         logger.error(f"Error loading home page: {str(e)}")
@@ -92,12 +84,13 @@ def market():
     Market overview page
     """
     try:
-        # Get market data
-        market_data = get_market_data()
+        # First catalogue page; the page loads further pages by cursor
+        catalogue = get_market_catalogue_page()
         
         return render_template('user/market.html', 
                               title='Market', 
-                              market_data=market_data)
+                              market_data=catalogue['data'],
+                              next_cursor=catalogue['next_cursor'])
     except Exception as e:
         logger.error(f"Error loading market page: {str(e)}")
         flash("Error loading market data. Please try again later.", "danger")
@@ -155,35 +148,11 @@ def assets():
         # Get user's wallets for display
         spot_wallets = Wallet.query.filter_by(user_id=current_user.id).all()
         
-        # Get real-time rates for all currencies in the portfolio
-        rates = {}
-        
-        # Include all currencies from the spot wallet
-        for wallet in spot_wallets:
-            currency = wallet.currency
-            
-            if currency == 'USDT':
-                rates[currency] = 1.0  # USDT is our base currency
-                continue
-                
-            # Try to get the rate from our portfolio calculation
-            try:
-                # Calculate rate from balances and values
-                spot_balance = portfolio['spot'].get(currency, {}).get('balance', 0)
-                spot_value = portfolio['spot'].get(currency, {}).get('value_usdt', 0)
-                
-                if spot_balance and spot_balance > 0:
-                    # Calculate the implied rate
-                    rates[currency] = spot_value / spot_balance
-                else:
-                    # Try to get rate directly from the API
-                    from app.services.wallet_service import get_conversion_rate
-                    rate = get_conversion_rate(currency, 'USDT')
-                    rates[currency] = rate
-            except Exception as e:
-                logger.warning(f"Could not calculate rate for {currency}: {str(e)}")
-                # Use a default fallback rate
-                rates[currency] = 0.0
+        # USDT rates from the same price snapshot the portfolio was valued at
+        rates = dict(portfolio.get('rates', {}))
+        missing_currencies = [wallet.currency for wallet in spot_wallets if wallet.currency not in rates]
+        if missing_currencies:
+            rates.update(zip(missing_currencies, get_price_snapshot().get_rates(missing_currencies).tolist()))
         
         # Safe formatting function
         def safe_format(amount, precision=2):
@@ -221,57 +190,13 @@ def get_portfolio_data():
         from app.services.wallet_service import get_user_portfolio
         portfolio = get_user_portfolio(current_user.id)
         
-        # Extract all currencies from the portfolio
+        # Rates and market info come from the shared price snapshot
         all_currencies = set()
         for wallet_type in ['spot', 'funding', 'futures']:
             all_currencies.update(portfolio[wallet_type].keys())
         
-        # Get rates for all currencies
-        rates = {}
-        for currency in all_currencies:
-            # For USDT, rate is 1:1
-            if currency == 'USDT':
-                rates[currency] = 1.0
-                continue
-                
-            # For other currencies, try to get from our wallet service
-            try:
-                from app.services.wallet_service import get_conversion_rate
-                rate = get_conversion_rate(currency, 'USDT')
-                rates[currency] = rate if rate > 0 else None
-            except Exception as e:
-                logger.warning(f"Could not get rate for {currency}: {str(e)}")
-                rates[currency] = None
-        
-        # Include any missing rates
-        for currency in all_currencies:
-            if currency not in rates or rates[currency] is None:
-                # Try to infer the rate from the portfolio values
-                for wallet_type in ['spot', 'funding', 'futures']:
-                    if currency in portfolio[wallet_type]:
-                        balance = portfolio[wallet_type][currency].get('balance', 0)
-                        value = portfolio[wallet_type][currency].get('value_usdt', 0)
-                        
-                        if balance and balance > 0:
-                            rates[currency] = value / balance
-                            break
-        
-        # Get additional market info if needed
-        market_info = {}
-        for currency in all_currencies:
-            try:
-                if currency != 'USDT':
-                    from app.utils.crypto_api import get_coin_details
-                    coin_data = get_coin_details(currency)
-                    
-                    if coin_data:
-                        market_info[currency] = {
-                            'name': coin_data.get('name', currency),
-                            'image': coin_data.get('image', ''),
-                            'price_change_percentage_24h': coin_data.get('price_change_percentage_24h', 0)
-                        }
-            except Exception as e:
-                logger.warning(f"Could not get market info for {currency}: {str(e)}")
+        rates = {currency: rate if rate > 0 else None for currency, rate in portfolio.get('rates', {}).items()}
+        market_info = get_price_snapshot().get_market_info(all_currencies)
         
         return jsonify({
             'success': True,
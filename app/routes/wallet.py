@@ -5,7 +5,9 @@ from app import db
 from app.models.user import User
 from app.models.wallet import Wallet
 from app.models.transaction import Transaction
-from app.services.wallet_service import generate_blockchain_address, validate_address
+from app.services.wallet_service import (
+    generate_blockchain_address, validate_address, request_withdrawal, transfer_between_wallets, pay_user
+)
 from app.utils.crypto_api import get_exchange_rates, get_current_price
 import decimal
 import logging
@@ -189,41 +191,10 @@ def withdraw():
                 flash('Invalid withdrawal address.', 'danger')
                 return redirect(url_for('wallet.withdraw', currency=currency, chain=chain))
             
-            # Check if user has enough balance
-            user_wallet = Wallet.query.filter_by(user_id=current_user.id, currency=currency).first()
-            if not user_wallet or user_wallet.spot_balance < amount:
-                flash('Insufficient balance.', 'danger')
-                return redirect(url_for('wallet.withdraw', currency=currency, chain=chain))
-            
-            # Calculate fee (7% of withdrawal amount)
-            fee = amount * 0.07
-            total_deduction = amount + fee
-            
-            if user_wallet.spot_balance < total_deduction:
-                flash(f'Insufficient balance to cover withdrawal amount plus fee ({fee} {currency}).', 'danger')
-                return redirect(url_for('wallet.withdraw', currency=currency, chain=chain))
-            
-            # Create withdrawal transaction
-            transaction = Transaction(
-                user_id=current_user.id,
-                transaction_type='withdrawal',
-                status='pending',
-                currency=currency,
-                amount=amount,
-                fee=fee,
-                from_wallet='spot',
-                to_wallet='external',
-                address=address,
-                chain=chain
-            )
-            
-            # Deduct balance from user's wallet
-            user_wallet.spot_balance -= total_deduction
-            
-            db.session.add(transaction)
-            db.session.commit()
+            # Reserve amount plus fee under the wallet lock
+            success, message, transaction = request_withdrawal(current_user.id, currency, amount, address, chain)
             
-            flash('Withdrawal request submitted successfully!', 'success')
+            flash(message, 'success' if success else 'danger')
             return redirect(url_for('wallet.withdraw', currency=currency, chain=chain))
         
         # Get recent withdrawals
@@ -388,59 +359,20 @@ def transfer():
                 flash('Cannot transfer to the same wallet.', 'danger')
                 return redirect(url_for('wallet.transfer', currency=currency))
             
+            if from_wallet not in ('spot', 'funding', 'futures') or to_wallet not in ('spot', 'funding', 'futures'):
+                flash('Invalid wallet type.', 'danger')
+                return redirect(url_for('wallet.transfer', currency=currency))
+            
             # Get user's wallet
             user_wallet = Wallet.query.filter_by(user_id=current_user.id, currency=currency).first()
             if not user_wallet:
                 flash('Wallet not found.', 'danger')
                 return redirect(url_for('wallet.transfer', currency=currency))
             
-            # Check if user has enough balance in the source wallet
-            if from_wallet == 'spot' and user_wallet.spot_balance < amount:
-                flash('Insufficient spot balance.', 'danger')
-                return redirect(url_for('wallet.transfer', currency=currency))
-            elif from_wallet == 'funding' and user_wallet.funding_balance < amount:
-                flash('Insufficient funding balance.', 'danger')
-                return redirect(url_for('wallet.transfer', currency=currency))
-            elif from_wallet == 'futures' and user_wallet.futures_balance < amount:
-                flash('Insufficient futures balance.', 'danger')
-                return redirect(url_for('wallet.transfer', currency=currency))
-            
-            # Perform transfer based on source and destination
-            if from_wallet == 'spot':
-                user_wallet.spot_balance -= amount
-                if to_wallet == 'funding':
-                    user_wallet.funding_balance += amount
-                else:  # to_wallet == 'futures'
-                    user_wallet.futures_balance += amount
-            elif from_wallet == 'funding':
-                user_wallet.funding_balance -= amount
-                if to_wallet == 'spot':
-                    user_wallet.spot_balance += amount
-                else:  # to_wallet == 'futures'
-                    user_wallet.futures_balance += amount
-            else:  # from_wallet == 'futures'
-                user_wallet.futures_balance -= amount
-                if to_wallet == 'spot':
-                    user_wallet.spot_balance += amount
-                else:  # to_wallet == 'funding'
-                    user_wallet.funding_balance += amount
-            
-            # Create transfer transaction
-            transaction = Transaction(
-                user_id=current_user.id,
-                transaction_type='transfer',
-                status='completed',
-                currency=currency,
-                amount=amount,
-                fee=0,
-                from_wallet=from_wallet,
-                to_wallet=to_wallet
-            )
-            
-            db.session.add(transaction)
-            db.session.commit()
+            # Move the funds; the balance is checked under the wallet lock
+            success, message = transfer_between_wallets(current_user.id, currency, amount, from_wallet, to_wallet)
             
-            flash(f'Successfully transferred {amount} {currency} from {from_wallet} to {to_wallet}!', 'success')
+            flash(message, 'success' if success else 'danger')
             return redirect(url_for('wallet.transfer', currency=currency))
         
         # Get recent transfers
@@ -506,55 +438,10 @@ def pay():
                 flash('Cannot pay yourself.', 'danger')
                 return redirect(url_for('wallet.pay', currency=currency))
             
-            # Check if user has enough balance
-            sender_wallet = Wallet.query.filter_by(user_id=current_user.id, currency=currency).first()
-            if not sender_wallet or sender_wallet.spot_balance < amount:
-                flash('Insufficient balance.', 'danger')
-                return redirect(url_for('wallet.pay', currency=currency))
-            
-            # Get or create recipient's wallet
-            recipient_wallet = Wallet.query.filter_by(user_id=recipient.id, currency=currency).first()
-            if not recipient_wallet:
-                recipient_wallet = Wallet(user_id=recipient.id, currency=currency, spot_balance=0)
-                db.session.add(recipient_wallet)
-            
-            # Perform transfer
-            sender_wallet.spot_balance -= amount
-            recipient_wallet.spot_balance += amount
-            
-            # Create payment transaction for sender
-            sender_transaction = Transaction(
-                user_id=current_user.id,
-                transaction_type='pay',
-                status='completed',
-                currency=currency,
-                amount=-amount,  # Negative amount for sender
-                fee=0,
-                from_wallet='spot',
-                to_wallet='external',
-                address=recipient.unique_id,
-                notes=f"Payment to {recipient.username} ({recipient.unique_id})"
-            )
-            
-            # Create payment transaction for recipient
-            recipient_transaction = Transaction(
-                user_id=recipient.id,
-                transaction_type='pay',
-                status='completed',
-                currency=currency,
-                amount=amount,
-                fee=0,
-                from_wallet='external',
-                to_wallet='spot',
-                address=current_user.unique_id,
-                notes=f"Payment from {current_user.username} ({current_user.unique_id})"
-            )
-            
-            db.session.add(sender_transaction)
-            db.session.add(recipient_transaction)
-            db.session.commit()
+            # Pay from the sender's spot wallet; both wallets are locked in order
+            success, message = pay_user(current_user, recipient, currency, amount)
             
-            flash(f'Successfully paid {amount} {currency} to {recipient.username}!', 'success')
+            flash(message, 'success' if success else 'danger')
             return redirect(url_for('wallet.pay', currency=currency))
         
         # Get recent payments
@@ -12,6 +12,7 @@ from app.models.wallet import Wallet
 from app.models.transaction import Transaction
 from app.models.trade_signal import TradeSignal, TradePosition
 from app.models.announcement import Announcement
+from app.services.ledger_service import EXTERNAL, post_entry, system_account, to_amount, user_account
 from app.services.notification_service import (
     send_verification_notification, send_transaction_notification,
     send_signal_notification
@@ -205,13 +206,10 @@ def process_deposit(transaction_id, action, admin_notes=None):
         
         # If approved, add funds to user's wallet
         if action == 'approve':
-            wallet = Wallet.query.filter_by(user_id=transaction.user_id, currency=transaction.currency).first()
-            
-            if not wallet:
-                wallet = Wallet(user_id=transaction.user_id, currency=transaction.currency, spot_balance=0)
-                db.session.add(wallet)
-            
-            wallet.spot_balance += transaction.amount
+            post_entry('deposit', [
+                (user_account(transaction.user_id, transaction.currency), transaction.amount),
+                (system_account(EXTERNAL, transaction.currency), -to_amount(transaction.amount))
+            ], reference=f"transaction:{transaction.transaction_id}")
             
             # Log the wallet update
             logger.info(f"Updated user {transaction.user_id} wallet balance: +{transaction.amount} {transaction.currency}")
@@ -270,10 +268,11 @@ def process_withdrawal(transaction_id, action, blockchain_txid=None, admin_notes
         
         # If rejected, return funds to user's wallet
         if action == 'reject':
-            wallet = Wallet.query.filter_by(user_id=transaction.user_id, currency=transaction.currency).first()
-            
-            if wallet:
-                wallet.spot_balance += transaction.amount + transaction.fee
+            refund = to_amount(transaction.amount) + to_amount(transaction.fee)
+            post_entry('withdrawal_reversal', [
+                (user_account(transaction.user_id, transaction.currency), refund),
+                (system_account(EXTERNAL, transaction.currency), -refund)
+            ], reference=f"transaction:{transaction.transaction_id}")
         
         db.session.commit()
         
@@ -400,7 +399,7 @@ def deactivate_signal(signal_id):
 def update_signal_result(signal_id, result, profit_percentage):
     """
     Update the result of a trade signal and close all related positions.
-    Returns funds to futures wallets.
+    Returns funds to futures wallets in one set-based settlement.
     
     Args:
         signal_id: Signal ID
@@ -410,45 +409,26 @@ def update_signal_result(signal_id, result, profit_percentage):
     Returns:
         Tuple of (success, message)
     """
+    from app.services.signal_engine import settle_positions
+    
     try:
         signal = TradeSignal.query.get(signal_id)
         if not signal:
             return False, "Signal not found."
         
+        profit_percentage = float(profit_percentage)
+        
         signal.result = result
-        signal.profit_percentage = float(profit_percentage)
+        signal.profit_percentage = profit_percentage
         signal.is_active = False
-        db.session.commit()
-        
-        # Update all user positions for this signal
-        positions = TradePosition.query.filter_by(signal_id=signal_id, status='open').all()
-        
-        for position in positions:
-            # Calculate profit/loss
-            position_profit = position.amount * (profit_percentage / 100)
-            
-            if result == 'loss':
-                position_profit = -position_profit
-            
-            # Update position
-            position.status = 'closed'
-            position.profit_loss = position_profit
-            position.profit_loss_percentage = profit_percentage if result == 'profit' else -profit_percentage
-            position.closed_at = datetime.utcnow()
-            
-            # Update user's FUTURES wallet (not spot wallet)
-            wallet = Wallet.query.filter_by(user_id=position.user_id, currency=signal.currency_pair.split('/')[1]).first()
-            
-            if wallet:
-                # Ensure futures_balance exists and is a float
-                if not hasattr(wallet, 'futures_balance') or wallet.futures_balance is None:
-                    wallet.futures_balance = 0.0
-                    
-                # Return original amount plus profit (or minus loss) to futures wallet
-                wallet.futures_balance += position.amount + position_profit
         
+        # Same percentage for every position, signed by the result; a loss
+        # can't take back more than the stake
+        percentage = profit_percentage if result == 'profit' else max(-profit_percentage, -100.0)
+        settled = settle_positions(signal, percentage)
         db.session.commit()
         
+        logger.info(f"Signal {signal_id} result set to {result} {profit_percentage}%, {settled} positions settled")
         return True, f"Signal result updated to {result} with {profit_percentage}% {result}."
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,243 @@
+# app/services/backtest_service.py
+"""
+Signal backtester.
+Scores trade signals against the memory-mapped price history: for each
+signal it finds whether the target or the stop was hit first inside the
+signal's lifetime (or neither, i.e. expired) and how long that took. Window
+bounds for all signals of a symbol are found with one vectorized search and
+each window is scanned in growing chunks, so quickly resolved signals only
+touch a few rows.
+"""
+import logging
+import time
+from datetime import timezone
+import numpy as np
+from app.utils.price_history import PriceHistoryStore
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_TARGET = 'target'
+OUTCOME_STOP = 'stop'
+OUTCOME_EXPIRED = 'expired'
+OUTCOME_NO_DATA = 'no_data'
+
+# Rows scanned per step start small and double up to the maximum
+FIRST_CHUNK = 256
+MAX_CHUNK = 65536
+
+def _to_millis(value):
+    if value is None:
+        return None
+    if hasattr(value, 'timestamp'):
+        # Naive datetimes in this app are UTC
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+def _signal_fields(signal):
+    get = signal.get if isinstance(signal, dict) else lambda name: getattr(signal, name, None)
+    return {
+        'id': get('id'),
+        'currency_pair': get('currency_pair'),
+        'signal_type': get('signal_type'),
+        'entry_price': float(get('entry_price') or 0),
+        'target_price': float(get('target_price') or 0),
+        'stop_loss': float(get('stop_loss') or 0),
+        'leverage': int(get('leverage') or 1),
+        'start': _to_millis(get('created_at')),
+        'end': _to_millis(get('expiry_time'))
+    }
+
+def first_crossings(high, low, first, last, is_buy, target, stop):
+    """
+    Find the first rows in [first, last) where the target and the stop are hit.
+
+    Returns:
+        Tuple of (target_index, stop_index); None where not hit before the
+        other one (or at all)
+    """
+    chunk = FIRST_CHUNK
+    position = first
+    while position < last:
+        end = min(last, position + chunk)
+        highs = high[position:end]
+        lows = low[position:end]
+
+        if is_buy:
+            target_mask = highs >= target
+            stop_mask = lows <= stop
+        else:
+            target_mask = lows <= target
+            stop_mask = highs >= stop
+
+        target_hit = target_mask.any()
+        stop_hit = stop_mask.any()
+        if target_hit or stop_hit:
+            target_index = position + int(np.argmax(target_mask)) if target_hit else None
+            stop_index = position + int(np.argmax(stop_mask)) if stop_hit else None
+            return target_index, stop_index
+
+        position = end
+        chunk = min(chunk * 2, MAX_CHUNK)
+    return None, None
+
+def _return_percentage(is_buy, entry_price, exit_price, leverage):
+    if not entry_price or exit_price is None:
+        return None
+    change = (exit_price - entry_price) / entry_price * 100
+    return (change if is_buy else -change) * leverage
+
+def backtest_symbol(history, signals):
+    """
+    Score the signals of one symbol against its price history.
+
+    Args:
+        history: PriceHistory for the symbol
+        signals: List of signal field dictionaries (see _signal_fields)
+
+    Returns:
+        List of result dictionaries
+    """
+    columns = history.columns
+    timestamps = columns['timestamp']
+    high = columns['high']
+    low = columns['low']
+    close = columns['close']
+
+    starts = np.array([signal['start'] for signal in signals], dtype=np.int64)
+    ends = np.array([signal['end'] for signal in signals], dtype=np.int64)
+    firsts = np.searchsorted(timestamps, starts, side='left')
+    lasts = np.searchsorted(timestamps, ends, side='right')
+
+    results = []
+    for signal, first, last in zip(signals, firsts.tolist(), lasts.tolist()):
+        is_buy = signal['signal_type'] == 'buy'
+        result = {
+            'signal_id': signal['id'],
+            'currency_pair': signal['currency_pair'],
+            'outcome': OUTCOME_NO_DATA,
+            'ambiguous': False,
+            'exit_price': None,
+            'time_to_outcome': None,
+            'return_percentage': None
+        }
+
+        if first >= last:
+            results.append(result)
+            continue
+
+        target_index, stop_index = first_crossings(
+            high, low, first, last, is_buy, signal['target_price'], signal['stop_loss']
+        )
+
+        if target_index is not None and (stop_index is None or target_index < stop_index):
+            outcome, index, exit_price = OUTCOME_TARGET, target_index, signal['target_price']
+        elif stop_index is not None:
+            # Target and stop inside the same bar: assume the worse outcome
+            result['ambiguous'] = stop_index == target_index
+            outcome, index, exit_price = OUTCOME_STOP, stop_index, signal['stop_loss']
+        else:
+            outcome, index, exit_price = OUTCOME_EXPIRED, last - 1, float(close[last - 1])
+
+        result['outcome'] = outcome
+        result['exit_price'] = exit_price
+        if outcome == OUTCOME_EXPIRED:
+            result['time_to_outcome'] = (signal['end'] - signal['start']) / 1000.0
+        else:
+            result['time_to_outcome'] = max(0.0, (int(timestamps[index]) - signal['start']) / 1000.0)
+        result['return_percentage'] = _return_percentage(
+            is_buy, signal['entry_price'], exit_price, signal['leverage']
+        )
+        results.append(result)
+
+    return results
+
+def backtest_signals(signals, store=None):
+    """
+    Score signals against the price history.
+
+    Args:
+        signals: Iterable of TradeSignal objects or dictionaries with the same fields
+        store: Optional PriceHistoryStore
+
+    Returns:
+        Dictionary with 'results' (one per signal) and 'summary'
+    """
+    store = store or PriceHistoryStore()
+    started = time.perf_counter()
+
+    by_symbol = {}
+    skipped = []
+    for signal in signals:
+        fields = _signal_fields(signal)
+        if fields['start'] is None or fields['end'] is None or not fields['currency_pair']:
+            skipped.append(fields['id'])
+            continue
+        symbol = fields['currency_pair'].split('/')[0].upper()
+        by_symbol.setdefault(symbol, []).append(fields)
+
+    results = []
+    for symbol, symbol_signals in by_symbol.items():
+        history = store.open(symbol)
+        if not len(history):
+            logger.warning(f"No price history for {symbol}; {len(symbol_signals)} signals not scored")
+        results.extend(backtest_symbol(history, symbol_signals))
+
+    duration = time.perf_counter() - started
+    return {'results': results, 'summary': summarize(results, duration, skipped)}
+
+def summarize(results, duration=None, skipped=None):
+    """
+    Aggregate backtest results.
+    """
+    counts = {outcome: 0 for outcome in (OUTCOME_TARGET, OUTCOME_STOP, OUTCOME_EXPIRED, OUTCOME_NO_DATA)}
+    for result in results:
+        counts[result['outcome']] += 1
+
+    scored = counts[OUTCOME_TARGET] + counts[OUTCOME_STOP] + counts[OUTCOME_EXPIRED]
+    target_times = [result['time_to_outcome'] for result in results if result['outcome'] == OUTCOME_TARGET]
+    returns = [result['return_percentage'] for result in results if result['return_percentage'] is not None]
+
+    return {
+        'signals': len(results),
+        'skipped': len(skipped or []),
+        'outcomes': counts,
+        'ambiguous': sum(1 for result in results if result['ambiguous']),
+        'win_rate': counts[OUTCOME_TARGET] / scored * 100 if scored else None,
+        'avg_time_to_target': sum(target_times) / len(target_times) if target_times else None,
+        'avg_return_percentage': sum(returns) / len(returns) if returns else None,
+        'duration_seconds': duration,
+        'signals_per_second': len(results) / duration if duration else None
+    }
+
+def backtest_signal_history(signal_ids=None, store=None):
+    """
+    Score historical TradeSignals from the database. Requires an application
+    context.
+
+    Args:
+        signal_ids: Optional list of signal IDs (defaults to every signal)
+        store: Optional PriceHistoryStore
+
+    Returns:
+        Dictionary with 'results' and 'summary'
+    """
+    from app import db
+    from app.models.trade_signal import TradeSignal
+
+    query = db.session.query(
+        TradeSignal.id, TradeSignal.currency_pair, TradeSignal.signal_type,
+        TradeSignal.entry_price, TradeSignal.target_price, TradeSignal.stop_loss,
+        TradeSignal.leverage, TradeSignal.created_at, TradeSignal.expiry_time
+    )
+    if signal_ids:
+        query = query.filter(TradeSignal.id.in_(signal_ids))
+
+    signals = [row._asdict() for row in query.all()]
+    report = backtest_signals(signals, store)
+    logger.info(
+        f"Backtested {report['summary']['signals']} signals in "
+        f"{report['summary']['duration_seconds']:.3f}s"
+    )
+    return report
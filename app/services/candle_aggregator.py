@@ -0,0 +1,360 @@
+# app/services/candle_aggregator.py
+"""
+Tick-to-candle aggregation pipeline.
+Price ticks from a pluggable tick source update the open 1m candle of each
+symbol in O(1). Closed candles roll up into 5m, 15m, 1h, 4h and 1d candles,
+are kept in fixed-size ring buffers and are flushed to the candle store in
+batches.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from app.config import Config
+from app.services.candle_service import floor_time
+
+logger = logging.getLogger(__name__)
+
+# Each resolution is built from closed candles of the one before it
+RESOLUTIONS = ('1m', '5m', '15m', '1h', '4h', '1d')
+PARENT = dict(zip(RESOLUTIONS, RESOLUTIONS[1:]))
+CHILD = {parent: child for child, parent in PARENT.items()}
+
+def merge_candle(candle, child):
+    """
+    Fold a lower-resolution candle into a higher-resolution one (in place).
+    """
+    candle[2] = max(candle[2], child[2])
+    candle[3] = min(candle[3], child[3])
+    candle[4] = child[4]
+    candle[5] += child[5]
+    return candle
+
+class SymbolCandles:
+    """
+    Open candles and ring buffers of closed candles for one symbol.
+    Candles are [open_time_ms, open, high, low, close, volume] lists.
+    """
+
+    def __init__(self, symbol, capacity):
+        self.symbol = symbol
+        self.open = {resolution: None for resolution in RESOLUTIONS}
+        self.closed = {resolution: deque(maxlen=capacity) for resolution in RESOLUTIONS}
+        self.first_tick = None
+        self.last_tick = None
+
+    def on_tick(self, timestamp_ms, price, volume=0.0):
+        """
+        Apply one tick to the open 1m candle.
+
+        Returns:
+            List of (resolution, candle) pairs closed by this tick
+        """
+        closed = []
+        open_time = floor_time(timestamp_ms, '1m')
+        candle = self.open['1m']
+
+        if candle is not None:
+            if open_time < candle[0]:
+                # Late tick for a candle that is already closed
+                return closed
+            if open_time > candle[0]:
+                self._close('1m', candle, closed)
+                candle = None
+
+        if candle is None:
+            self.open['1m'] = [open_time, price, price, price, price, volume]
+        else:
+            candle[2] = max(candle[2], price)
+            candle[3] = min(candle[3], price)
+            candle[4] = price
+            candle[5] += volume
+
+        if self.first_tick is None:
+            self.first_tick = timestamp_ms
+        self.last_tick = timestamp_ms
+        return closed
+
+    def _close(self, resolution, candle, closed):
+        self.open[resolution] = None
+        self.closed[resolution].append(candle)
+        # Candles that began before the first tick are partial: they are shown
+        # but never flushed over complete candles from the backfill
+        if candle[0] >= self.first_tick:
+            closed.append((resolution, candle))
+
+        parent = PARENT.get(resolution)
+        if parent is None:
+            return
+
+        open_time = floor_time(candle[0], parent)
+        parent_candle = self.open[parent]
+        if parent_candle is not None and open_time > parent_candle[0]:
+            self._close(parent, parent_candle, closed)
+            parent_candle = None
+
+        if parent_candle is None:
+            self.open[parent] = [open_time] + candle[1:]
+        else:
+            merge_candle(parent_candle, candle)
+
+    def current(self, resolution):
+        """
+        Build the in-progress candle for a resolution from its open candle and
+        the in-progress candles below it.
+
+        Returns:
+            Tuple of (pending, current): pending is an earlier bucket that will
+            close with the next rollup, current is the live candle; either may
+            be None
+        """
+        candle = list(self.open[resolution]) if self.open[resolution] else None
+        child = CHILD.get(resolution)
+        if child is None:
+            return None, candle
+
+        child_pending, child_current = self.current(child)
+        pending = None
+        for part in (child_pending, child_current):
+            if part is None:
+                continue
+            open_time = floor_time(part[0], resolution)
+            if candle is not None and open_time > candle[0]:
+                pending, candle = candle, None
+            if candle is None:
+                candle = [open_time] + part[1:]
+            else:
+                merge_candle(candle, part)
+        return pending, candle
+
+    def candles(self, resolution, limit=None, include_open=True):
+        """
+        Get candles for a resolution, oldest first.
+        """
+        rows = [list(candle) for candle in self.closed[resolution]]
+        if include_open:
+            pending, current = self.current(resolution)
+            rows.extend(candle for candle in (pending, current) if candle is not None)
+        return rows[-limit:] if limit else rows
+
+class CandleAggregator:
+    """
+    Aggregates ticks for a set of symbols and flushes closed candles in batches.
+    """
+
+    def __init__(self, symbols=None, capacity=None):
+        self.symbols = set(symbols) if symbols else None  # None aggregates every symbol
+        self.capacity = capacity or Config.CANDLE_RING_SIZE
+        self.books = {}
+        self.pending = []
+        self.ticks = 0
+        self.flushed = 0
+        self._lock = threading.Lock()
+
+    def on_tick(self, symbol, price, timestamp_ms=None, volume=0.0):
+        """
+        Apply one price tick.
+
+        Args:
+            symbol: Cryptocurrency symbol (e.g., 'BTC'), priced in USDT
+            price: Last price
+            timestamp_ms: Tick time in epoch milliseconds (defaults to now)
+            volume: Traded volume since the previous tick, if known
+        """
+        if self.symbols is not None and symbol not in self.symbols:
+            return
+        if not price or price <= 0:
+            return
+
+        timestamp_ms = timestamp_ms or int(time.time() * 1000)
+        with self._lock:
+            book = self.books.get(symbol)
+            if book is None:
+                book = self.books[symbol] = SymbolCandles(symbol, self.capacity)
+            closed = book.on_tick(timestamp_ms, float(price), float(volume or 0.0))
+            self.pending.extend((symbol, resolution, candle) for resolution, candle in closed)
+            self.ticks += 1
+
+    def on_prices(self, prices, timestamp_ms=None):
+        """
+        Apply a {symbol: price} snapshot (one tick per symbol).
+        """
+        timestamp_ms = timestamp_ms or int(time.time() * 1000)
+        for symbol, price in prices.items():
+            self.on_tick(symbol, price, timestamp_ms)
+
+    def on_binance_prices(self, prices):
+        """
+        Apply a Binance {symbol: price} batch, keeping only USDT pairs.
+        """
+        self.on_prices({
+            symbol[:-4]: price for symbol, price in prices.items()
+            if symbol.endswith('USDT') and len(symbol) > 4
+        })
+
+    def candles(self, symbol, resolution, limit=None):
+        """
+        Get aggregated candles for a symbol, including the in-progress one.
+
+        Returns:
+            List of [timestamp, open, high, low, close, volume] rows, oldest first
+        """
+        with self._lock:
+            book = self.books.get(symbol)
+            return book.candles(resolution, limit) if book else []
+
+    def drain(self):
+        """
+        Take the closed candles waiting to be flushed.
+        """
+        with self._lock:
+            pending, self.pending = self.pending, []
+        return pending
+
+    def flush(self):
+        """
+        Write closed candles to the candle store in one batch per
+        symbol/resolution. Candles already stored from an upstream (with real
+        volume) are never replaced by tick candles. Requires an application
+        context.
+
+        Returns:
+            Number of candles written
+        """
+        from app.services.candle_service import UPSTREAM_SOURCES, upsert_candles
+
+        batches = {}
+        for symbol, resolution, candle in self.drain():
+            batches.setdefault((symbol, resolution), []).append(candle)
+
+        written = 0
+        for (symbol, resolution), candles in batches.items():
+            try:
+                written += upsert_candles(symbol, resolution, candles, source='ticks', keep_sources=UPSTREAM_SOURCES)
+            except Exception as e:
+                from app import db
+                db.session.rollback()
+                logger.error(f"Error flushing {resolution} candles for {symbol}: {str(e)}")
+                # Keep them for the next flush
+                with self._lock:
+                    self.pending.extend((symbol, resolution, candle) for candle in candles)
+
+        self.flushed += written
+        return written
+
+    def stats(self):
+        with self._lock:
+            return {
+                'symbols': len(self.books),
+                'ticks': self.ticks,
+                'pending': len(self.pending),
+                'flushed': self.flushed
+            }
+
+class PollingTickSource:
+    """
+    Feeds the aggregator from periodic ticker snapshots on a daemon thread.
+    """
+
+    def __init__(self, aggregator, fetch=None, interval=None):
+        self.aggregator = aggregator
+        self.fetch = fetch
+        self.interval = interval or Config.CANDLE_POLL_INTERVAL
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        fetch = self.fetch
+        if fetch is None:
+            from app.utils.binance_api import get_cached_binance_rates
+            fetch = lambda: get_cached_binance_rates(self.interval)
+        try:
+            prices = fetch()
+            if prices:
+                self.aggregator.on_binance_prices(prices)
+        except Exception as e:
+            logger.error(f"Error polling ticks: {str(e)}")
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.poll()
+            self._stop_event.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, name='candle-tick-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+class StreamTickSource:
+    """
+    Feeds the aggregator from the Binance ticker stream.
+    """
+
+    def __init__(self, aggregator, stream=None):
+        self.aggregator = aggregator
+        self.stream = stream
+
+    def start(self):
+        from app.utils.binance_stream import start_ticker_stream, ticker_stream
+        stream = self.stream or ticker_stream
+        if self.aggregator.on_binance_prices not in stream._listeners:
+            stream.add_listener(self.aggregator.on_binance_prices)
+        if self.stream is None:
+            start_ticker_stream()
+        else:
+            stream.start()
+
+    def stop(self):
+        pass
+
+def aggregated_symbols():
+    """
+    Get the symbols the aggregator tracks (bases of the oracle's USDT pairs
+    unless CANDLE_AGGREGATOR_SYMBOLS is set).
+    """
+    if Config.CANDLE_AGGREGATOR_SYMBOLS:
+        return set(Config.CANDLE_AGGREGATOR_SYMBOLS)
+    return {pair.split('/')[0] for pair in Config.PRICE_ORACLE_PAIRS if pair.endswith('/USDT')}
+
+def is_aggregated(symbol):
+    """
+    Whether the worker's aggregator keeps candles for a symbol up to date.
+    """
+    symbols = candle_aggregator.symbols
+    return Config.CANDLE_AGGREGATOR_ENABLED and (symbols is None or symbol in symbols)
+
+# Process-wide aggregator (fed by the worker's tick source)
+candle_aggregator = CandleAggregator(aggregated_symbols())
+
+def start_candle_aggregator():
+    """
+    Start the tick source selected in Config feeding the process-wide
+    aggregator.
+
+    Returns:
+        The started tick source or None if disabled
+    """
+    if not Config.CANDLE_AGGREGATOR_ENABLED:
+        return None
+
+    if Config.BINANCE_STREAM_ENABLED:
+        source = StreamTickSource(candle_aggregator)
+    else:
+        source = PollingTickSource(candle_aggregator)
+    source.start()
+    logger.info(f"Candle aggregator started with {type(source).__name__}")
+    return source
+
+def flush_candles():
+    """
+    Worker job: write closed candles to the candle store.
+    """
+    return candle_aggregator.flush()
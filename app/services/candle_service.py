@@ -0,0 +1,308 @@
+# app/services/candle_service.py
+"""
+OHLCV candle store.
+Candles live in the ohlcv_candle table. Each symbol/interval is backfilled
+once and afterwards only the missing tail is fetched, so chart requests are
+answered with a local range query. Binance klines are the primary source;
+coins not listed there are aggregated from CoinGecko price points.
+"""
+import logging
+import math
+import threading
+import time
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.config import Config
+from app.models.ohlcv_candle import OHLCVCandle
+
+logger = logging.getLogger(__name__)
+
+INTERVAL_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '1h': 3600,
+    '4h': 14400,
+    '1d': 86400
+}
+
+# Legacy chart ranges ('7d' = last seven days) mapped to a candle resolution
+# and a lookback in seconds (None = all stored history)
+CHART_RANGES = {
+    '1d': ('15m', 86400),
+    '7d': ('1h', 7 * 86400),
+    '14d': ('4h', 14 * 86400),
+    '30d': ('4h', 30 * 86400),
+    '90d': ('1d', 90 * 86400),
+    '180d': ('1d', 180 * 86400),
+    '365d': ('1d', 365 * 86400),
+    'max': ('1d', None)
+}
+MAX_RANGE_INTERVAL = CHART_RANGES['max'][0]
+
+# Candle sources with exchange-reported volume; tick candles never replace them
+UPSTREAM_SOURCES = ('binance', 'coingecko')
+
+# Per-process bookkeeping so one chart view doesn't trigger a sync per request
+_last_sync = {}
+_sync_locks = {}
+_sync_locks_guard = threading.Lock()
+
+def floor_time(timestamp_ms, interval):
+    """
+    Get the open time of the candle containing a timestamp.
+
+    Args:
+        timestamp_ms: Epoch milliseconds
+        interval: Candle interval (e.g., '1h')
+
+    Returns:
+        Candle open time in epoch milliseconds
+    """
+    step = INTERVAL_SECONDS[interval] * 1000
+    return int(timestamp_ms) - int(timestamp_ms) % step
+
+def aggregate_ticks(ticks, interval):
+    """
+    Aggregate price ticks into OHLCV candles.
+
+    Args:
+        ticks: Iterable of (timestamp_ms, price) or (timestamp_ms, price, volume)
+        interval: Candle interval
+
+    Returns:
+        List of [open_time, open, high, low, close, volume] rows, oldest first
+    """
+    candles = {}
+    for tick in sorted(ticks, key=lambda tick: tick[0]):
+        price = float(tick[1])
+        volume = float(tick[2]) if len(tick) > 2 and tick[2] else 0.0
+        open_time = floor_time(tick[0], interval)
+
+        candle = candles.get(open_time)
+        if candle is None:
+            candles[open_time] = [open_time, price, price, price, price, volume]
+        else:
+            candle[2] = max(candle[2], price)
+            candle[3] = min(candle[3], price)
+            candle[4] = price
+            candle[5] += volume
+
+    return [candles[open_time] for open_time in sorted(candles)]
+
+def upsert_candles(symbol, interval, candles, source=None, keep_sources=None):
+    """
+    Insert new candles and update existing ones (e.g., the still-open tail).
+
+    Args:
+        symbol: Cryptocurrency symbol
+        interval: Candle interval
+        candles: List of [open_time, open, high, low, close, volume] rows
+        source: Data source label
+        keep_sources: Sources whose stored rows are left untouched
+
+    Returns:
+        Number of candles written
+    """
+    if not candles:
+        return 0
+
+    open_times = [int(candle[0]) for candle in candles]
+    existing = {
+        candle.open_time: candle
+        for candle in OHLCVCandle.query.filter(
+            OHLCVCandle.symbol == symbol,
+            OHLCVCandle.interval == interval,
+            OHLCVCandle.open_time >= min(open_times),
+            OHLCVCandle.open_time <= max(open_times)
+        ).all()
+    }
+
+    written = 0
+    for open_time, open_price, high, low, close, volume in candles:
+        candle = existing.get(int(open_time))
+        if candle is not None and keep_sources and candle.source in keep_sources:
+            continue
+        if candle is None:
+            candle = OHLCVCandle(symbol=symbol, interval=interval, open_time=int(open_time))
+            db.session.add(candle)
+            existing[candle.open_time] = candle
+        candle.open = open_price
+        candle.high = high
+        candle.low = low
+        candle.close = close
+        candle.volume = volume
+        candle.source = source
+        written += 1
+
+    db.session.commit()
+    return written
+
+def get_last_open_time(symbol, interval):
+    """
+    Get the open time of the newest stored candle, or None if none are stored.
+    """
+    return db.session.query(db.func.max(OHLCVCandle.open_time)).filter(
+        OHLCVCandle.symbol == symbol,
+        OHLCVCandle.interval == interval
+    ).scalar()
+
+def _fetch_binance(symbol, interval, start_time):
+    """
+    Fetch klines from start_time up to now, paging through Binance's limit.
+
+    Returns:
+        List of candle rows, or None if the pair is not listed on Binance
+    """
+    from app.utils.binance_api import get_binance_klines
+
+    candles = []
+    page_limit = 1000
+    for _ in range(Config.CANDLE_MAX_FETCH_PAGES):
+        page = get_binance_klines(f"{symbol}USDT", interval, start_time=start_time, limit=page_limit)
+        if page is None:
+            return candles or None
+        candles.extend(page)
+        if len(page) < page_limit:
+            break
+        start_time = page[-1][0] + INTERVAL_SECONDS[interval] * 1000
+    return candles
+
+def _fetch_coingecko(symbol, interval, start_time):
+    """
+    Build candles from CoinGecko price points for coins not on Binance.
+    """
+    from app.utils.crypto_api import get_market_chart_points
+
+    days = max(1, math.ceil((time.time() * 1000 - start_time) / 86400000))
+    points = get_market_chart_points(symbol, days)
+    return aggregate_ticks([point for point in points if point[0] >= start_time], interval)
+
+def sync_candles(symbol, interval):
+    """
+    Backfill a symbol/interval on first use, then fetch only the missing tail.
+    The newest stored candle is fetched again since it may still have been open.
+
+    Args:
+        symbol: Cryptocurrency symbol (e.g., 'BTC')
+        interval: Candle interval
+
+    Returns:
+        Number of candles written
+    """
+    symbol = symbol.upper()
+    step_ms = INTERVAL_SECONDS[interval] * 1000
+
+    last_open_time = get_last_open_time(symbol, interval)
+    if last_open_time is None and interval == MAX_RANGE_INTERVAL:
+        # Daily candles back the 'max' chart range, so they go back to listing
+        start_time = 0
+    elif last_open_time is None:
+        start_time = floor_time(time.time() * 1000, interval) - Config.CANDLE_BACKFILL_LIMIT * step_ms
+    else:
+        start_time = last_open_time
+
+    try:
+        candles = _fetch_binance(symbol, interval, start_time)
+        source = 'binance'
+        if candles is None:
+            candles = _fetch_coingecko(symbol, interval, start_time)
+            source = 'coingecko'
+
+        written = upsert_candles(symbol, interval, candles, source)
+        logger.info(f"Synced {written} {interval} candles for {symbol} from {source}")
+        return written
+    except IntegrityError:
+        # Another worker wrote the same candles first
+        db.session.rollback()
+        return 0
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error syncing {interval} candles for {symbol}: {str(e)}")
+        return 0
+
+def ensure_synced(symbol, interval):
+    """
+    Fetch the tail of a symbol/interval (including the still-open candle) at
+    most once per CANDLE_SYNC_INTERVAL per process. Concurrent callers don't
+    wait: they are served what is already stored.
+    """
+    key = (symbol, interval)
+    if time.time() - _last_sync.get(key, 0) < Config.CANDLE_SYNC_INTERVAL:
+        return
+
+    # Symbols fed by the worker's tick aggregator need no upstream fetch while
+    # the store already holds the last closed candle
+    from app.services.candle_aggregator import is_aggregated
+    if is_aggregated(symbol):
+        last_open_time = get_last_open_time(symbol, interval)
+        last_closed = floor_time(time.time() * 1000, interval) - INTERVAL_SECONDS[interval] * 1000
+        if last_open_time is not None and last_open_time >= last_closed:
+            _last_sync[key] = time.time()
+            return
+
+    with _sync_locks_guard:
+        lock = _sync_locks.setdefault(key, threading.Lock())
+    if not lock.acquire(blocking=False):
+        return
+    try:
+        sync_candles(symbol, interval)
+        _last_sync[key] = time.time()
+    finally:
+        lock.release()
+
+def get_candles(symbol, interval='1d', start=None, end=None, limit=None, sync=True):
+    """
+    Get stored candles for a time range.
+
+    Args:
+        symbol: Cryptocurrency symbol (e.g., 'BTC')
+        interval: Candle interval
+        start: Optional range start, epoch milliseconds
+        end: Optional range end, epoch milliseconds
+        limit: Optional maximum number of candles (the most recent are kept)
+        sync: Fetch the missing tail first if needed
+
+    Returns:
+        List of [timestamp, open, high, low, close, volume] rows, oldest first
+    """
+    symbol = symbol.upper()
+    if interval not in INTERVAL_SECONDS:
+        raise ValueError(f"Unsupported candle interval: {interval}")
+
+    if sync:
+        ensure_synced(symbol, interval)
+
+    query = OHLCVCandle.query.filter(
+        OHLCVCandle.symbol == symbol,
+        OHLCVCandle.interval == interval
+    )
+    if start is not None:
+        query = query.filter(OHLCVCandle.open_time >= int(start))
+    if end is not None:
+        query = query.filter(OHLCVCandle.open_time <= int(end))
+
+    query = query.order_by(OHLCVCandle.open_time.desc())
+    if limit:
+        query = query.limit(limit)
+
+    return [candle.to_list() for candle in reversed(query.all())]
+
+def get_chart_candles(symbol, chart_range='1d', limit=None, start=None, end=None):
+    """
+    Get candles for a chart, accepting either a legacy range ('7d', 'max', ...)
+    or a candle interval ('1m' ... '1d') with an explicit time range. A legacy
+    range covers its whole lookback, so limit only applies to intervals.
+
+    Returns:
+        List of [timestamp, open, high, low, close, volume] rows, oldest first
+    """
+    if chart_range in INTERVAL_SECONDS:
+        interval = chart_range
+    else:
+        interval, lookback = CHART_RANGES.get(chart_range, CHART_RANGES['30d'])
+        limit = None
+        if start is None and lookback is not None:
+            start = (time.time() - lookback) * 1000
+
+    return get_candles(symbol, interval, start=start, end=end, limit=limit)
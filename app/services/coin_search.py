@@ -0,0 +1,291 @@
+# app/services/coin_search.py
+"""
+Coin search index.
+Built from the CoinGecko /coins/list universe (symbol, name and id of every
+coin) and held in memory:
+
+- Prefix index: every search term (symbol, id, full name and each name word)
+  in one sorted array, so all terms under a prefix are a single binary-search
+  range. This is a flattened trie; it answers the same prefix queries in a
+  fraction of the memory of a node-per-character tree.
+- Trigram index: posting arrays of coins per trigram, for infix and
+  misspelled queries ("coin" finds Bitcoin, "etherum" finds Ethereum).
+
+Scores combine match quality with a market-cap rank weight taken from the
+market snapshot. Rank weights are refreshed per snapshot without rebuilding,
+and when the coin list refreshes only new or renamed coins are re-tokenized.
+The same ranks resolve ticker collisions: a symbol maps to its largest coin.
+"""
+import bisect
+import logging
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Match quality per term kind
+KIND_SYMBOL = 0
+KIND_NAME = 1
+KIND_ID = 2
+EXACT_SCORES = np.array([1000.0, 800.0, 700.0])
+PREFIX_SCORES = np.array([500.0, 400.0, 300.0])
+TRIGRAM_SCORE = 200.0
+MIN_TRIGRAM_SIMILARITY = 0.5
+
+# Rank weight: 100 for rank 1, 50 for rank 10, 25 for rank 1000, 0 if unranked
+RANK_WEIGHT = 100.0
+
+# Seconds between checks of the cached coin list for a refresh
+LIST_CHECK_INTERVAL = 30
+
+def _trigrams(text):
+    """
+    Set of trigrams of text, padded so short words still yield some.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _tokenize(coin):
+    """
+    Search terms and trigrams of one coin.
+
+    Returns:
+        Tuple of ([(term, kind), ...], set of trigrams)
+    """
+    symbol = coin['symbol'].lower()
+    name = (coin.get('name') or '').lower()
+    coin_id = coin['id'].lower()
+
+    terms = {(symbol, KIND_SYMBOL), (coin_id, KIND_ID)}
+    if name:
+        terms.add((name, KIND_NAME))
+        terms.update((word, KIND_NAME) for word in name.split() if word != name)
+    grams = _trigrams(symbol) | _trigrams(name) | _trigrams(coin_id.replace('-', ' '))
+    return sorted(terms), grams
+
+class CoinSearchIndex:
+    """
+    Immutable prefix and trigram index over a coin list. Rank weights are the
+    only mutable state and are swapped as a whole.
+    """
+
+    def __init__(self, coins, previous=None):
+        # Reuse tokenization of unchanged coins from the previous index
+        memo = previous.tokens if previous is not None else {}
+        self.coins = [{'id': coin['id'], 'symbol': coin['symbol'].upper(), 'name': coin.get('name') or coin['symbol']}
+                      for coin in coins]
+        self.slots = {coin['id']: slot for slot, coin in enumerate(self.coins)}
+        self.tokens = {}
+
+        entries = []
+        postings = {}
+        by_symbol = {}
+        for slot, coin in enumerate(self.coins):
+            key = (coin['id'], coin['symbol'], coin['name'])
+            tokens = memo.get(key) or _tokenize(coin)
+            self.tokens[key] = tokens
+            terms, grams = tokens
+            entries.extend((term, slot, kind) for term, kind in terms)
+            for gram in grams:
+                postings.setdefault(gram, []).append(slot)
+            by_symbol.setdefault(coin['symbol'], []).append(slot)
+
+        entries.sort()
+        self.terms = [term for term, _, _ in entries]
+        self.term_slots = np.fromiter((slot for _, slot, _ in entries), dtype=np.int32, count=len(entries))
+        self.term_kinds = np.fromiter((kind for _, _, kind in entries), dtype=np.int8, count=len(entries))
+        self.term_lengths = np.fromiter((len(term) for term in self.terms), dtype=np.int32, count=len(entries))
+        self.postings = {gram: np.array(slots, dtype=np.int32) for gram, slots in postings.items()}
+        self.by_symbol = by_symbol
+
+        self.ranks = np.full(len(self.coins), np.inf)
+        self.weights = np.zeros(len(self.coins))
+        self.rank_snapshot_id = None
+        self.images = {}
+        if previous is not None:
+            self.apply_ranks(previous.rank_entries(), previous.rank_snapshot_id)
+
+    def __len__(self):
+        return len(self.coins)
+
+    def rank_entries(self):
+        """
+        (coin id, rank, image) of every ranked coin, for carrying ranks over.
+        """
+        return [(self.coins[slot]['id'], self.ranks[slot], self.images.get(slot))
+                for slot in np.flatnonzero(np.isfinite(self.ranks))]
+
+    def apply_ranks(self, entries, snapshot_id=None):
+        """
+        Replace the market-cap ranks (and images) used for weighting and
+        collision resolution.
+
+        Args:
+            entries: Iterable of (coin id, rank, image)
+            snapshot_id: Market snapshot the ranks came from
+        """
+        ranks = np.full(len(self.coins), np.inf)
+        images = {}
+        for coin_id, rank, image in entries:
+            slot = self.slots.get(coin_id)
+            if slot is not None and rank is not None and rank == rank:
+                ranks[slot] = rank
+                if image:
+                    images[slot] = image
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = np.where(np.isfinite(ranks) & (ranks > 0), RANK_WEIGHT / (1 + np.log10(ranks)), 0.0)
+        self.ranks, self.weights, self.images = ranks, weights, images
+        self.rank_snapshot_id = snapshot_id
+
+    def resolve(self, symbol):
+        """
+        Coin for a ticker symbol; collisions go to the best market-cap rank,
+        then to the coin whose id is the lower-cased symbol, then by id.
+
+        Returns:
+            Dictionary with id, name and symbol, or None if unknown
+        """
+        slots = self.by_symbol.get(symbol.upper())
+        if not slots:
+            return None
+        symbol_lower = symbol.lower()
+        ranks = self.ranks
+        best = min(slots, key=lambda slot: (ranks[slot], self.coins[slot]['id'] != symbol_lower, self.coins[slot]['id']))
+        return self.coins[best]
+
+    def search(self, query, limit=10):
+        """
+        Search coins by symbol, name or id.
+
+        Args:
+            query: Search text
+            limit: Maximum number of results
+
+        Returns:
+            List of dictionaries with id, symbol, name, market_cap_rank and
+            image (None outside the market snapshot), best match first
+        """
+        query = (query or '').strip().lower()
+        if not query or not self.coins:
+            return []
+
+        scores = np.zeros(len(self.coins))
+
+        # Prefix range: every term starting with the query
+        low = bisect.bisect_left(self.terms, query)
+        high = bisect.bisect_left(self.terms, query + '\uffff')
+        if high > low:
+            kinds = self.term_kinds[low:high]
+            exact = self.term_lengths[low:high] == len(query)
+            np.maximum.at(scores, self.term_slots[low:high], np.where(exact, EXACT_SCORES[kinds], PREFIX_SCORES[kinds]))
+
+        # Trigram similarity for infix and fuzzy matches
+        if len(query) >= 3:
+            grams = _trigrams(query)
+            lists = [self.postings[gram] for gram in grams if gram in self.postings]
+            if lists:
+                similarity = np.bincount(np.concatenate(lists), minlength=len(self.coins)) / len(grams)
+                scores = np.maximum(scores, np.where(similarity >= MIN_TRIGRAM_SIMILARITY, TRIGRAM_SCORE * similarity, 0.0))
+
+        matched = np.flatnonzero(scores > 0)
+        if not len(matched):
+            return []
+        totals = scores[matched] + self.weights[matched]
+        if len(matched) > limit:
+            top = np.argpartition(-totals, limit - 1)[:limit]
+            matched, totals = matched[top], totals[top]
+        ranks = self.ranks
+        ordered = sorted(zip(totals.tolist(), matched.tolist()),
+                         key=lambda item: (-item[0], ranks[item[1]], self.coins[item[1]]['id']))
+
+        return [{
+            **self.coins[slot],
+            'market_cap_rank': int(ranks[slot]) if np.isfinite(ranks[slot]) else None,
+            'image': self.images.get(slot)
+        } for _, slot in ordered]
+
+# Process-wide index (None until the coin list is first loaded)
+_index = None
+_index_source = None
+_index_checked_at = 0
+_index_lock = threading.Lock()
+
+def _rebuild(coins):
+    """
+    Rebuild the index from a coin list unless it matches the indexed one.
+    """
+    global _index, _index_source
+    with _index_lock:
+        if coins is _index_source:
+            return
+        # Redis backends return a fresh copy per read; skip identical lists
+        if _index is None or len(coins) != len(_index) or any(
+                coin['id'] != indexed['id'] or coin['symbol'].upper() != indexed['symbol']
+                or (coin.get('name') or coin['symbol']) != indexed['name']
+                for coin, indexed in zip(coins, _index.coins)):
+            started = time.perf_counter()
+            index = CoinSearchIndex(coins, previous=_index)
+            _refresh_ranks(index)
+            _index = index
+            logger.info(f"Coin search index built for {len(index)} coins in {time.perf_counter() - started:.2f}s")
+        _index_source = coins
+
+def get_coin_index(force_refresh=False):
+    """
+    Get the search index. The first build happens in the calling thread;
+    when the cached coin list is refreshed later, the new index is built in
+    the background while the previous one keeps serving.
+
+    Args:
+        force_refresh: Force a refresh of the coin list
+
+    Returns:
+        CoinSearchIndex, or None if the coin list has never loaded
+    """
+    global _index_checked_at
+    from app.utils.crypto_api import get_coin_list
+
+    if _index is None or force_refresh or time.time() - _index_checked_at >= LIST_CHECK_INTERVAL:
+        _index_checked_at = time.time()
+        coins = get_coin_list(force_refresh)
+        if coins and coins is not _index_source:
+            if _index is None or force_refresh:
+                _rebuild(coins)
+            elif not _index_lock.locked():
+                threading.Thread(target=_rebuild, args=(coins,), name='coin-search-index', daemon=True).start()
+
+    index = _index
+    if index is not None:
+        _refresh_ranks(index)
+    return index
+
+def _refresh_ranks(index):
+    # Read whatever snapshot exists; the search index never triggers a market fetch
+    from app.services import market_snapshot as market
+
+    snapshot = market.market_snapshot
+    if not len(snapshot) or snapshot.snapshot_id == index.rank_snapshot_id:
+        return
+    index.apply_ranks(
+        ((coin['id'], coin.get('market_cap_rank'), coin.get('image')) for coin in snapshot.coins),
+        snapshot.snapshot_id
+    )
+
+def search_coins(query, limit=10):
+    """
+    Search coins by symbol, name or id (see CoinSearchIndex.search).
+    """
+    index = get_coin_index()
+    return index.search(query, limit) if index is not None else []
+
+def resolve_coin_id(symbol):
+    """
+    CoinGecko id of a ticker symbol from the built index, or None if the
+    index isn't built yet or the symbol is unknown. Never loads anything.
+    """
+    index = _index
+    if index is None:
+        return None
+    coin = index.resolve(symbol)
+    return coin['id'] if coin else None
@@ -0,0 +1,273 @@
+# app/services/icon_service.py
+"""
+Coin icon proxy.
+Each coin's icon is fetched from its upstream URL once and stored on disk
+under the SHA-256 of its bytes (objects/ab/abcdef....png). Resized variants
+are generated from the original by a background Pillow pool, so the first
+request for an icon never waits on resizing; it is served the original until
+the variant exists.
+
+Icons are addressed by symbol. Only coins in the market snapshot or the coin
+search index are served, so requests for unknown symbols never reach
+upstream or the cache. A symbol's current digest is kept in the icon cache and
+in a ref file on disk (refs/BTC), so restarts don't refetch. URLs
+carrying the digest (?v=...) are immutable and cached by browsers for a
+year; plain symbol URLs are revalidated with their ETag.
+"""
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config import Config
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Square pixel size of each variant (2x the size they are displayed at)
+ICON_SIZES = {
+    'small': 64,
+    'large': 128
+}
+DEFAULT_SIZE = 'large'
+
+# Public path of the icon endpoint (market blueprint)
+ICON_PATH = '/market/icon/'
+
+# Length of the digest prefix used in versioned URLs and ETags
+VERSION_LENGTH = 16
+
+# Symbol -> digest of its current icon ('' if it has none)
+icon_cache = TTLCache('icons', ttl=Config.ICON_REFRESH_INTERVAL, stale_ttl=Config.ICON_REFRESH_INTERVAL)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+
+def _executor_pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=Config.ICON_RESIZE_WORKERS, thread_name_prefix='icon-resize')
+    return _executor
+
+def _path(*parts):
+    return os.path.join(Config.ICON_CACHE_DIR, *parts)
+
+def _write_atomic(path, data):
+    """
+    Write a file so readers never see it half-written.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, 'wb') as handle:
+        handle.write(data)
+    os.replace(temporary, path)
+
+def _original_path(digest, extension):
+    return _path('objects', digest[:2], f"{digest}{extension}")
+
+def _find_original(digest):
+    directory = _path('objects', digest[:2])
+    try:
+        for name in os.listdir(directory):
+            if name.startswith(digest) and not name.endswith('.tmp'):
+                return os.path.join(directory, name)
+    except FileNotFoundError:
+        pass
+    return None
+
+def _variant_path(digest, size):
+    return _path('variants', digest[:2], f"{digest}-{size}.png")
+
+def _ref_path(symbol):
+    return _path('refs', symbol)
+
+def is_known_symbol(symbol):
+    """
+    Whether a symbol is in the market snapshot or the coin search index.
+    Reads only what is already built; never loads anything.
+    """
+    from app.services import market_snapshot as market
+    from app.services.coin_search import resolve_coin_id
+
+    return market.market_snapshot.get(symbol) is not None or resolve_coin_id(symbol) is not None
+
+def source_url(symbol):
+    """
+    Upstream icon URL of a coin: from the market snapshot when the coin is in
+    it, otherwise from its (cached) coin details.
+    """
+    from app.services import market_snapshot as market
+    from app.utils.crypto_api import get_coin_details
+
+    coin = market.market_snapshot.get(symbol)
+    if coin and coin.get('image_source'):
+        return coin['image_source']
+    details = get_coin_details(symbol) or {}
+    return details.get('image') or None
+
+def _fetch(symbol):
+    """
+    Fetch a coin's icon and store it content-addressed.
+
+    Returns:
+        Digest of the icon, or '' if the coin has no usable icon
+    """
+    from PIL import Image
+    from app.utils.http_client import http_client
+
+    url = source_url(symbol)
+    if not url:
+        return ''
+    response = http_client.get(url)
+    if response.status_code != 200 or not response.content:
+        logger.warning(f"Failed to fetch icon for {symbol}: {response.status_code}")
+        return ''
+
+    data = response.content
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format = (image.format or 'PNG').lower()
+            image.verify()
+    except Exception as e:
+        logger.warning(f"Icon for {symbol} is not a valid image: {str(e)}")
+        return ''
+
+    digest = hashlib.sha256(data).hexdigest()
+    if _find_original(digest) is None:
+        extension = mimetypes.guess_extension(f"image/{image_format}") or '.img'
+        _write_atomic(_original_path(digest, extension), data)
+    _write_atomic(_ref_path(symbol), digest.encode())
+    return digest
+
+def _load_digest(symbol):
+    # A ref written within the refresh interval survives restarts
+    try:
+        path = _ref_path(symbol)
+        if time.time() - os.path.getmtime(path) <= Config.ICON_REFRESH_INTERVAL:
+            with open(path) as handle:
+                digest = handle.read().strip()
+            if digest and _find_original(digest):
+                return digest
+    except OSError:
+        pass
+    try:
+        return _fetch(symbol)
+    except Exception as e:
+        logger.error(f"Error fetching icon for {symbol}: {str(e)}")
+        return None
+
+def _normalize_symbol(symbol):
+    symbol = (symbol or '').upper()
+    return symbol if symbol.isalnum() else None
+
+def get_icon_digest(symbol):
+    """
+    Digest of a coin's current icon, fetching it on first use.
+
+    Returns:
+        Hex digest, or None if the coin is unknown or has no icon
+    """
+    symbol = _normalize_symbol(symbol)
+    if not symbol or not is_known_symbol(symbol):
+        return None
+    return icon_cache.get_or_load(symbol, lambda: _load_digest(symbol)) or None
+
+def _resize(digest, original):
+    from PIL import Image
+
+    try:
+        with Image.open(original) as image:
+            image = image.convert('RGBA')
+            for size, pixels in ICON_SIZES.items():
+                path = _variant_path(digest, size)
+                if os.path.exists(path):
+                    continue
+                variant = image.copy()
+                variant.thumbnail((pixels, pixels), Image.LANCZOS)
+                buffer = io.BytesIO()
+                variant.save(buffer, format='PNG', optimize=True)
+                _write_atomic(path, buffer.getvalue())
+    except Exception as e:
+        logger.error(f"Error resizing icon {digest}: {str(e)}")
+    finally:
+        with _pending_lock:
+            _pending.discard(digest)
+
+def _schedule_variants(digest, original):
+    """
+    Queue variant generation for an icon unless already queued.
+    """
+    with _pending_lock:
+        if digest in _pending:
+            return
+        _pending.add(digest)
+    _executor_pool().submit(_resize, digest, original)
+
+def normalize_size(size):
+    return size if size in ICON_SIZES else DEFAULT_SIZE
+
+def get_icon(symbol, size=DEFAULT_SIZE):
+    """
+    Get the file to serve for a coin icon.
+
+    Args:
+        symbol: Cryptocurrency symbol (e.g., 'BTC')
+        size: 'small' or 'large'
+
+    Returns:
+        Tuple of (path, digest, is_variant), or None if the coin is unknown
+        or has no icon
+    """
+    size = normalize_size(size)
+    digest = get_icon_digest(symbol)
+    if not digest:
+        return None
+
+    variant = _variant_path(digest, size)
+    if os.path.exists(variant):
+        return variant, digest, True
+
+    original = _find_original(digest)
+    if original is None:
+        # Cache directory was cleared (or is per host); fetch again
+        icon_cache.invalidate(_normalize_symbol(symbol))
+        digest = get_icon_digest(symbol)
+        original = _find_original(digest) if digest else None
+        if original is None:
+            return None
+
+    _schedule_variants(digest, original)
+    return original, digest, False
+
+def icon_url(symbol, size=DEFAULT_SIZE):
+    """
+    Proxy URL of a coin icon; versioned (immutable) once its digest is known.
+    Never fetches anything.
+    """
+    symbol = _normalize_symbol(symbol) or ''
+    digest = icon_cache.get(symbol) if symbol else None
+    return _versioned_url(symbol, normalize_size(size), digest)
+
+def icon_urls(symbols, size=DEFAULT_SIZE):
+    """
+    Proxy URLs of many coin icons, with every digest read from the icon
+    cache in one lookup. Never fetches anything.
+
+    Returns:
+        Dictionary mapping each symbol as given to its URL
+    """
+    size = normalize_size(size)
+    normalized = {symbol: _normalize_symbol(symbol) or '' for symbol in symbols}
+    digests = icon_cache.get_many(symbol for symbol in normalized.values() if symbol)
+    return {symbol: _versioned_url(key, size, digests.get(key)) for symbol, key in normalized.items()}
+
+def _versioned_url(symbol, size, digest):
+    url = f"{ICON_PATH}{symbol}?size={size}"
+    return f"{url}&v={digest[:VERSION_LENGTH]}" if digest else url
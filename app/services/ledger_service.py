@@ -0,0 +1,569 @@
+# app/services/ledger_service.py
+"""
+Double-entry ledger.
+Every balance change is a journal entry whose postings sum to zero per
+currency: user wallets are debited or credited against system accounts
+(external, trading, exchange, ...). Postings are append-only and amounts are
+exact Decimals. Account balances are updated in SQL (balance = balance + delta)
+so concurrent postings never lose updates, and the running balance is
+snapshotted every LEDGER_SNAPSHOT_INTERVAL postings so a balance as of any
+time costs an index seek plus at most that many postings.
+
+Wallet balance columns are a materialized cache of the user accounts. Changes
+written to Wallet directly are detected the next time the account is posted
+to (or by reconcile_wallets) and recorded as reconciliation entries.
+
+Concurrency: wallets are locked FOR UPDATE in (currency, user_id) order before
+any account is touched, and the wallet cache is written with a version check
+(optimistic locking) so a wallet changed since it was read - e.g. on databases
+without row locks - fails the posting instead of losing the other write.
+atomic() runs a mutation in its own transaction and retries it on such
+conflicts, deadlocks and lock timeouts.
+"""
+import logging
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from app import db
+from app.config import Config
+from app.models.ledger import LedgerAccount, JournalEntry, LedgerPosting, LedgerSnapshot
+from app.models.wallet import Wallet
+from app.utils.money import to_decimal
+
+logger = logging.getLogger(__name__)
+
+# User accounts and the Wallet columns caching them
+WALLET_COLUMNS = {
+    'spot': 'spot_balance',
+    'funding': 'funding_balance',
+    'futures': 'futures_balance'
+}
+
+# System accounts (no user) that user postings are balanced against
+EXTERNAL = 'external'  # deposits and withdrawals
+TRADING = 'trading'  # order fills and signal P/L
+EXCHANGE = 'exchange'  # currency conversions
+REWARDS = 'rewards'  # referral rewards
+RECONCILIATION = 'reconciliation'  # balances changed outside the ledger
+
+ZERO = Decimal('0')
+
+# Keys per IN (...) list
+IN_CHUNK = 500
+
+# Database errors (lowercased message fragments) worth retrying the whole mutation for
+RETRYABLE_ERRORS = ('deadlock', 'lock wait timeout', 'database is locked', 'could not serialize')
+
+class InsufficientFunds(Exception):
+    """A posting would take a user account below zero."""
+
+def to_amount(value):
+    """
+    Convert a number to an exact ledger amount (8 decimal places).
+    """
+    return to_decimal(value)
+
+def user_account(user_id, currency, kind='spot'):
+    """
+    Key of a user's wallet account (kind is 'spot', 'funding' or 'futures').
+    """
+    return (user_id, currency, kind)
+
+def system_account(kind, currency):
+    """
+    Key of a system account.
+    """
+    return (None, currency, kind)
+
+def account_name(key):
+    user_id, currency, kind = key
+    return f"{kind}:{currency}" if user_id is None else f"{kind}:{currency}:{user_id}"
+
+def _chunks(values, size=IN_CHUNK):
+    values = list(values)
+    for offset in range(0, len(values), size):
+        yield values[offset:offset + size]
+
+def entry(entry_type, postings, reference=None, description=None):
+    """
+    Build a journal entry for post_entries.
+
+    Args:
+        entry_type: Entry type (e.g., 'deposit', 'transfer')
+        postings: List of (account key, amount) pairs; amounts for the same
+            account are merged and zero amounts dropped
+        reference: Optional reference (e.g., 'transaction:<id>')
+        description: Optional free text
+
+    Returns:
+        Entry dictionary
+
+    Raises:
+        ValueError: If the postings don't sum to zero per currency
+    """
+    merged = defaultdict(Decimal)
+    for key, amount in postings:
+        merged[key] += to_amount(amount)
+
+    totals = defaultdict(Decimal)
+    for (user_id, currency, kind), amount in merged.items():
+        totals[currency] += amount
+    unbalanced = {currency: total for currency, total in totals.items() if total}
+    if unbalanced:
+        raise ValueError(f"Unbalanced {entry_type} entry: {unbalanced}")
+
+    return {
+        'entry_type': entry_type,
+        'postings': [(key, amount) for key, amount in merged.items() if amount],
+        'reference': reference,
+        'description': description
+    }
+
+def _insert_missing(model, rows):
+    """
+    Insert rows that another process may be inserting concurrently; rows that
+    already exist by then are skipped.
+    """
+    try:
+        with db.session.begin_nested():
+            db.session.bulk_insert_mappings(model, rows)
+    except IntegrityError:
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.bulk_insert_mappings(model, [row])
+            except IntegrityError:
+                pass
+
+def _lock_wallets(pairs):
+    """
+    Load and lock the wallets behind a set of user accounts, creating missing
+    ones. Locks are taken in (currency, user_id) order by every caller, so
+    concurrent postings can't deadlock.
+
+    Args:
+        pairs: Set of (user_id, currency)
+
+    Returns:
+        Dictionary keyed by (user_id, currency) of wallet rows
+    """
+    def load(pairs):
+        wallets = {}
+        by_currency = defaultdict(set)
+        for user_id, currency in pairs:
+            by_currency[currency].add(user_id)
+        for currency in sorted(by_currency):
+            for user_ids in _chunks(sorted(by_currency[currency])):
+                rows = db.session.execute(
+                    select(Wallet.id, Wallet.user_id, Wallet.currency, Wallet.version, Wallet.spot_balance,
+                           Wallet.funding_balance, Wallet.futures_balance)
+                    .where(Wallet.currency == currency, Wallet.user_id.in_(user_ids))
+                    .order_by(Wallet.user_id)
+                    .with_for_update()
+                ).all()
+                wallets.update(((row.user_id, row.currency), row) for row in rows)
+        return wallets
+
+    wallets = load(pairs)
+    missing = pairs - set(wallets)
+    if missing:
+        now = datetime.utcnow()
+        _insert_missing(Wallet, [
+            {'user_id': user_id, 'currency': currency, 'spot_balance': 0.0, 'funding_balance': 0.0,
+             'futures_balance': 0.0, 'version': 1, 'created_at': now, 'updated_at': now}
+            for user_id, currency in sorted(missing, key=lambda pair: (pair[1], pair[0]))
+        ])
+        wallets.update(load(missing))
+    return wallets
+
+def _load_accounts(keys):
+    """
+    Get (creating missing) ledger accounts.
+
+    Returns:
+        Dictionary keyed by account key of (id, balance) rows
+    """
+    def load(keys):
+        names = {account_name(key): key for key in keys}
+        accounts = {}
+        for chunk in _chunks(names):
+            rows = db.session.execute(
+                select(LedgerAccount.id, LedgerAccount.key, LedgerAccount.balance)
+                .where(LedgerAccount.key.in_(chunk))
+            ).all()
+            accounts.update((names[row.key], row) for row in rows)
+        return accounts
+
+    accounts = load(keys)
+    missing = [key for key in keys if key not in accounts]
+    if missing:
+        now = datetime.utcnow()
+        _insert_missing(LedgerAccount, [
+            {'key': account_name(key), 'user_id': key[0], 'currency': key[1], 'kind': key[2],
+             'balance': ZERO, 'posting_count': 0, 'created_at': now, 'updated_at': now}
+            for key in missing
+        ])
+        accounts.update(load(missing))
+    return accounts
+
+def _expire_wallets(pairs):
+    """
+    Drop cached Wallet objects in the session that were updated in SQL.
+    """
+    for instance in list(db.session.identity_map.values()):
+        if isinstance(instance, Wallet) and (instance.user_id, instance.currency) in pairs:
+            db.session.expire(instance)
+
+def post_entries(entries, reconcile=()):
+    """
+    Post journal entries in one set-based pass: balance updates, posting and
+    snapshot inserts and wallet cache updates are each one batched statement.
+    Does not commit.
+
+    Args:
+        entries: List of entries built with entry()
+        reconcile: Extra user account keys to check for wallet drift
+
+    Returns:
+        List of the JournalEntry rows posted (including any reconciliation entry)
+
+    Raises:
+        InsufficientFunds: If a debited user account would go below zero
+    """
+    # An entry whose postings all cancelled out moves nothing
+    entries = [item for item in entries if item['postings']]
+    keys = {key for item in entries for key, amount in item['postings']}
+    user_keys = sorted(
+        {key for key in keys if key[0] is not None} | set(reconcile),
+        key=lambda key: (key[1], key[0], key[2])
+    )
+
+    # Lock the wallets first: every poster to a user account holds its wallet
+    # lock, so the account balances read below can't change under us
+    wallets = _lock_wallets({(user_id, currency) for user_id, currency, kind in user_keys})
+    accounts = _load_accounts(sorted(keys | set(user_keys), key=lambda key: (key[1], str(key[0]), key[2])))
+
+    # Wallet changes made outside the ledger become a reconciliation entry
+    drift = []
+    for key in user_keys:
+        user_id, currency, kind = key
+        difference = to_amount(getattr(wallets[(user_id, currency)], WALLET_COLUMNS[kind])) - to_amount(accounts[key].balance)
+        if difference:
+            drift.append((key, difference))
+            drift.append((system_account(RECONCILIATION, currency), -difference))
+    if drift:
+        entries = [entry(RECONCILIATION, drift, description='Wallet balances changed outside the ledger')] + list(entries)
+        reconciled = {key for key, amount in drift}
+        accounts.update(_load_accounts([key for key in reconciled if key not in accounts]))
+        logger.warning(f"Reconciled {len(drift) // 2} wallet balances changed outside the ledger")
+
+    if not entries:
+        return []
+
+    now = datetime.utcnow()
+    journal = [
+        JournalEntry(entry_type=item['entry_type'], reference=item['reference'],
+                     description=item['description'], created_at=now)
+        for item in entries
+    ]
+    db.session.add_all(journal)
+    db.session.flush()
+
+    deltas = defaultdict(Decimal)
+    counts = defaultdict(int)
+    for item in entries:
+        for key, amount in item['postings']:
+            deltas[key] += amount
+            counts[key] += 1
+
+    # Balances are incremented in SQL, in account id order
+    ordered = sorted(deltas, key=lambda key: accounts[key].id)
+    table = LedgerAccount.__table__
+    db.session.execute(
+        update(table).where(table.c.id == bindparam('account_id')).values(
+            balance=table.c.balance + bindparam('delta', type_=table.c.balance.type),
+            posting_count=table.c.posting_count + bindparam('count'),
+            updated_at=now
+        ),
+        [{'account_id': accounts[key].id, 'delta': deltas[key], 'count': counts[key]} for key in ordered]
+    )
+
+    # Read back the new balances; the rows are locked until commit
+    keys_by_id = {accounts[key].id: key for key in ordered}
+    state = {}
+    for ids in _chunks(keys_by_id):
+        rows = db.session.execute(
+            select(LedgerAccount.id, LedgerAccount.balance, LedgerAccount.posting_count)
+            .where(LedgerAccount.id.in_(ids))
+        ).all()
+        for row in rows:
+            key = keys_by_id[row.id]
+            state[key] = [row.posting_count - counts[key], to_amount(row.balance) - deltas[key]]
+            if key[0] is not None and deltas[key] < 0 and to_amount(row.balance) < 0:
+                raise InsufficientFunds(f"Insufficient {key[1]} balance in {key[2]} wallet.")
+
+    postings = []
+    snapshots = []
+    interval = Config.LEDGER_SNAPSHOT_INTERVAL
+    for journal_entry, item in zip(journal, entries):
+        for key, amount in item['postings']:
+            sequence, balance = state[key]
+            sequence += 1
+            balance += amount
+            state[key] = [sequence, balance]
+            postings.append({
+                'entry_id': journal_entry.id, 'account_id': accounts[key].id,
+                'sequence': sequence, 'amount': amount, 'created_at': now
+            })
+            if sequence % interval == 0:
+                snapshots.append({
+                    'account_id': accounts[key].id, 'sequence': sequence,
+                    'balance': balance, 'created_at': now
+                })
+
+    db.session.execute(insert(LedgerPosting.__table__), postings)
+    if snapshots:
+        db.session.execute(insert(LedgerSnapshot.__table__), snapshots)
+
+    # Refresh the wallet cache from the new account balances: one versioned
+    # write per wallet, so a wallet changed since it was read is not overwritten
+    touched = {(user_id, currency) for user_id, currency, kind in deltas if user_id is not None}
+    if touched:
+        rows = []
+        for pair in sorted(touched, key=lambda pair: wallets[pair].id):
+            wallet = wallets[pair]
+            row = {'wallet_id': wallet.id, 'read_version': wallet.version}
+            for kind, column in WALLET_COLUMNS.items():
+                key = user_account(pair[0], pair[1], kind)
+                row[column] = state[key][1] if key in state else getattr(wallet, column)
+            rows.append(row)
+
+        wallet_table = Wallet.__table__
+        result = db.session.execute(
+            update(wallet_table).where(
+                wallet_table.c.id == bindparam('wallet_id'),
+                wallet_table.c.version == bindparam('read_version')
+            ).values({
+                **{column: bindparam(column) for column in WALLET_COLUMNS.values()},
+                'version': wallet_table.c.version + 1,
+                'updated_at': now
+            }),
+            rows
+        )
+        dialect = db.session.get_bind().dialect
+        if dialect.supports_sane_multi_rowcount and result.rowcount != len(rows):
+            raise StaleDataError(f"{len(rows) - result.rowcount} of {len(rows)} wallets changed concurrently")
+        _expire_wallets(touched)
+
+    return journal
+
+def post_entry(entry_type, postings, reference=None, description=None):
+    """
+    Post one journal entry. Does not commit.
+
+    Args:
+        entry_type: Entry type
+        postings: List of (account key, amount) pairs summing to zero per currency
+        reference: Optional reference
+        description: Optional free text
+
+    Returns:
+        The JournalEntry row
+
+    Raises:
+        InsufficientFunds: If a debited user account would go below zero
+    """
+    journal = post_entries([entry(entry_type, postings, reference, description)])
+    return journal[-1] if journal else None
+
+def is_retryable(error):
+    """
+    Whether an error is a transient concurrency conflict: a stale wallet
+    version, a deadlock, a lock timeout or a serialization failure.
+    """
+    if isinstance(error, StaleDataError):
+        return True
+    if isinstance(error, OperationalError):
+        message = str(error.orig if error.orig is not None else error).lower()
+        return any(fragment in message for fragment in RETRYABLE_ERRORS)
+    return False
+
+def atomic(operation, *args, attempts=None, **kwargs):
+    """
+    Run a wallet mutation in its own transaction and commit it. On a
+    concurrency conflict the transaction is rolled back and the whole
+    operation re-run (it must re-read whatever it depends on), with
+    exponential backoff and jitter, up to WALLET_MUTATION_ATTEMPTS times.
+
+    Args:
+        operation: Callable doing the reads and postings; must not commit
+        *args, **kwargs: Passed to operation
+        attempts: Optional override of the attempt limit
+
+    Returns:
+        The operation's return value
+
+    Raises:
+        InsufficientFunds: Immediately, never retried
+        The last conflict error once the attempts are exhausted
+    """
+    attempts = attempts or Config.WALLET_MUTATION_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            result = operation(*args, **kwargs)
+            db.session.commit()
+            return result
+        except Exception as e:
+            db.session.rollback()
+            if attempt >= attempts or not is_retryable(e):
+                raise
+            delay = min(Config.WALLET_RETRY_BACKOFF * 2 ** (attempt - 1), 1.0) * random.uniform(0.5, 1.5)
+            logger.warning(
+                f"Wallet mutation {getattr(operation, '__name__', operation)} conflicted "
+                f"(attempt {attempt}/{attempts}), retrying in {delay:.3f}s: {str(e)}"
+            )
+            time.sleep(delay)
+
+def get_balance(user_id, currency, kind='spot'):
+    """
+    Get an account's running balance (one indexed row read).
+
+    Returns:
+        Decimal balance
+    """
+    balance = db.session.query(LedgerAccount.balance).filter(
+        LedgerAccount.key == account_name(user_account(user_id, currency, kind))
+    ).scalar()
+    return to_amount(balance) if balance is not None else ZERO
+
+def get_balance_at(key, at):
+    """
+    Get an account's balance as of a point in time: the last snapshot at or
+    before it plus the postings after that snapshot (fewer than
+    LEDGER_SNAPSHOT_INTERVAL).
+
+    Args:
+        key: Account key (see user_account / system_account)
+        at: datetime (UTC)
+
+    Returns:
+        Decimal balance
+    """
+    account_id = db.session.query(LedgerAccount.id).filter(LedgerAccount.key == account_name(key)).scalar()
+    if account_id is None:
+        return ZERO
+
+    snapshot = db.session.query(LedgerSnapshot.sequence, LedgerSnapshot.balance).filter(
+        LedgerSnapshot.account_id == account_id,
+        LedgerSnapshot.created_at <= at
+    ).order_by(LedgerSnapshot.created_at.desc(), LedgerSnapshot.sequence.desc()).first()
+    sequence, balance = (snapshot.sequence, to_amount(snapshot.balance)) if snapshot else (0, ZERO)
+
+    # The next snapshot bounds the postings to replay
+    next_sequence = db.session.query(func.min(LedgerSnapshot.sequence)).filter(
+        LedgerSnapshot.account_id == account_id,
+        LedgerSnapshot.sequence > sequence
+    ).scalar()
+
+    query = db.session.query(func.sum(LedgerPosting.amount)).filter(
+        LedgerPosting.account_id == account_id,
+        LedgerPosting.sequence > sequence,
+        LedgerPosting.created_at <= at
+    )
+    if next_sequence is not None:
+        query = query.filter(LedgerPosting.sequence < next_sequence)
+
+    return balance + to_amount(query.scalar() or 0)
+
+def verify_account(account_id):
+    """
+    Replay an account's postings and check its balance, posting count and
+    snapshots.
+
+    Returns:
+        List of problems found (empty if consistent)
+    """
+    account = LedgerAccount.query.get(account_id)
+    if account is None:
+        return [f"Account {account_id} not found"]
+
+    snapshots = dict(db.session.query(LedgerSnapshot.sequence, LedgerSnapshot.balance).filter(
+        LedgerSnapshot.account_id == account_id
+    ).all())
+
+    problems = []
+    balance = ZERO
+    expected_sequence = 0
+    rows = db.session.query(LedgerPosting.sequence, LedgerPosting.amount).filter(
+        LedgerPosting.account_id == account_id
+    ).order_by(LedgerPosting.sequence).yield_per(5000)
+    for sequence, amount in rows:
+        expected_sequence += 1
+        if sequence != expected_sequence:
+            problems.append(f"Posting sequence gap at {expected_sequence} (found {sequence})")
+            expected_sequence = sequence
+        balance += to_amount(amount)
+        if sequence in snapshots and to_amount(snapshots[sequence]) != balance:
+            problems.append(f"Snapshot #{sequence} is {snapshots[sequence]}, replay gives {balance}")
+
+    if balance != to_amount(account.balance):
+        problems.append(f"Balance is {account.balance}, replay gives {balance}")
+    if expected_sequence != account.posting_count:
+        problems.append(f"Posting count is {account.posting_count}, replay gives {expected_sequence}")
+    return problems
+
+def trial_balance():
+    """
+    Sum every account per currency. In a consistent ledger every total is zero.
+
+    Returns:
+        Dictionary mapping currency to Decimal total
+    """
+    rows = db.session.query(LedgerAccount.currency, func.sum(LedgerAccount.balance)).group_by(LedgerAccount.currency).all()
+    return {currency: to_amount(total) for currency, total in rows}
+
+def reconcile_wallets(chunk_size=IN_CHUNK):
+    """
+    Bring every Wallet into the ledger: balances changed outside the ledger
+    (or predating it) are posted as reconciliation entries.
+
+    Returns:
+        Dictionary with reconciliation metrics
+    """
+    metrics = {'wallets': 0, 'reconciliation_entries': 0, 'unbalanced_currencies': []}
+    last_id = 0
+    while True:
+        wallets = Wallet.query.filter(Wallet.id > last_id).order_by(Wallet.id).limit(chunk_size).all()
+        if not wallets:
+            break
+        last_id = wallets[-1].id
+        metrics['wallets'] += len(wallets)
+
+        existing = set()
+        names = [account_name(user_account(wallet.user_id, wallet.currency, kind)) for wallet in wallets for kind in WALLET_COLUMNS]
+        for chunk in _chunks(names):
+            existing.update(db.session.execute(select(LedgerAccount.key).where(LedgerAccount.key.in_(chunk))).scalars())
+
+        keys = [
+            user_account(wallet.user_id, wallet.currency, kind)
+            for wallet in wallets
+            for kind, column in WALLET_COLUMNS.items()
+            if getattr(wallet, column) or account_name(user_account(wallet.user_id, wallet.currency, kind)) in existing
+        ]
+        try:
+            journal = post_entries([], reconcile=keys)
+            db.session.commit()
+            metrics['reconciliation_entries'] += len(journal)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error reconciling wallets after id {last_id}: {str(e)}")
+
+    metrics['unbalanced_currencies'] = [currency for currency, total in trial_balance().items() if total]
+    if metrics['unbalanced_currencies']:
+        logger.error(f"Ledger trial balance is not zero for {metrics['unbalanced_currencies']}")
+    return metrics
@@ -1,12 +1,17 @@
 # app/services/market_service.py
 import logging
+from app.config import Config
+from app.utils.cache import TTLCache
 from app.utils.crypto_api import (
     get_market_overview, get_coin_details, get_chart_data, 
-    get_current_price, get_popular_coins, get_new_listings
+    get_current_price, get_current_prices, get_popular_coins, get_new_listings
 )
 
 logger = logging.getLogger(__name__)
 
+# Rendered dashboard fragments shared by every user (and every worker with Redis)
+dashboard_cache = TTLCache('dashboard', ttl=Config.DASHBOARD_CACHE_TTL)
+
 def get_market_data(limit=100, offset=0):
     """
     Get market data.
@@ -25,6 +30,53 @@ def get_market_data(limit=100, offset=0):
         # Return empty list in case of error
         return []
 
+def get_market_catalogue_page(sort='rank', descending=None, limit=100, cursor=None, **filters):
+    """
+    Get one page of the in-memory market catalogue.
+    
+    Args:
+        sort: 'rank', 'change', 'volume' or 'market_cap'
+        descending: Sort direction (defaults to the sort's natural one)
+        limit: Page size (capped at MARKET_CATALOGUE_MAX_PAGE_SIZE)
+        cursor: next_cursor of the previous page
+        **filters: query, min_price, max_price, min_market_cap, min_volume, change
+    
+    Returns:
+        Dictionary with data, next_cursor and total
+    
+    Raises:
+        ValueError: If the sort or cursor is invalid
+    """
+    from app.services.market_snapshot import get_market_catalogue
+    
+    limit = max(1, min(limit, Config.MARKET_CATALOGUE_MAX_PAGE_SIZE))
+    try:
+        return get_market_catalogue(sort, descending, limit, cursor, **filters)
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_market_catalogue_page: {str(e)}")
+        return {'data': [], 'next_cursor': None, 'total': 0}
+
+def search_coins_service(query, limit=10):
+    """
+    Search coins by symbol, name or id.
+    
+    Args:
+        query: Search text
+        limit: Maximum number of results (at most 50)
+    
+    Returns:
+        List of matching coins, best match first
+    """
+    from app.services.coin_search import search_coins
+    
+    try:
+        return search_coins(query, max(1, min(limit, 50)))
+    except Exception as e:
+        logger.error(f"Error in search_coins_service: {str(e)}")
+        return []
+
 def get_coin_data(symbol):
     """
     Get detailed data for a specific coin.
@@ -42,18 +94,31 @@ def get_coin_data(symbol):
         # Return empty dict in case of error
         return {}
 
-def get_chart_data_service(symbol, interval='1d', limit=100):
+def get_chart_data_service(symbol, interval='1d', limit=100, start=None, end=None):
     """
     Get historical chart data for a cryptocurrency.
+    Served from the local candle store; CoinGecko is only queried directly if
+    the store has nothing for the symbol.
     
     Args:
         symbol: Cryptocurrency symbol (e.g., 'BTC')
-        interval: Time interval
-        limit: Number of data points to return
+        interval: Chart range ('1d', '7d', ... 'max') or candle interval ('1m' ... '1d')
+        limit: Number of data points to return (candle intervals only; a
+            legacy range returns its whole lookback)
+        start: Optional range start, epoch milliseconds
+        end: Optional range end, epoch milliseconds
     
     Returns:
         List of OHLCV data points
     """
+    try:
+        from app.services.candle_service import get_chart_candles
+        candles = get_chart_candles(symbol, interval, limit=limit, start=start, end=end)
+        if candles:
+            return candles
+    except Exception as e:
+        logger.error(f"Error reading candle store in get_chart_data_service: {str(e)}")
+    
     try:
         return get_chart_data(symbol, interval, limit)
     except Exception as e:
@@ -78,6 +143,47 @@ def get_current_price_service(currency_pair):
         # Return 0 in case of error
         return 0
 
+def get_current_prices_service(currency_pairs):
+    """
+    Get current prices for many trading pairs with one batched lookup.
+    
+    Args:
+        currency_pairs: List of trading pairs (e.g., ['BTC/USDT', 'ETH/USDT'])
+    
+    Returns:
+        Dictionary mapping each pair to its price (0 for pairs that failed)
+    """
+    try:
+        return get_current_prices(currency_pairs)
+    except Exception as e:
+        logger.error(f"Error in get_current_prices_service: {str(e)}")
+        # Return zero prices in case of error
+        return {currency_pair: 0 for currency_pair in set(currency_pairs or [])}
+
+def warm_price_cache():
+    """
+    Track every pair with open orders or active signals in the price oracle
+    and refresh all of them with one batched request.
+    
+    Returns:
+        Number of pairs tracked
+    """
+    from app import db
+    from app.models.order import Order
+    from app.models.trade_signal import TradeSignal
+    from app.utils.price_oracle import price_oracle
+    
+    try:
+        pairs = {row[0] for row in db.session.query(Order.currency_pair).filter(Order.status == 'open').distinct()}
+        pairs.update(row[0] for row in db.session.query(TradeSignal.currency_pair).filter(TradeSignal.is_active == True).distinct())
+        
+        price_oracle.track(pairs)
+        price_oracle.refresh()
+        return len(pairs)
+    except Exception as e:
+        logger.error(f"Error in warm_price_cache: {str(e)}")
+        return 0
+
 def get_popular_coins_service(limit=10):
     """
     Get a list of popular coins.
@@ -161,4 +267,40 @@ def get_top_volume_service(limit=20):
         return get_top_volume(limit)
     except Exception as e:
         logger.error(f"Error in get_top_volume_service: {str(e)}")
-        return []
\ No newline at end of file
+        return []
+
+def get_home_market_fragments():
+    """
+    Get the rendered popular-coins and new-listings fragments of the home page.
+    The HTML is the same for every user, so it is rendered once per TTL and
+    shared through the dashboard cache.
+    
+    Returns:
+        Dictionary with 'popular_coins' and 'new_listings' HTML strings
+    """
+    from flask import current_app, render_template
+    
+    app = current_app._get_current_object()
+    
+    def render():
+        # Both lists are slices of the shared market snapshot (one upstream call)
+        popular_coins = get_popular_coins_service()
+        new_listings = get_new_listings_service()
+        
+        # Background refreshes run outside the request
+        with app.app_context():
+            return {
+                'popular_coins': render_template('components/popular_coins_rows.html',
+                                                 popular_coins=popular_coins if isinstance(popular_coins, list) else []),
+                'new_listings': render_template('components/new_listings_strip.html',
+                                                new_listings=new_listings if isinstance(new_listings, list) else []),
+                'complete': isinstance(popular_coins, list) and bool(popular_coins) and
+                            isinstance(new_listings, list) and bool(new_listings)
+            }
+    
+    try:
+        # Fragments rendered from failed fetches are shown but not cached
+        return dashboard_cache.get_or_load('home_market', render, validate=lambda fragments: fragments['complete'])
+    except Exception as e:
+        logger.error(f"Error in get_home_market_fragments: {str(e)}")
+        return {'popular_coins': '', 'new_listings': ''}
@@ -0,0 +1,402 @@
+# app/services/market_snapshot.py
+"""
+Shared market snapshot and catalogue.
+The top N coins by market cap are fetched once per interval (one
+/coins/markets call per 250 coins) and held as columns (price, market cap,
+volume, 24h change, last update). Sort orders for gainers, losers, volume and
+recency are computed once per snapshot, so the market overview, popular
+coins, new listings and top gainers/losers/volume lists are all slices of the
+same data instead of one upstream request each.
+
+The market page browses the same snapshot as a catalogue: every sortable
+column has a precomputed index in both directions, pages are addressed with
+keyset cursors (sort value plus rank of the last row, so paging stays
+consistent across refreshes) and filters are applied in-process. A
+background thread refetches the snapshot, so requests never wait on
+CoinGecko after the first build.
+"""
+import base64
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Numeric columns held per coin (overview key -> column name)
+NUMERIC_COLUMNS = {
+    'current_price': 'price',
+    'market_cap': 'market_cap',
+    'market_cap_rank': 'rank',
+    'total_volume': 'volume',
+    'price_change_percentage_24h': 'change'
+}
+
+def _column(coins, key):
+    """
+    Float64 column of a coin field; missing values are NaN.
+    """
+    values = np.full(len(coins), np.nan)
+    for position, coin in enumerate(coins):
+        value = coin.get(key)
+        if value is not None:
+            try:
+                values[position] = float(value)
+            except (TypeError, ValueError):
+                pass
+    return values
+
+def _timestamp(value):
+    """
+    Parse a CoinGecko ISO timestamp to epoch seconds (NaN if unparseable).
+    """
+    if not isinstance(value, str) or not value:
+        return np.nan
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        logger.warning(f"Error parsing date '{value}'")
+        return np.nan
+
+def _order(values, rank, descending=True):
+    """
+    Positions with a value, sorted by value (ties by market cap rank).
+    """
+    valid = np.flatnonzero(~np.isnan(values))
+    keys = -values[valid] if descending else values[valid]
+    return valid[np.lexsort((rank[valid], keys))]
+
+# Catalogue sort keys (query value -> column) and their default direction
+SORT_COLUMNS = {
+    'rank': 'rank',
+    'change': 'change',
+    'volume': 'volume',
+    'market_cap': 'market_cap'
+}
+DEFAULT_DESCENDING = {
+    'rank': False,
+    'change': True,
+    'volume': True,
+    'market_cap': True
+}
+
+class CatalogueIndex:
+    """
+    One sort order over the catalogue. keys and ties are the sort value and
+    rank of each position in order, both ascending, so a keyset cursor is
+    located with two binary searches. Descending indexes store negated
+    values; missing values sort last as +inf.
+    """
+
+    def __init__(self, values, tie, descending):
+        keys = np.nan_to_num(-values if descending else values, nan=np.inf, posinf=np.inf, neginf=-np.inf)
+        self.order = np.lexsort((tie, keys))
+        self.keys = keys[self.order]
+        self.ties = tie[self.order]
+        self.descending = descending
+
+    def after(self, key, tie):
+        """
+        Index of the first position strictly after (key, tie).
+        """
+        low = int(np.searchsorted(self.keys, key, side='left'))
+        high = int(np.searchsorted(self.keys, key, side='right'))
+        return low + int(np.searchsorted(self.ties[low:high], tie, side='right'))
+
+def encode_cursor(sort, descending, key, tie):
+    """
+    Opaque cursor for the row after (key, tie) in a sort order.
+    """
+    payload = json.dumps([sort, int(descending), float(key), float(tie)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor into (sort, descending, key, tie).
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        sort, descending, key, tie = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort, bool(descending), float(key), float(tie)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+class MarketSnapshot:
+    """
+    Columnar top-N market data plus precomputed sort orders and catalogue
+    indexes. Coins are kept in market cap order; every list view is an index
+    slice.
+    """
+
+    def __init__(self, coins=(), snapshot_id=0):
+        from app.services.icon_service import icon_urls
+
+        # Images point at the local icon proxy; the upstream URL is kept for it.
+        # Icon digests for every coin come from one cache read
+        coins = list(coins)
+        images = icon_urls(coin['symbol'] for coin in coins)
+        self.coins = [dict(coin, image=images[coin['symbol']], image_source=coin.get('image')) for coin in coins]
+        self.snapshot_id = snapshot_id
+        self.built_at = time.time() if self.coins else 0
+        self.index = {}
+        for position, coin in enumerate(self.coins):
+            self.index.setdefault(coin['symbol'], position)
+
+        for key, name in NUMERIC_COLUMNS.items():
+            setattr(self, name, _column(self.coins, key))
+        self.updated_at = np.array([_timestamp(coin.get('last_updated')) for coin in self.coins], dtype=np.float64)
+
+        # Unranked coins sort after ranked ones on ties
+        rank = np.nan_to_num(self.rank, nan=np.inf)
+        self.orders = {
+            'gainers': _order(self.change, rank),
+            'losers': _order(self.change, rank, descending=False),
+            'volume': _order(self.volume, rank),
+            # Coins without a timestamp go last, in rank order
+            'recent': np.concatenate((_order(self.updated_at, rank), np.flatnonzero(np.isnan(self.updated_at))))
+        }
+
+        # Unranked coins tie-break after every ranked one, in market cap order
+        tie = np.where(np.isnan(self.rank), 1e9 + np.arange(len(self.coins)), self.rank)
+        self.indexes = {
+            (sort, descending): CatalogueIndex(getattr(self, column), tie, descending)
+            for sort, column in SORT_COLUMNS.items() for descending in (False, True)
+        }
+        self.search_text = np.array([
+            f"{coin['symbol']} {coin.get('name') or ''}".lower() for coin in self.coins
+        ], dtype=str)
+
+        # Compact rows used by the home page lists
+        self.summaries = [{
+            'symbol': coin['symbol'],
+            'name': coin.get('name') or 'Unknown',
+            'price': coin.get('current_price') or 0,
+            'change_24h': coin.get('price_change_percentage_24h') or 0.0,
+            'image': coin.get('image')
+        } for coin in self.coins]
+
+    def __len__(self):
+        return len(self.coins)
+
+    def age(self):
+        return time.time() - self.built_at if self.built_at else None
+
+    def overview(self, limit=100, offset=0):
+        """
+        Coins in market cap order (overview format).
+        """
+        return self.coins[offset:offset + limit]
+
+    def top(self, order, limit=20):
+        """
+        First coins of a precomputed order ('gainers', 'losers', 'volume' or
+        'recent') in overview format.
+        """
+        return [self.coins[position] for position in self.orders[order][:limit]]
+
+    def popular(self, limit=5):
+        """
+        Largest coins by market cap in summary format.
+        """
+        return self.summaries[:limit]
+
+    def new_listings(self, limit=5):
+        """
+        Most recently updated coins in summary format.
+        """
+        return [self.summaries[position] for position in self.orders['recent'][:limit]]
+
+    def filter_mask(self, query=None, min_price=None, max_price=None,
+                    min_market_cap=None, min_volume=None, change=None):
+        """
+        Boolean mask of coins matching every given filter, or None if no
+        filter is set.
+
+        Args:
+            query: Substring of the symbol or name (case-insensitive)
+            min_price, max_price: Price bounds in USD
+            min_market_cap: Minimum market cap in USD
+            min_volume: Minimum 24h volume in USD
+            change: 'up' or 'down' for 24h gainers or losers only
+        """
+        mask = np.ones(len(self.coins), dtype=bool)
+        filtered = False
+        if query:
+            mask &= np.char.find(self.search_text, query.strip().lower()) >= 0
+            filtered = True
+        # NaN compares False, so coins missing a bounded field are excluded
+        for column, bound, lower in ((self.price, min_price, True), (self.price, max_price, False),
+                                     (self.market_cap, min_market_cap, True), (self.volume, min_volume, True)):
+            if bound is not None:
+                mask &= column >= bound if lower else column <= bound
+                filtered = True
+        if change in ('up', 'down'):
+            mask &= self.change > 0 if change == 'up' else self.change < 0
+            filtered = True
+        return mask if filtered else None
+
+    def page(self, sort='rank', descending=None, limit=100, cursor=None, **filters):
+        """
+        One page of the catalogue.
+
+        Args:
+            sort: 'rank', 'change', 'volume' or 'market_cap'
+            descending: Sort direction (defaults to the sort's natural one)
+            limit: Page size
+            cursor: next_cursor of the previous page
+            **filters: See filter_mask
+
+        Returns:
+            Dictionary with the page's coins, next_cursor (None on the last
+            page) and the number of matching coins
+
+        Raises:
+            ValueError: If the sort or cursor is invalid
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort '{sort}'")
+        if descending is None:
+            descending = DEFAULT_DESCENDING[sort]
+        index = self.indexes[(sort, descending)]
+
+        start = 0
+        if cursor:
+            cursor_sort, cursor_descending, key, tie = decode_cursor(cursor)
+            if (cursor_sort, cursor_descending) != (sort, descending):
+                raise ValueError("Cursor does not match the requested sort")
+            start = index.after(key, tie)
+
+        positions = np.arange(start, len(index.order))
+        mask = self.filter_mask(**filters)
+        if mask is not None:
+            positions = positions[mask[index.order[start:]]]
+            total = int(mask.sum())
+        else:
+            total = len(self.coins)
+
+        selected = positions[:limit]
+        next_cursor = None
+        if len(positions) > limit and len(selected):
+            last = selected[-1]
+            next_cursor = encode_cursor(sort, descending, index.keys[last], index.ties[last])
+
+        return {
+            'data': [self.coins[position] for position in index.order[selected]],
+            'next_cursor': next_cursor,
+            'total': total
+        }
+
+    def get(self, symbol):
+        """
+        Overview entry for a symbol, or None if it is outside the top N.
+        """
+        position = self.index.get(symbol.upper())
+        return None if position is None else self.coins[position]
+
+# Process-wide snapshot (empty until the first successful fetch)
+market_snapshot = MarketSnapshot()
+_rebuild_lock = threading.Lock()
+_last_attempt = 0
+_refresher = None
+_refresher_lock = threading.Lock()
+
+def refresh_market_snapshot(max_age_seconds=None, blocking=True):
+    """
+    Refetch the snapshot unless it is younger than max_age_seconds or another
+    thread is already refetching it. The raw response goes through the shared
+    market cache, so workers sharing a Redis backend make one upstream call
+    between them.
+
+    Args:
+        max_age_seconds: Maximum age of the snapshot in seconds
+        blocking: Wait for a refetch already in progress
+
+    Returns:
+        MarketSnapshot instance (empty if no fetch has succeeded yet)
+    """
+    global market_snapshot, _last_attempt
+    from app.utils.crypto_api import fetch_coin_markets, market_cache
+
+    max_age_seconds = max_age_seconds or Config.MARKET_SNAPSHOT_INTERVAL
+    if not _rebuild_lock.acquire(blocking=blocking):
+        return market_snapshot
+    try:
+        age = market_snapshot.age()
+        if age is not None and age <= max_age_seconds:
+            return market_snapshot
+        _last_attempt = time.time()
+        size = Config.MARKET_SNAPSHOT_SIZE
+        coins = market_cache.get_or_load(
+            f"snapshot:{size}", lambda: fetch_coin_markets(size),
+            ttl=max_age_seconds, validate=bool
+        )
+        if coins:
+            market_snapshot = MarketSnapshot(coins, market_snapshot.snapshot_id + 1)
+            logger.info(f"Market snapshot built for {len(coins)} coins")
+    except Exception as e:
+        logger.error(f"Error refreshing market snapshot: {str(e)}")
+    finally:
+        _rebuild_lock.release()
+    return market_snapshot
+
+def _run_refresher():
+    while True:
+        interval = Config.MARKET_SNAPSHOT_INTERVAL
+        snapshot = refresh_market_snapshot(interval)
+        # Retry sooner while fetches are failing
+        age = snapshot.age()
+        wait = interval - age if age is not None and age < interval else Config.MARKET_SNAPSHOT_RETRY_INTERVAL
+        time.sleep(max(wait, 1.0))
+
+def ensure_refresher_started():
+    """
+    Start the background refresh thread if enabled and not yet running.
+    """
+    global _refresher
+    if not Config.MARKET_SNAPSHOT_BACKGROUND_REFRESH:
+        return
+    if _refresher is not None and _refresher.is_alive():
+        return
+    with _refresher_lock:
+        if _refresher is not None and _refresher.is_alive():
+            return
+        _refresher = threading.Thread(target=_run_refresher, name='market-snapshot', daemon=True)
+        _refresher.start()
+        logger.info(f"Market snapshot refresher started (every {Config.MARKET_SNAPSHOT_INTERVAL}s)")
+
+def get_market_snapshot(max_age_seconds=None):
+    """
+    Get the market snapshot. With the background refresher running, requests
+    only wait for the very first fetch; otherwise the requesting thread
+    refetches a snapshot older than max_age_seconds while other threads keep
+    reading the previous one.
+
+    Args:
+        max_age_seconds: Maximum age of the snapshot in seconds
+
+    Returns:
+        MarketSnapshot instance (empty if no fetch has succeeded yet)
+    """
+    ensure_refresher_started()
+
+    max_age_seconds = max_age_seconds or Config.MARKET_SNAPSHOT_INTERVAL
+    age = market_snapshot.age()
+    if age is not None and (age <= max_age_seconds or (_refresher is not None and _refresher.is_alive())):
+        return market_snapshot
+
+    # Don't hammer CoinGecko while it is failing
+    if time.time() - _last_attempt < Config.MARKET_SNAPSHOT_RETRY_INTERVAL:
+        return market_snapshot
+
+    return refresh_market_snapshot(max_age_seconds, blocking=age is None)
+
+def get_market_catalogue(sort='rank', descending=None, limit=100, cursor=None, **filters):
+    """
+    One page of the market catalogue (see MarketSnapshot.page).
+    """
+    return get_market_snapshot().page(sort, descending, limit, cursor, **filters)
@@ -0,0 +1,271 @@
+# app/services/matching_engine.py
+"""
+Open-order matching engine.
+Groups resting orders by currency pair, prices each pair once and finds every
+fillable order with NumPy boolean masks. Fills are applied in chunked bulk
+transactions instead of one commit per order. Between full sweeps, price ticks
+are matched through the in-memory order book index.
+"""
+import logging
+import time
+from collections import defaultdict
+import numpy as np
+from app import db
+from app.config import Config
+from app.models.order import Order
+from app.services.market_service import get_current_prices_service as get_current_prices
+from app.services.order_book import order_book
+from app.services.ledger_service import post_entries
+from app.services.order_service import apply_fill, fill_order
+
+logger = logging.getLogger(__name__)
+
+# Metrics from the most recent sweep, for monitoring and interval sizing
+last_sweep_metrics = {}
+
+def compute_fill_mask(order_prices, is_buy, is_sell, is_limit, is_stop, current_price):
+    """
+    Find fillable orders for one currency pair in a single vectorized pass.
+
+    Args:
+        order_prices: float64 array of limit/stop prices
+        is_buy: Boolean array, True for buy orders
+        is_sell: Boolean array, True for sell orders
+        is_limit: Boolean array, True for limit orders
+        is_stop: Boolean array, True for stop orders
+        current_price: Current market price for the pair
+
+    Returns:
+        Boolean array, True for orders whose conditions are met
+    """
+    at_or_below = current_price <= order_prices
+    at_or_above = current_price >= order_prices
+
+    # Buy limits fill when price drops to the limit, sell limits when it rises to it
+    limit_fills = is_limit & ((is_buy & at_or_below) | (is_sell & at_or_above))
+
+    # Buy stops fill when price rises to the stop, sell stops when it drops to it
+    stop_fills = is_stop & ((is_buy & at_or_above) | (is_sell & at_or_below))
+
+    return limit_fills | stop_fills
+
+def match_orders(rows, prices):
+    """
+    Match open orders against current prices.
+
+    Args:
+        rows: Iterable of (id, currency_pair, side, order_type, price) tuples
+        prices: Dictionary mapping currency pair to current price
+
+    Returns:
+        List of (order_id, execution_price) tuples for fillable orders
+    """
+    by_pair = defaultdict(list)
+    for row in rows:
+        by_pair[row[1]].append(row)
+
+    matches = []
+    for currency_pair, pair_rows in by_pair.items():
+        current_price = prices.get(currency_pair, 0)
+
+        if current_price <= 0:
+            logger.warning(f"Could not get valid price for {currency_pair}")
+            continue
+
+        count = len(pair_rows)
+        order_ids = np.fromiter((row[0] for row in pair_rows), dtype=np.int64, count=count)
+        sides = np.array([row[2] for row in pair_rows])
+        order_types = np.array([row[3] for row in pair_rows])
+        order_prices = np.fromiter((row[4] for row in pair_rows), dtype=np.float64, count=count)
+
+        mask = compute_fill_mask(
+            order_prices,
+            sides == 'buy',
+            sides == 'sell',
+            order_types == 'limit',
+            order_types == 'stop',
+            current_price
+        )
+
+        matches.extend((int(order_id), current_price) for order_id in order_ids[mask])
+
+    return matches
+
+def apply_fills(matches):
+    """
+    Apply a chunk of fills in a single transaction.
+    If the bulk commit fails, the chunk is retried order by order so one bad
+    order does not block the rest.
+
+    Args:
+        matches: List of (order_id, execution_price) tuples
+
+    Returns:
+        Tuple of (filled_count, failed_count)
+    """
+    execution_prices = dict(matches)
+
+    # Orders may have been canceled or filled since they were matched
+    orders = Order.query.filter(
+        Order.id.in_(list(execution_prices)),
+        Order.status == 'open'
+    ).all()
+
+    # Matched orders leave the book whether they fill now or were already closed
+    for order_id in execution_prices:
+        order_book.remove_order(order_id)
+
+    if not orders:
+        return 0, 0
+
+    try:
+        # The chunk's ledger entries are posted in one set-based batch
+        journal = []
+        filled = 0
+        for order in orders:
+            if apply_fill(order, execution_prices[order.id], journal) is not None:
+                filled += 1
+        post_entries(journal)
+        db.session.commit()
+        return filled, len(orders) - filled
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Bulk fill of {len(orders)} orders failed, retrying individually: {str(e)}")
+
+    filled = 0
+    failed = 0
+    for order_id, execution_price in matches:
+        order = Order.query.filter_by(id=order_id, status='open').first()
+        if not order:
+            continue
+        if fill_order(order, execution_price):
+            filled += 1
+        else:
+            failed += 1
+    return filled, failed
+
+def run_matching_sweep(chunk_size=None):
+    """
+    Run one matching sweep over all open orders.
+
+    Args:
+        chunk_size: Number of fills committed per transaction
+
+    Returns:
+        Dictionary with sweep metrics
+    """
+    global last_sweep_metrics
+
+    chunk_size = chunk_size or Config.MATCHING_ENGINE_CHUNK_SIZE
+    started = time.perf_counter()
+
+    # Only the columns needed for matching, not full ORM objects
+    rows = db.session.query(
+        Order.id, Order.currency_pair, Order.side, Order.order_type, Order.price
+    ).filter(Order.status == 'open').all()
+
+    # The full scan doubles as a resync of the order book index
+    order_book.rebuild_from_rows(rows)
+
+    metrics = {
+        'orders_scanned': len(rows),
+        'pairs': 0,
+        'orders_matched': 0,
+        'orders_filled': 0,
+        'orders_failed': 0,
+        'match_seconds': 0.0,
+        'fill_seconds': 0.0,
+        'duration_seconds': 0.0,
+        'orders_per_second': 0.0,
+        'finished_at': None
+    }
+
+    if not rows:
+        logger.info("No open orders to process")
+    else:
+        logger.info(f"Processing {len(rows)} open orders")
+
+        # One price per pair, resolved in one batched lookup
+        pairs = {row[1] for row in rows}
+        metrics['pairs'] = len(pairs)
+        prices = get_current_prices(list(pairs))
+
+        matches = match_orders(rows, prices)
+        metrics['orders_matched'] = len(matches)
+        metrics['match_seconds'] = time.perf_counter() - started
+
+        fill_started = time.perf_counter()
+        for offset in range(0, len(matches), chunk_size):
+            filled, failed = apply_fills(matches[offset:offset + chunk_size])
+            metrics['orders_filled'] += filled
+            metrics['orders_failed'] += failed
+        metrics['fill_seconds'] = time.perf_counter() - fill_started
+
+    duration = time.perf_counter() - started
+    metrics['duration_seconds'] = duration
+    metrics['orders_per_second'] = len(rows) / duration if duration > 0 else 0.0
+    metrics['finished_at'] = time.time()
+
+    last_sweep_metrics = metrics
+
+    if rows:
+        logger.info(
+            f"Matching sweep: {metrics['orders_scanned']} scanned, {metrics['orders_matched']} matched, "
+            f"{metrics['orders_filled']} filled in {duration:.3f}s ({metrics['orders_per_second']:.0f} orders/s)"
+        )
+
+    return metrics
+
+def process_price_ticks(prices=None, chunk_size=None):
+    """
+    Match price ticks against the order book index.
+    Only orders whose trigger levels were crossed are loaded and filled.
+
+    Args:
+        prices: Optional dictionary mapping currency pair to price; when
+            omitted, every pair with resting orders is priced in one lookup
+        chunk_size: Number of fills committed per transaction
+
+    Returns:
+        Dictionary with tick metrics
+    """
+    chunk_size = chunk_size or Config.MATCHING_ENGINE_CHUNK_SIZE
+    started = time.perf_counter()
+
+    order_book.sync_from_db()
+
+    if prices is None:
+        pairs = order_book.pairs()
+        prices = get_current_prices(pairs) if pairs else {}
+
+    matches = []
+    for currency_pair, current_price in prices.items():
+        if not current_price or current_price <= 0:
+            continue
+        matches.extend(
+            (order_id, current_price)
+            for order_id in order_book.crossed_orders(currency_pair, current_price)
+        )
+
+    metrics = {
+        'pairs': len(prices),
+        'orders_matched': len(matches),
+        'orders_filled': 0,
+        'orders_failed': 0,
+        'duration_seconds': 0.0
+    }
+
+    for offset in range(0, len(matches), chunk_size):
+        filled, failed = apply_fills(matches[offset:offset + chunk_size])
+        metrics['orders_filled'] += filled
+        metrics['orders_failed'] += failed
+
+    metrics['duration_seconds'] = time.perf_counter() - started
+
+    if matches:
+        logger.info(
+            f"Price tick: {metrics['orders_matched']} crossed, {metrics['orders_filled']} filled "
+            f"in {metrics['duration_seconds']:.3f}s"
+        )
+
+    return metrics
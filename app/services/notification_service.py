@@ -5,13 +5,13 @@ Handles OTP verification, transaction notifications, and system announcements.
 """
 import os
 import smtplib
-import requests
 import logging
 import json
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 from app.config import Config
+from app.utils.http_client import http_client
 from app.models.user import User
 from app import db
 
@@ -270,7 +270,7 @@ class NotificationService:
             headers = json.loads(Config.SMS_API_HEADERS) if Config.SMS_API_HEADERS else {}
             
             # Make request
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=payload if 'json' in headers.get('Content-Type', '') else None,
                 data=payload if 'json' not in headers.get('Content-Type', '') else None,
@@ -410,7 +410,7 @@ class NotificationService:
             }
             
             # Send request
-            response = requests.post(
+            response = http_client.post(
                 "https://onesignal.com/api/v1/notifications",
                 headers={
                     "Authorization": f"Basic {Config.ONESIGNAL_API_KEY}",
@@ -0,0 +1,233 @@
+# app/services/order_book.py
+"""
+In-memory order book index.
+Keeps resting limit and stop orders per currency pair in price-sorted ladders
+so a price tick only touches the orders whose trigger levels were crossed.
+"""
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class PairOrderBook:
+    """
+    Price-sorted trigger ladders for one currency pair.
+
+    Each ladder is a sorted list of (price, order_id) tuples. Finding the
+    crossed orders for a tick is a bisect plus a slice: O(log n + k).
+    """
+
+    LADDERS = ('buy_limit', 'sell_limit', 'buy_stop', 'sell_stop')
+
+    def __init__(self, currency_pair):
+        self.currency_pair = currency_pair
+        self.ladders = {name: [] for name in self.LADDERS}
+        self._entries = {}  # order_id -> (ladder name, price)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, order_id):
+        return order_id in self._entries
+
+    def add(self, order_id, side, order_type, price):
+        """
+        Add an order to the matching ladder.
+
+        Returns:
+            Boolean indicating whether the order was added
+        """
+        ladder = f"{side}_{order_type}"
+        if ladder not in self.ladders or order_id in self._entries:
+            return False
+        price = float(price)
+        bisect.insort(self.ladders[ladder], (price, order_id))
+        self._entries[order_id] = (ladder, price)
+        return True
+
+    def remove(self, order_id):
+        """
+        Remove an order from its ladder.
+
+        Returns:
+            Boolean indicating whether the order was present
+        """
+        entry = self._entries.pop(order_id, None)
+        if entry is None:
+            return False
+        ladder, price = entry
+        levels = self.ladders[ladder]
+        index = bisect.bisect_left(levels, (price, order_id))
+        if index < len(levels) and levels[index] == (price, order_id):
+            del levels[index]
+        return True
+
+    def crossed(self, current_price):
+        """
+        Get the orders whose trigger levels are crossed at the current price.
+
+        Args:
+            current_price: Current market price for the pair
+
+        Returns:
+            List of order IDs
+        """
+        low_key = (current_price, float('-inf'))
+        high_key = (current_price, float('inf'))
+        order_ids = []
+
+        # Buy limits fill at or below their price: every level >= current price
+        levels = self.ladders['buy_limit']
+        order_ids.extend(order_id for _, order_id in levels[bisect.bisect_left(levels, low_key):])
+
+        # Sell limits fill at or above their price: every level <= current price
+        levels = self.ladders['sell_limit']
+        order_ids.extend(order_id for _, order_id in levels[:bisect.bisect_right(levels, high_key)])
+
+        # Buy stops trigger at or above their price: every level <= current price
+        levels = self.ladders['buy_stop']
+        order_ids.extend(order_id for _, order_id in levels[:bisect.bisect_right(levels, high_key)])
+
+        # Sell stops trigger at or below their price: every level >= current price
+        levels = self.ladders['sell_stop']
+        order_ids.extend(order_id for _, order_id in levels[bisect.bisect_left(levels, low_key):])
+
+        return order_ids
+
+class OrderBookIndex:
+    """
+    Per-process index of all resting orders, keyed by currency pair.
+
+    The index is rebuilt from the database on first use and kept in sync by
+    place_order and cancel_order. Orders placed by other processes are picked
+    up by sync_from_db; entries for orders canceled elsewhere are dropped when
+    the fill path finds them no longer open.
+    """
+
+    def __init__(self):
+        self.books = {}
+        self.loaded = False
+        self._last_synced_id = 0
+        self._lock = threading.RLock()
+
+    def _book(self, currency_pair):
+        book = self.books.get(currency_pair)
+        if book is None:
+            book = self.books[currency_pair] = PairOrderBook(currency_pair)
+        return book
+
+    def _load_rows(self, rows):
+        for order_id, currency_pair, side, order_type, price in rows:
+            self._book(currency_pair).add(order_id, side, order_type, price)
+            self._last_synced_id = max(self._last_synced_id, order_id)
+
+    def rebuild_from_rows(self, rows):
+        """
+        Replace the index contents with the given open-order rows.
+
+        Args:
+            rows: Iterable of (id, currency_pair, side, order_type, price) tuples
+        """
+        with self._lock:
+            self.books = {}
+            self._last_synced_id = 0
+            self._load_rows(rows)
+            self.loaded = True
+
+    def _query_open_orders(self, after_id=0):
+        from app import db
+        from app.models.order import Order
+
+        return db.session.query(
+            Order.id, Order.currency_pair, Order.side, Order.order_type, Order.price
+        ).filter(Order.status == 'open', Order.id > after_id).all()
+
+    def rebuild_from_db(self):
+        """
+        Rebuild the whole index from open orders in the database.
+        """
+        rows = self._query_open_orders()
+        self.rebuild_from_rows(rows)
+        logger.info(f"Order book index rebuilt with {len(rows)} open orders across {len(self.books)} pairs")
+
+    def ensure_loaded(self):
+        """
+        Rebuild the index from the database if it has not been loaded yet.
+        """
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.rebuild_from_db()
+
+    def sync_from_db(self):
+        """
+        Add open orders created since the last sync (e.g., by other processes).
+
+        Returns:
+            Number of rows loaded
+        """
+        self.ensure_loaded()
+        rows = self._query_open_orders(after_id=self._last_synced_id)
+        with self._lock:
+            self._load_rows(rows)
+        return len(rows)
+
+    def add_order(self, order):
+        """
+        Add a newly placed order to the index.
+        """
+        if not self.loaded:
+            return False
+        with self._lock:
+            return self._book(order.currency_pair).add(order.id, order.side, order.order_type, order.price)
+
+    def remove_order(self, order_id, currency_pair=None):
+        """
+        Remove an order from the index.
+
+        Args:
+            order_id: Order ID
+            currency_pair: Optional pair, avoids searching every book
+        """
+        with self._lock:
+            if currency_pair is not None:
+                book = self.books.get(currency_pair)
+                return book.remove(order_id) if book else False
+            for book in self.books.values():
+                if book.remove(order_id):
+                    return True
+            return False
+
+    def pairs(self):
+        """
+        Get the currency pairs that have resting orders.
+        """
+        with self._lock:
+            return [pair for pair, book in self.books.items() if len(book)]
+
+    def crossed_orders(self, currency_pair, current_price):
+        """
+        Get the orders crossed by a price tick for one pair.
+
+        Returns:
+            List of order IDs
+        """
+        with self._lock:
+            book = self.books.get(currency_pair)
+            return book.crossed(current_price) if book else []
+
+    def stats(self):
+        """
+        Get index size for monitoring.
+        """
+        with self._lock:
+            return {
+                'loaded': self.loaded,
+                'pairs': len(self.books),
+                'orders': sum(len(book) for book in self.books.values()),
+                'last_synced_id': self._last_synced_id
+            }
+
+# Process-wide order book index
+order_book = OrderBookIndex()
@@ -1,10 +1,12 @@
 # app/services/order_service.py
 from datetime import datetime
+from sqlalchemy.orm.attributes import set_committed_value
 from app import db
 from app.models.order import Order
-from app.models.wallet import Wallet
 from app.models.transaction import Transaction
-from app.services.market_service import get_current_price_service as get_current_price
+from app.services.ledger_service import (
+    TRADING, atomic, entry, post_entries, post_entry, system_account, to_amount, user_account
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,55 +15,97 @@ def process_open_orders():
     """
     Process all open orders to check if they can be filled based on current market prices.
     This function would typically be called from a scheduled task or background worker.
+    
+    Returns:
+        Dictionary with sweep metrics (see matching_engine.run_matching_sweep)
     """
     try:
-        # Get all open orders
-        open_orders = Order.query.filter_by(status='open').all()
+        from app.services.matching_engine import run_matching_sweep
+        return run_matching_sweep()
+    except Exception as e:
+        logger.error(f"Error in process_open_orders: {str(e)}")
+        return None
+
+def reserved_funds(side, currency_pair, price, amount):
+    """
+    Funds an open order holds: the quote currency cost of a buy, the base
+    currency amount of a sell.
+    
+    Returns:
+        Tuple of (currency, Decimal amount)
+    """
+    base_currency, quote_currency = currency_pair.split('/')
+    if side == 'buy':
+        return quote_currency, to_amount(price * amount)
+    return base_currency, to_amount(amount)
+
+def place_order(user_id, currency_pair, order_type, side, price, amount):
+    """
+    Create an order and reserve its funds against the trading account in one
+    transaction; the balance is checked under the wallet lock.
+    
+    Args:
+        user_id: User ID
+        currency_pair: Currency pair (e.g., 'BTC/USDT')
+        order_type: 'limit', 'stop' or 'stop-limit'
+        side: 'buy' or 'sell'
+        price: Order price
+        amount: Order amount in the base currency
+    
+    Returns:
+        The committed Order
+    
+    Raises:
+        InsufficientFunds: If the wallet can't cover the reservation
+    """
+    currency, reserve = reserved_funds(side, currency_pair, price, amount)
+    
+    def create():
+        order = Order(
+            user_id=user_id,
+            currency_pair=currency_pair,
+            order_type=order_type,
+            side=side,
+            price=price,
+            amount=amount
+        )
+        db.session.add(order)
+        db.session.flush()
         
-        if not open_orders:
-            logger.info("No open orders to process")
-            return
-            
-        logger.info(f"Processing {len(open_orders)} open orders")
+        post_entry('order_reserve', [
+            (user_account(user_id, currency), -reserve),
+            (system_account(TRADING, currency), reserve)
+        ], reference=f"order:{order.id}")
+        return order
+    
+    return atomic(create)
+
+def cancel_order(order_id, user_id):
+    """
+    Cancel an open order and release the funds reserved for its unfilled part.
+    The status change is conditional, so an order is released only once even
+    if it is canceled twice concurrently.
+    
+    Returns:
+        The canceled Order, or None if it was not open
+    """
+    def cancel():
+        canceled = Order.query.filter_by(id=order_id, user_id=user_id, status='open').update({
+            Order.status: 'canceled',
+            Order.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+        if not canceled:
+            return None
         
-        for order in open_orders:
-            try:
-                # Get current price for the currency pair
-                current_price = get_current_price(order.currency_pair)
-                
-                if current_price <= 0:
-                    logger.warning(f"Could not get valid price for {order.currency_pair}")
-                    continue
-                
-                # Check if order conditions are met
-                should_fill = False
-                
-                if order.order_type == 'limit':
-                    # For buy limit orders, fill when price drops to or below limit price
-                    if order.side == 'buy' and current_price <= order.price:
-                        should_fill = True
-                    # For sell limit orders, fill when price rises to or above limit price
-                    elif order.side == 'sell' and current_price >= order.price:
-                        should_fill = True
-                
-                elif order.order_type == 'stop':
-                    # For buy stop orders, fill when price rises to or above stop price
-                    if order.side == 'buy' and current_price >= order.price:
-                        should_fill = True
-                    # For sell stop orders, fill when price drops to or below stop price
-                    elif order.side == 'sell' and current_price <= order.price:
-                        should_fill = True
-                
-                # If conditions are met, fill the order
-                if should_fill:
-                    logger.info(f"Filling order {order.id} at price {current_price}")
-                    fill_order(order, current_price)
-                    
-            except Exception as e:
-                logger.error(f"Error processing order {order.id}: {str(e)}")
+        order = db.session.get(Order, order_id, populate_existing=True)
+        currency, release = reserved_funds(order.side, order.currency_pair, order.price, order.amount - (order.filled_amount or 0))
+        post_entry('order_cancel', [
+            (user_account(user_id, currency), release),
+            (system_account(TRADING, currency), -release)
+        ], reference=f"order:{order.id}")
+        return order
     
-    except Exception as e:
-        logger.error(f"Error in process_open_orders: {str(e)}")
+    return atomic(cancel)
 
 def fill_order(order, execution_price):
     """
@@ -75,64 +119,9 @@ def fill_order(order, execution_price):
         Boolean indicating success or failure
     """
     try:
-        # Extract currencies from the pair
-        currency_parts = order.currency_pair.split('/')
-        if len(currency_parts) != 2:
-            logger.error(f"Invalid currency pair format: {order.currency_pair}")
+        if not apply_fill(order, execution_price):
             return False
-            
-        base_currency, quote_currency = currency_parts
         
-        # Calculate total cost/proceeds
-        total_cost = execution_price * order.amount
-        
-        # Update order status
-        order.status = 'filled'
-        order.filled_amount = order.amount
-        order.filled_at = datetime.utcnow()
-        
-        # Handle wallet updates
-        if order.side == 'buy':
-            # When buying, add base currency to wallet
-            base_wallet = Wallet.query.filter_by(user_id=order.user_id, currency=base_currency).first()
-            
-            if not base_wallet:
-                base_wallet = Wallet(user_id=order.user_id, currency=base_currency, spot_balance=0)
-                db.session.add(base_wallet)
-            
-            base_wallet.spot_balance += order.amount
-            
-            # If the execution price is lower than the limit price, refund the difference
-            if execution_price < order.price:
-                quote_wallet = Wallet.query.filter_by(user_id=order.user_id, currency=quote_currency).first()
-                if quote_wallet:
-                    refund_amount = (order.price - execution_price) * order.amount
-                    quote_wallet.spot_balance += refund_amount
-        
-        elif order.side == 'sell':
-            # When selling, add quote currency to wallet
-            quote_wallet = Wallet.query.filter_by(user_id=order.user_id, currency=quote_currency).first()
-            
-            if not quote_wallet:
-                quote_wallet = Wallet(user_id=order.user_id, currency=quote_currency, spot_balance=0)
-                db.session.add(quote_wallet)
-            
-            quote_wallet.spot_balance += total_cost
-        
-        # Create transaction records
-        transaction = Transaction(
-            user_id=order.user_id,
-            transaction_type='trade',
-            status='completed',
-            currency=base_currency if order.side == 'buy' else quote_currency,
-            amount=order.amount if order.side == 'buy' else total_cost,
-            fee=0,  # You could implement trading fees here
-            from_wallet='spot',
-            to_wallet='spot',
-            notes=f"{order.side.capitalize()} {order.amount} {base_currency} at {execution_price} {quote_currency} per {base_currency}"
-        )
-        
-        db.session.add(transaction)
         db.session.commit()
         
         logger.info(f"Order {order.id} filled successfully at price {execution_price}")
@@ -141,4 +130,93 @@ def fill_order(order, execution_price):
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error filling order {order.id}: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def apply_fill(order, execution_price, journal=None):
+    """
+    Apply a fill to the session without committing.
+    Used by fill_order and by the matching engine's chunked bulk transactions.
+    
+    Args:
+        order: Order object to fill
+        execution_price: Price at which the order is executed
+        journal: Optional list collecting ledger entries to post in one batch;
+            when omitted the fill is posted to the ledger immediately
+    
+    Returns:
+        The created Transaction, or None if the order could not be filled or
+        is no longer open
+    """
+    # Extract currencies from the pair
+    currency_parts = order.currency_pair.split('/')
+    if len(currency_parts) != 2:
+        logger.error(f"Invalid currency pair format: {order.currency_pair}")
+        return None
+        
+    base_currency, quote_currency = currency_parts
+    
+    # Calculate total cost/proceeds
+    total_cost = execution_price * order.amount
+    
+    # Claim the order; the status change is conditional, so an order canceled
+    # (or filled) since it was loaded is skipped rather than filled
+    now = datetime.utcnow()
+    claimed = Order.query.filter_by(id=order.id, status='open').update({
+        Order.status: 'filled',
+        Order.filled_amount: order.amount,
+        Order.filled_at: now,
+        Order.updated_at: now
+    }, synchronize_session=False)
+    if not claimed:
+        logger.info(f"Order {order.id} is no longer open, skipping fill")
+        return None
+    
+    # Keep the loaded object in step without flushing a second UPDATE
+    for attribute, value in (('status', 'filled'), ('filled_amount', order.amount), ('filled_at', now), ('updated_at', now)):
+        set_committed_value(order, attribute, value)
+    
+    # Wallet updates, balanced against the trading account
+    if order.side == 'buy':
+        # When buying, add base currency to wallet
+        postings = [
+            (user_account(order.user_id, base_currency), order.amount),
+            (system_account(TRADING, base_currency), -to_amount(order.amount))
+        ]
+        
+        # If the execution price is lower than the limit price, refund the difference
+        if execution_price < order.price:
+            refund_amount = to_amount((order.price - execution_price) * order.amount)
+            postings.append((user_account(order.user_id, quote_currency), refund_amount))
+            postings.append((system_account(TRADING, quote_currency), -refund_amount))
+    
+    elif order.side == 'sell':
+        # When selling, add quote currency to wallet
+        postings = [
+            (user_account(order.user_id, quote_currency), total_cost),
+            (system_account(TRADING, quote_currency), -to_amount(total_cost))
+        ]
+    
+    else:
+        postings = []
+    
+    fill_entry = entry('trade', postings, reference=f"order:{order.id}")
+    if journal is None:
+        post_entries([fill_entry])
+    else:
+        journal.append(fill_entry)
+    
+    # Create transaction records
+    transaction = Transaction(
+        user_id=order.user_id,
+        transaction_type='trade',
+        status='completed',
+        currency=base_currency if order.side == 'buy' else quote_currency,
+        amount=order.amount if order.side == 'buy' else total_cost,
+        fee=0,  # You could implement trading fees here
+        from_wallet='spot',
+        to_wallet='spot',
+        notes=f"{order.side.capitalize()} {order.amount} {base_currency} at {execution_price} {quote_currency} per {base_currency}"
+    )
+    
+    db.session.add(transaction)
+    return transaction
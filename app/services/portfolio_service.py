@@ -0,0 +1,247 @@
+# app/services/portfolio_service.py
+"""
+Portfolio valuation engine.
+Holdings are valued against one shared price snapshot per rate-graph build:
+USDT rates are gathered from the matrix in one vectorized read, currencies
+the graph can't price are resolved once per snapshot, and every user is
+valued from that snapshot with exact minor-unit math. Each user's valuation
+is cached under (wallet versions, snapshot id), so it is recomputed only
+when one of their balances changes or a new snapshot is built.
+"""
+import logging
+import threading
+import time
+import numpy as np
+from sqlalchemy import select
+from app import db
+from app.config import Config
+from app.models.wallet import Wallet
+from app.utils.cache import TTLCache
+from app.utils.money import from_minor_units, sum_units, value_in
+
+logger = logging.getLogger(__name__)
+
+WALLET_TYPES = ('spot', 'funding', 'futures')
+
+# Last-resort USDT rates for currencies no price source can value
+FALLBACK_RATES = {
+    'BTC': 60000.0,
+    'ETH': 3000.0,
+    'BNB': 500.0,
+    'XRP': 0.5,
+    'DOGE': 0.1,
+    'SOL': 100.0,
+    'ADA': 0.5,
+    'MATIC': 1.0,
+    'DOT': 20.0,
+    'AVAX': 30.0
+}
+
+portfolio_cache = TTLCache('portfolio', ttl=Config.PORTFOLIO_CACHE_TTL, stale_ttl=0)
+
+def snapshot_id(graph):
+    """
+    Id of a rate-graph build; built_at keeps ids unique across processes
+    sharing a cache backend.
+    """
+    return f"{graph.snapshot_id}:{graph.built_at:.6f}"
+
+class PriceSnapshot:
+    """
+    USDT rates and coin display info as of one rate-graph build. Everything
+    resolved against a snapshot is memoized until the next build replaces it
+    (or RATE_GRAPH_MAX_AGE passes, should rebuilds be failing).
+    """
+
+    def __init__(self, graph):
+        self.graph_id = snapshot_id(graph)
+        self.created_at = time.time()
+        self.id = f"{self.graph_id}/{self.created_at:.6f}"
+        self.graph = graph
+        self.rates = {'USDT': 1.0}
+        self.market_info = {}
+        self._lock = threading.Lock()
+
+    def get_rates(self, currencies):
+        """
+        Get USDT rates for currencies, resolving any not seen in this snapshot.
+
+        Returns:
+            numpy float64 array aligned with currencies
+        """
+        missing = [currency for currency in dict.fromkeys(currencies) if currency not in self.rates]
+        if missing:
+            resolved = dict(zip(missing, self.graph.rate_vector(missing, 'USDT').tolist()))
+            unpriced = [currency for currency, rate in resolved.items() if rate <= 0]
+            if unpriced:
+                resolved.update(_resolve_unpriced(unpriced))
+            with self._lock:
+                self.rates.update(resolved)
+        return np.array([self.rates[currency] for currency in currencies], dtype=np.float64)
+
+    def get_market_info(self, currencies):
+        """
+        Get name, image and 24h change per currency, read from the market
+        snapshot or fetched concurrently for currencies not seen in this snapshot.
+
+        Returns:
+            Dictionary mapping currency to info
+        """
+        missing = [currency for currency in set(currencies) if currency != 'USDT' and currency not in self.market_info]
+        if missing:
+            from app.services.icon_service import icon_urls
+            from app.services.market_snapshot import get_market_snapshot
+            from app.utils.crypto_api import fetch_concurrently, get_coin_details
+
+            # Coins in the market snapshot need no request of their own
+            market = get_market_snapshot()
+            details = {currency: market.get(currency) for currency in missing}
+            details.update(fetch_concurrently({
+                currency: (get_coin_details, currency) for currency, coin in details.items() if coin is None
+            }))
+            images = icon_urls(missing)
+            fetched = {}
+            for currency in missing:
+                coin_data = details.get(currency)
+                if not coin_data or isinstance(coin_data, Exception):
+                    continue
+                fetched[currency] = {
+                    'name': coin_data.get('name', currency),
+                    'image': images[currency],
+                    'price_change_percentage_24h': coin_data.get('price_change_percentage_24h', 0)
+                }
+            with self._lock:
+                self.market_info.update(fetched)
+        return {currency: self.market_info[currency] for currency in currencies if currency in self.market_info}
+
+def _resolve_unpriced(currencies):
+    """
+    Rates for currencies missing from the rate graph: batched price lookup,
+    then coin details, then the static fallback table.
+    """
+    from app.services.wallet_service import get_conversion_rates
+    from app.utils.crypto_api import fetch_concurrently, get_coin_details
+
+    rates = {}
+    try:
+        rates.update({currency: rate for currency, rate in get_conversion_rates(currencies, 'USDT').items() if rate > 0})
+    except Exception as e:
+        logger.error(f"Error resolving rates for {currencies}: {str(e)}")
+
+    remaining = [currency for currency in currencies if currency not in rates]
+    if remaining:
+        logger.warning(f"Could not get rates for {remaining} in USDT, using fallback")
+        details = fetch_concurrently({currency: (get_coin_details, currency) for currency in remaining})
+        for currency in remaining:
+            coin_details = details.get(currency)
+            if isinstance(coin_details, dict) and (coin_details.get('current_price') or 0) > 0:
+                rates[currency] = float(coin_details['current_price'])
+            else:
+                rates[currency] = FALLBACK_RATES.get(currency, 1.0)
+    return rates
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def get_price_snapshot():
+    """
+    Get the shared price snapshot for the current rate-graph build.
+    """
+    global _snapshot
+    from app.services.rate_service import get_rate_graph
+
+    def expired(snapshot):
+        return (snapshot is None or snapshot.graph_id != snapshot_id(graph)
+                or time.time() - snapshot.created_at > Config.RATE_GRAPH_MAX_AGE)
+
+    graph = get_rate_graph()
+    if expired(_snapshot):
+        with _snapshot_lock:
+            if expired(_snapshot):
+                _snapshot = PriceSnapshot(graph)
+    return _snapshot
+
+def empty_portfolio():
+    """
+    Portfolio structure with no holdings.
+    """
+    return {
+        'spot': {},
+        'funding': {},
+        'futures': {},
+        'total_spot_value': 0,
+        'total_funding_value': 0,
+        'total_futures_value': 0,
+        'total_value': 0,
+        'rates': {}
+    }
+
+def value_wallets(wallets, snapshot):
+    """
+    Value wallet rows against a price snapshot in one vectorized pass.
+
+    Args:
+        wallets: Rows with currency, spot_balance, funding_balance and futures_balance
+        snapshot: PriceSnapshot
+
+    Returns:
+        Portfolio dictionary (per wallet type balances and USDT values, exact
+        totals, and the rates used)
+    """
+    portfolio = empty_portfolio()
+
+    # Skip entirely empty wallets
+    wallets = [
+        wallet for wallet in wallets
+        if (wallet.spot_balance or 0) != 0 or (wallet.funding_balance or 0) != 0 or (wallet.futures_balance or 0) != 0
+    ]
+    if not wallets:
+        return portfolio
+
+    currencies = [wallet.currency for wallet in wallets]
+    rates = snapshot.get_rates(currencies)
+
+    # Rows are wallets, columns are spot/funding/futures
+    balances = [[wallet.spot_balance, wallet.funding_balance, wallet.futures_balance] for wallet in wallets]
+    values = value_in(balances, rates[:, None])
+
+    for currency, row, value_row in zip(currencies, balances, values):
+        for wallet_type, balance, value in zip(WALLET_TYPES, row, value_row):
+            portfolio[wallet_type][currency] = {
+                'balance': float(balance or 0),
+                'value_usdt': float(from_minor_units(value))
+            }
+
+    for wallet_type, total in zip(WALLET_TYPES, sum_units(values, axis=0)):
+        portfolio[f"total_{wallet_type}_value"] = float(total)
+    portfolio['total_value'] = float(sum_units(values))
+    portfolio['rates'] = dict(zip(currencies, rates.tolist()))
+    return portfolio
+
+def get_portfolio(user_id):
+    """
+    Get a user's valuation, from cache unless a balance changed or a new price
+    snapshot was built since it was computed.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Portfolio dictionary (see value_wallets)
+    """
+    wallets = db.session.execute(
+        select(Wallet.id, Wallet.version, Wallet.currency, Wallet.spot_balance,
+               Wallet.funding_balance, Wallet.futures_balance)
+        .where(Wallet.user_id == user_id)
+        .order_by(Wallet.id)
+    ).all()
+    snapshot = get_price_snapshot()
+
+    key = f"{snapshot.id}|" + ",".join(f"{wallet.id}.{wallet.version}" for wallet in wallets)
+    cached = portfolio_cache.get(user_id)
+    if cached and cached.get('key') == key:
+        return cached['portfolio']
+
+    portfolio = value_wallets(wallets, snapshot)
+    portfolio_cache.set(user_id, {'key': key, 'portfolio': portfolio})
+    return portfolio
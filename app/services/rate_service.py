@@ -0,0 +1,261 @@
+# app/services/rate_service.py
+"""
+Cross-rate service.
+Builds a dense currency x currency conversion matrix from one bulk Binance
+ticker snapshot. Every pair is resolved with the best available path (direct,
+inverse, or via a USDT/BTC/ETH hub), so any rate is an O(1) lookup until the
+next snapshot. A matrix older than RATE_GRAPH_HARD_MAX_AGE quotes nothing, so
+callers fall through to live per-pair lookups instead of an outdated rate.
+"""
+import logging
+import threading
+import time
+import numpy as np
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Quote assets used to split concatenated Binance symbols (longest match wins)
+QUOTE_ASSETS = (
+    'USDT', 'FDUSD', 'USDC', 'TUSD', 'BUSD', 'DAI',
+    'BTC', 'ETH', 'BNB', 'XRP', 'TRX', 'DOGE',
+    'EUR', 'GBP', 'TRY', 'BRL', 'AUD'
+)
+
+# Path codes stored alongside the matrix
+PATH_NONE = 0
+PATH_SELF = 1
+PATH_DIRECT = 2
+PATH_INVERSE = 3
+PATH_HUB = 4  # PATH_HUB + hub index
+
+def split_symbol(symbol, quote_assets=QUOTE_ASSETS):
+    """
+    Split a Binance symbol into (base, quote), e.g. 'ETHBTC' -> ('ETH', 'BTC').
+
+    Returns:
+        Tuple of (base, quote) or None if no known quote asset matches
+    """
+    for quote in sorted(quote_assets, key=len, reverse=True):
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return None
+
+class RateGraph:
+    """
+    Dense conversion matrix plus symbol index, rebuilt per ticker snapshot.
+    matrix[i, j] is the number of units of currency j per unit of currency i.
+    """
+
+    def __init__(self, hubs=('USDT', 'BTC', 'ETH'), hard_max_age=None):
+        self.hubs = tuple(hubs)
+        self.hard_max_age = hard_max_age or Config.RATE_GRAPH_HARD_MAX_AGE
+        self.snapshot_id = 0
+        self.built_at = 0
+        self._state = ({}, np.zeros((0, 0)), np.zeros((0, 0), dtype=np.int8))
+        self._lock = threading.Lock()
+
+    def build(self, prices, as_of=None):
+        """
+        Rebuild the matrix from a {symbol: price} ticker snapshot.
+
+        Args:
+            prices: Dictionary mapping Binance symbols to prices
+            as_of: Epoch seconds the prices are from (defaults to now)
+
+        Returns:
+            Number of currencies in the matrix
+        """
+        edges = []
+        currencies = set(self.hubs)
+        for symbol, price in prices.items():
+            try:
+                price = float(price)
+            except (TypeError, ValueError):
+                continue
+            if price <= 0:
+                continue
+            parts = split_symbol(symbol)
+            if parts is None:
+                continue
+            edges.append((parts[0], parts[1], price))
+            currencies.update(parts)
+
+        symbols = sorted(currencies)
+        index = {currency: position for position, currency in enumerate(symbols)}
+        size = len(symbols)
+
+        # Direct quotes: base -> quote at price
+        direct = np.full((size, size), np.nan)
+        if edges:
+            bases = np.fromiter((index[base] for base, _, _ in edges), dtype=np.intp, count=len(edges))
+            quotes = np.fromiter((index[quote] for _, quote, _ in edges), dtype=np.intp, count=len(edges))
+            values = np.fromiter((price for _, _, price in edges), dtype=np.float64, count=len(edges))
+            direct[bases, quotes] = values
+
+        matrix = np.full((size, size), np.nan)
+        paths = np.zeros((size, size), dtype=np.int8)
+
+        def fill(candidate, code):
+            mask = np.isnan(matrix) & ~np.isnan(candidate)
+            matrix[mask] = candidate[mask]
+            paths[mask] = code
+
+        np.fill_diagonal(matrix, 1.0)
+        np.fill_diagonal(paths, PATH_SELF)
+        fill(direct, PATH_DIRECT)
+        with np.errstate(divide='ignore'):
+            fill(1.0 / direct.T, PATH_INVERSE)
+
+        # Single-hop legs (direct or inverse) into and out of each hub
+        legs = np.where(np.isnan(direct), 1.0 / direct.T, direct)
+        for hub_position, hub in enumerate(self.hubs):
+            hub_index = index[hub]
+            fill(np.outer(legs[:, hub_index], legs[hub_index, :]), PATH_HUB + hub_position)
+
+        with self._lock:
+            self._state = (index, matrix, paths)
+            self.snapshot_id += 1
+            self.built_at = as_of or time.time()
+
+        logger.info(f"Rate graph built for {size} currencies from {len(edges)} tickers")
+        return size
+
+    def rate(self, from_currency, to_currency):
+        """
+        Get the conversion rate from one currency to another.
+
+        Returns:
+            float: Exchange rate or 0.0 if no path exists or the matrix expired
+        """
+        if from_currency == to_currency:
+            return 1.0
+        if self.expired():
+            return 0.0
+        index, matrix, _ = self._state
+        i = index.get(from_currency)
+        j = index.get(to_currency)
+        if i is None or j is None:
+            return 0.0
+        value = matrix[i, j]
+        return 0.0 if np.isnan(value) else float(value)
+
+    def rates(self, currencies, to_currency):
+        """
+        Get conversion rates from many currencies to one target.
+
+        Returns:
+            Dictionary mapping currency to rate (0.0 if no path exists)
+        """
+        return {currency: self.rate(currency, to_currency) for currency in currencies}
+
+    def rate_vector(self, currencies, to_currency):
+        """
+        Get conversion rates from many currencies to one target as an array,
+        read from the matrix in one indexed gather.
+
+        Returns:
+            numpy float64 array aligned with currencies (0.0 if no path exists
+            or the matrix expired)
+        """
+        index, matrix, _ = self._state
+        j = index.get(to_currency)
+        rates = np.array([1.0 if currency == to_currency else 0.0 for currency in currencies])
+        if j is None or self.expired():
+            return rates
+        positions = np.array([index.get(currency, -1) for currency in currencies], dtype=np.intp)
+        known = positions >= 0
+        if known.any():
+            rates[known] = np.nan_to_num(matrix[positions[known], j], nan=0.0)
+        return rates
+
+    def path(self, from_currency, to_currency):
+        """
+        Describe the path used for a pair ('direct', 'inverse', 'via USDT', ...).
+        """
+        index, _, paths = self._state
+        i = index.get(from_currency)
+        j = index.get(to_currency)
+        if i is None or j is None:
+            return None
+        code = int(paths[i, j])
+        if code == PATH_NONE:
+            return None
+        if code == PATH_SELF:
+            return 'self'
+        if code == PATH_DIRECT:
+            return 'direct'
+        if code == PATH_INVERSE:
+            return 'inverse'
+        return f"via {self.hubs[code - PATH_HUB]}"
+
+    def age(self):
+        return time.time() - self.built_at if self.built_at else None
+
+    def expired(self):
+        """
+        Whether the matrix is too old to quote from (or was never built).
+        """
+        age = self.age()
+        return age is None or age > self.hard_max_age
+
+# Process-wide rate graph
+rate_graph = RateGraph()
+_rebuild_lock = threading.Lock()
+_last_attempt = 0
+
+def get_rate_graph(max_age_seconds=None):
+    """
+    Get the rate graph, rebuilding it from the bulk ticker snapshot once it
+    is older than max_age_seconds. Only one thread rebuilds at a time; others
+    keep reading the previous matrix.
+
+    Args:
+        max_age_seconds: Maximum age of the matrix in seconds
+
+    Returns:
+        RateGraph instance
+    """
+    global _last_attempt
+    from app.utils.binance_api import get_binance_ticker_snapshot
+
+    max_age_seconds = max_age_seconds or Config.RATE_GRAPH_MAX_AGE
+    age = rate_graph.age()
+    if age is not None and age <= max_age_seconds:
+        return rate_graph
+
+    # Don't hammer the ticker endpoint while it is failing
+    if time.time() - _last_attempt < Config.RATE_GRAPH_RETRY_INTERVAL:
+        return rate_graph
+
+    if not _rebuild_lock.acquire(blocking=age is None):
+        return rate_graph
+    try:
+        age = rate_graph.age()
+        if age is not None and age <= max_age_seconds:
+            return rate_graph
+        _last_attempt = time.time()
+        snapshot, as_of = get_binance_ticker_snapshot(max_age_seconds)
+        # A stale snapshot keeps its own time, so it never looks fresh
+        if snapshot and (as_of is None or as_of > rate_graph.built_at):
+            rate_graph.build(snapshot, as_of)
+    except Exception as e:
+        logger.error(f"Error rebuilding rate graph: {str(e)}")
+    finally:
+        _rebuild_lock.release()
+    return rate_graph
+
+def get_cross_rate(from_currency, to_currency):
+    """
+    Get a conversion rate from the current rate graph.
+
+    Returns:
+        float: Exchange rate or 0.0 if unavailable
+    """
+    if from_currency == to_currency:
+        return 1.0
+    try:
+        return get_rate_graph().rate(from_currency, to_currency)
+    except Exception as e:
+        logger.error(f"Error getting cross rate {from_currency}/{to_currency}: {str(e)}")
+        return 0.0
@@ -2,7 +2,7 @@
 from app import db
 from app.models.user import User, ReferralReward
 from app.models.transaction import Transaction
-from app.models.wallet import Wallet
+from app.services.ledger_service import REWARDS, post_entry, system_account, user_account
 from datetime import datetime
 import logging
 
@@ -110,13 +110,10 @@ def process_referral_reward(user_id):
         db.session.add(reward)
         
         # Add the reward to referrer's wallet
-        wallet = Wallet.query.filter_by(user_id=referrer.id, currency='USDT').first()
-        
-        if not wallet:
-            wallet = Wallet(user_id=referrer.id, currency='USDT', spot_balance=0)
-            db.session.add(wallet)
-        
-        wallet.spot_balance += 80.0
+        post_entry('referral_reward', [
+            (user_account(referrer.id, 'USDT'), 80.0),
+            (system_account(REWARDS, 'USDT'), -80.0)
+        ], reference=f"transaction:{transaction.transaction_id}")
         
         db.session.commit()
         
@@ -133,4 +130,33 @@ def process_referral_reward(user_id):
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error processing referral reward: {str(e)}")
-        return False, f"Error processing referral reward: {str(e)}"
\ No newline at end of file
+        return False, f"Error processing referral reward: {str(e)}"
+
+def reconcile_referral_rewards():
+    """
+    Grant referral rewards that were missed when the qualifying event happened.
+    Looks at verified referred users without a reward and processes those
+    that are now eligible.
+    
+    Returns:
+        Number of rewards processed
+    """
+    candidates = User.query.filter(
+        User.referred_by.isnot(None),
+        User.is_verified == True,
+        ~User.received_rewards.any()
+    ).all()
+    
+    processed = 0
+    for user in candidates:
+        if not is_eligible_for_referral_reward(user.id):
+            continue
+        success, message = process_referral_reward(user.id)
+        if success:
+            processed += 1
+        else:
+            logger.warning(f"Referral reconciliation failed for user {user.id}: {message}")
+    
+    if processed:
+        logger.info(f"Referral reconciliation processed {processed} rewards")
+    return processed
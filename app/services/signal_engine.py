@@ -0,0 +1,324 @@
+# app/services/signal_engine.py
+"""
+Trade signal resolution engine.
+Watches live prices for every active TradeSignal and resolves it when the
+target or stop is crossed or the signal expires. Each resolved signal is
+settled set-based: one UPDATE closes all of its open positions and one
+ledger entry credits every follower's futures wallet, however many followers
+it has. Positions opened and closed by hand move their stake through the same
+trading account.
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import case, select
+from sqlalchemy.orm.exc import StaleDataError
+from app import db
+from app.models.trade_signal import TradeSignal, TradePosition
+from app.models.transaction import Transaction
+from app.services.ledger_service import TRADING, atomic, post_entry, system_account, to_amount, user_account
+from app.services.market_service import get_current_prices_service as get_current_prices
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_TARGET = 'target'
+OUTCOME_STOP = 'stop'
+OUTCOME_EXPIRED = 'expired'
+
+def detect_outcome(signal_type, target_price, stop_loss, price, expired=False):
+    """
+    Decide whether a signal resolves at the current price.
+
+    Returns:
+        'target', 'stop', 'expired' or None if the signal stays open
+    """
+    if price and price > 0:
+        if signal_type == 'buy':
+            if price >= target_price:
+                return OUTCOME_TARGET
+            if price <= stop_loss:
+                return OUTCOME_STOP
+        else:
+            if price <= target_price:
+                return OUTCOME_TARGET
+            if price >= stop_loss:
+                return OUTCOME_STOP
+    return OUTCOME_EXPIRED if expired else None
+
+def position_percentage(signal, entry_price, exit_price):
+    """
+    Leveraged P/L percentage of a position at exit_price, capped at a total loss.
+    """
+    change = (exit_price - entry_price) / entry_price * 100 * (signal.leverage or 1)
+    if signal.signal_type != 'buy':
+        change = -change
+    return max(change, -100.0)
+
+def position_percentage_expression(signal, exit_price):
+    """
+    SQL expression for each position's leveraged P/L percentage at exit_price,
+    measured from the position's own entry price and capped at a total loss.
+    """
+    change = (exit_price - TradePosition.entry_price) / TradePosition.entry_price * 100 * (signal.leverage or 1)
+    if signal.signal_type != 'buy':
+        change = -change
+    return case((change < -100, -100.0), else_=change)
+
+def settle_positions(signal, percentage, close_price=None, now=None):
+    """
+    Close every open position of a signal and credit the followers' futures
+    wallets with set-based statements: one UPDATE computes P/L for all
+    positions, one ledger entry credits every follower and the Transaction
+    rows are bulk-inserted. Does not commit.
+
+    Args:
+        signal: TradeSignal being settled
+        percentage: P/L percentage per position, a number or a SQL expression
+            over TradePosition columns
+        close_price: Price recorded on the positions
+        now: Settlement time (defaults to utcnow)
+
+    Returns:
+        Number of positions settled
+
+    Raises:
+        StaleDataError: If a position was closed by hand during settlement
+    """
+    now = now or datetime.utcnow()
+    quote_currency = signal.currency_pair.split('/')[1]
+
+    # Lock the open positions first; the settlement covers exactly these ids
+    position_ids = db.session.execute(
+        select(TradePosition.id).where(
+            TradePosition.signal_id == signal.id,
+            TradePosition.status == 'open'
+        ).order_by(TradePosition.id).with_for_update()
+    ).scalars().all()
+    if not position_ids:
+        return 0
+
+    # Close all of them in one statement
+    settled = TradePosition.query.filter(
+        TradePosition.id.in_(position_ids),
+        TradePosition.status == 'open'
+    ).update({
+        TradePosition.status: 'closed',
+        TradePosition.close_price: close_price,
+        TradePosition.profit_loss_percentage: percentage,
+        TradePosition.profit_loss: TradePosition.amount * percentage / 100,
+        TradePosition.closed_at: now
+    }, synchronize_session=False)
+
+    if settled != len(position_ids):
+        # Only possible without row locks (SQLite): a position was closed by
+        # hand in between, so the caller rolls back and settles again later
+        raise StaleDataError(f"Signal {signal.id}: {len(position_ids) - settled} positions closed during settlement")
+
+    positions = db.session.execute(
+        select(TradePosition.id, TradePosition.user_id, TradePosition.amount, TradePosition.profit_loss)
+        .where(TradePosition.id.in_(position_ids))
+    ).all()
+
+    credits = defaultdict(Decimal)
+    for position_id, user_id, amount, profit_loss in positions:
+        credits[user_id] += to_amount(amount) + to_amount(profit_loss)
+
+    # Stake plus P/L for every follower in one journal entry, balanced
+    # against the trading account
+    postings = [(user_account(user_id, quote_currency, 'futures'), credit) for user_id, credit in credits.items()]
+    postings.append((system_account(TRADING, quote_currency), -sum(credits.values(), Decimal('0'))))
+    post_entry('signal_settlement', postings, reference=f"signal:{signal.id}")
+
+    # One completed Transaction per settled position
+    db.session.bulk_insert_mappings(Transaction, [
+        {
+            'user_id': user_id,
+            'transaction_type': 'signal_settlement',
+            'status': 'completed',
+            'currency': quote_currency,
+            'amount': amount + profit_loss,
+            'fee': 0.0,
+            'to_wallet': 'futures',
+            'notes': f"Signal #{signal.id} position #{position_id} settled with P/L {profit_loss:.8f} {quote_currency}",
+            'created_at': now,
+            'updated_at': now
+        }
+        for position_id, user_id, amount, profit_loss in positions
+    ])
+
+    return settled
+
+def open_position(user_id, signal, amount, entry_price):
+    """
+    Follow a signal: create the position and move the stake from the user's
+    futures wallet to the trading account in one transaction.
+    
+    Returns:
+        The committed TradePosition
+    
+    Raises:
+        InsufficientFunds: If the futures wallet can't cover the stake
+    """
+    quote_currency = signal.currency_pair.split('/')[1]
+    
+    def follow():
+        position = TradePosition(
+            user_id=user_id,
+            signal_id=signal.id,
+            amount=amount,
+            entry_price=entry_price
+        )
+        db.session.add(position)
+        db.session.flush()
+        
+        post_entry('position_open', [
+            (user_account(user_id, quote_currency, 'futures'), -to_amount(amount)),
+            (system_account(TRADING, quote_currency), amount)
+        ], reference=f"position:{position.id}")
+        return position
+    
+    return atomic(follow)
+
+def close_position(position_id, user_id, signal, close_price, now=None):
+    """
+    Close an open position at close_price and return the stake plus P/L to
+    the user's futures wallet. The status change is conditional, so a
+    position is paid out only once.
+    
+    Returns:
+        The closed TradePosition, or None if it was not open
+    """
+    now = now or datetime.utcnow()
+    quote_currency = signal.currency_pair.split('/')[1]
+    
+    def close():
+        position = TradePosition.query.filter_by(id=position_id, user_id=user_id, status='open').first()
+        if position is None:
+            return None
+        percentage = position_percentage(signal, position.entry_price, close_price)
+        
+        closed = TradePosition.query.filter_by(id=position_id, status='open').update({
+            TradePosition.status: 'closed',
+            TradePosition.close_price: close_price,
+            TradePosition.profit_loss_percentage: percentage,
+            TradePosition.profit_loss: TradePosition.amount * percentage / 100,
+            TradePosition.closed_at: now
+        }, synchronize_session=False)
+        if not closed:
+            return None
+        
+        position = db.session.get(TradePosition, position_id, populate_existing=True)
+        credit = to_amount(position.amount) + to_amount(position.profit_loss)
+        post_entry('position_close', [
+            (user_account(user_id, quote_currency, 'futures'), credit),
+            (system_account(TRADING, quote_currency), -credit)
+        ], reference=f"position:{position.id}")
+        return position
+    
+    return atomic(close)
+
+def claim_signal(signal_id):
+    """
+    Deactivate a signal if it is still active, so it is resolved only once.
+
+    Returns:
+        Boolean indicating whether this caller claimed it
+    """
+    claimed = TradeSignal.query.filter(
+        TradeSignal.id == signal_id,
+        TradeSignal.is_active == True
+    ).update({TradeSignal.is_active: False}, synchronize_session=False)
+    return claimed == 1
+
+def resolve_signal(signal, outcome, price=None):
+    """
+    Resolve one signal and settle its positions in a single transaction.
+
+    Args:
+        signal: Active TradeSignal
+        outcome: 'target', 'stop' or 'expired'
+        price: Current market price (used for expiry)
+
+    Returns:
+        Number of positions settled, or None if the signal was already resolved
+    """
+    try:
+        if not claim_signal(signal.id):
+            db.session.rollback()
+            return None
+
+        # Crossings fill at the trigger level; expiry at the market price
+        if outcome == OUTCOME_TARGET:
+            exit_price = signal.target_price
+        elif outcome == OUTCOME_STOP:
+            exit_price = signal.stop_loss
+        else:
+            exit_price = price if price and price > 0 else signal.entry_price
+
+        change = position_percentage(signal, signal.entry_price, exit_price)
+
+        signal.is_active = False
+        signal.result = 'profit' if change >= 0 else 'loss'
+        signal.profit_percentage = abs(change)
+
+        settled = settle_positions(signal, position_percentage_expression(signal, exit_price), exit_price)
+        db.session.commit()
+
+        logger.info(
+            f"Signal {signal.id} ({signal.currency_pair}) resolved by {outcome} at {exit_price}: "
+            f"{signal.result} {signal.profit_percentage:.2f}%, {settled} positions settled"
+        )
+        return settled
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error resolving signal {signal.id}: {str(e)}")
+        return None
+
+def resolve_signals(prices=None, now=None):
+    """
+    Check every active signal against live prices and resolve those whose
+    target, stop or expiry was reached.
+
+    Args:
+        prices: Optional dictionary mapping currency pair to price; when
+            omitted, all pairs are priced in one batched lookup
+        now: Optional current time (defaults to utcnow)
+
+    Returns:
+        Dictionary with resolution metrics
+    """
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+
+    signals = TradeSignal.query.filter(TradeSignal.is_active == True).all()
+    metrics = {'active': len(signals), 'resolved': 0, 'positions_settled': 0, 'duration_seconds': 0.0}
+    if not signals:
+        return metrics
+
+    if prices is None:
+        prices = get_current_prices(list({signal.currency_pair for signal in signals}))
+
+    for signal in signals:
+        price = prices.get(signal.currency_pair)
+        outcome = detect_outcome(
+            signal.signal_type, signal.target_price, signal.stop_loss,
+            price, expired=signal.expiry_time <= now
+        )
+        if outcome is None:
+            continue
+
+        if outcome == OUTCOME_EXPIRED and not price:
+            # Fall back to the last cached quote, however old
+            from app.utils.price_oracle import price_oracle
+            quote = price_oracle.get_quote(signal.currency_pair)
+            price = quote['price'] if quote else None
+
+        settled = resolve_signal(signal, outcome, price)
+        if settled is not None:
+            metrics['resolved'] += 1
+            metrics['positions_settled'] += settled
+
+    metrics['duration_seconds'] = time.perf_counter() - started
+    return metrics
@@ -8,7 +8,11 @@ from app import db
 from app.models.wallet import Wallet
 from app.models.transaction import Transaction
 from app.models.user import User
-from app.utils.crypto_api import get_current_price, get_coin_details
+from app.services.ledger_service import (
+    EXCHANGE, EXTERNAL, InsufficientFunds, atomic, post_entry, system_account, to_amount, user_account
+)
+from app.utils.crypto_api import get_current_price, get_current_prices
+from app.utils.money import format_money
 
 logger = logging.getLogger(__name__)
 
@@ -100,32 +104,22 @@ def create_wallet(user_id, currency):
 
 def add_balance(user_id, currency, amount, wallet_type='spot'):
     """
-    Add balance to a user's wallet.
+    Add balance to a user's wallet, credited from the external account.
     
     Returns the updated wallet.
     """
-    wallet = Wallet.query.filter_by(user_id=user_id, currency=currency).first()
-    
-    if not wallet:
-        wallet = create_wallet(user_id, currency)
-    
-    # Ensure we're working with float values
-    amount = float(amount)
+    atomic(post_entry, 'credit', [
+        (user_account(user_id, currency, wallet_type), amount),
+        (system_account(EXTERNAL, currency), -to_amount(amount))
+    ])
     
-    if wallet_type == 'spot':
-        wallet.spot_balance = float(wallet.spot_balance or 0.0) + amount
-    elif wallet_type == 'funding':
-        wallet.funding_balance = float(wallet.funding_balance or 0.0) + amount
-    else:  # wallet_type == 'futures'
-        wallet.futures_balance = float(wallet.futures_balance or 0.0) + amount
-    
-    db.session.commit()
-    
-    return wallet
+    return Wallet.query.filter_by(user_id=user_id, currency=currency).first()
 
 def subtract_balance(user_id, currency, amount, wallet_type='spot'):
     """
-    Subtract balance from a user's wallet.
+    Subtract balance from a user's wallet, debited to the external account.
+    The balance check happens under the wallet lock, so concurrent debits
+    can never overdraw it.
     
     Returns a tuple of (success, message, wallet).
     """
@@ -134,45 +128,157 @@ def subtract_balance(user_id, currency, amount, wallet_type='spot'):
     if not wallet:
         return False, "Wallet not found.", None
     
-    # Ensure we're working with float values
-    amount = float(amount)
-    
-    if wallet_type == 'spot':
-        current_balance = float(wallet.spot_balance or 0.0)
-        if current_balance < amount:
-            return False, "Insufficient balance.", wallet
-        wallet.spot_balance = current_balance - amount
-    elif wallet_type == 'funding':
-        current_balance = float(wallet.funding_balance or 0.0)
-        if current_balance < amount:
-            return False, "Insufficient balance.", wallet
-        wallet.funding_balance = current_balance - amount
-    else:  # wallet_type == 'futures'
-        current_balance = float(wallet.futures_balance or 0.0)
-        if current_balance < amount:
-            return False, "Insufficient balance.", wallet
-        wallet.futures_balance = current_balance - amount
-    
-    db.session.commit()
+    try:
+        atomic(post_entry, 'debit', [
+            (user_account(user_id, currency, wallet_type), -to_amount(amount)),
+            (system_account(EXTERNAL, currency), amount)
+        ])
+    except InsufficientFunds:
+        return False, "Insufficient balance.", wallet
     
     return True, "Balance subtracted successfully.", wallet
 
 def transfer_balance(from_user_id, to_user_id, currency, amount, from_wallet_type='spot', to_wallet_type='spot'):
     """
-    Transfer balance between users.
+    Transfer balance between users in one journal entry.
     
     Returns a tuple of (success, message).
     """
-    # Subtract from sender
-    success, message, sender_wallet = subtract_balance(from_user_id, currency, amount, from_wallet_type)
+    try:
+        atomic(post_entry, 'transfer', [
+            (user_account(from_user_id, currency, from_wallet_type), -to_amount(amount)),
+            (user_account(to_user_id, currency, to_wallet_type), amount)
+        ])
+    except InsufficientFunds:
+        return False, "Insufficient balance."
     
-    if not success:
-        return False, message
+    return True, "Transfer completed successfully."
+
+def request_withdrawal(user_id, currency, amount, address, chain):
+    """
+    Reserve a withdrawal (amount plus the 7% fee) from the user's spot wallet
+    and record it as pending until an admin processes it.
     
-    # Add to recipient
-    recipient_wallet = add_balance(to_user_id, currency, amount, to_wallet_type)
+    Returns a tuple of (success, message, transaction).
+    """
+    fee = amount * 0.07
     
-    return True, "Transfer completed successfully."
+    def reserve():
+        transaction = Transaction(
+            user_id=user_id,
+            transaction_type='withdrawal',
+            status='pending',
+            currency=currency,
+            amount=amount,
+            fee=fee,
+            from_wallet='spot',
+            to_wallet='external',
+            address=address,
+            chain=chain
+        )
+        db.session.add(transaction)
+        db.session.flush()
+        
+        total_deduction = to_amount(amount) + to_amount(fee)
+        post_entry('withdrawal', [
+            (user_account(user_id, currency), -total_deduction),
+            (system_account(EXTERNAL, currency), total_deduction)
+        ], reference=f"transaction:{transaction.transaction_id}")
+        return transaction
+    
+    try:
+        transaction = atomic(reserve)
+    except InsufficientFunds:
+        return False, f"Insufficient balance to cover withdrawal amount plus fee ({format_money(fee, currency)} {currency}).", None
+    
+    return True, "Withdrawal request submitted successfully!", transaction
+
+def transfer_between_wallets(user_id, currency, amount, from_wallet, to_wallet):
+    """
+    Move funds between a user's spot, funding and futures wallets.
+    
+    Returns a tuple of (success, message).
+    """
+    def move():
+        transaction = Transaction(
+            user_id=user_id,
+            transaction_type='transfer',
+            status='completed',
+            currency=currency,
+            amount=amount,
+            fee=0,
+            from_wallet=from_wallet,
+            to_wallet=to_wallet
+        )
+        db.session.add(transaction)
+        db.session.flush()
+        
+        post_entry('transfer', [
+            (user_account(user_id, currency, from_wallet), -to_amount(amount)),
+            (user_account(user_id, currency, to_wallet), amount)
+        ], reference=f"transaction:{transaction.transaction_id}")
+    
+    try:
+        atomic(move)
+    except InsufficientFunds:
+        return False, f"Insufficient {from_wallet} balance."
+    
+    return True, f"Successfully transferred {amount} {currency} from {from_wallet} to {to_wallet}!"
+
+def pay_user(sender, recipient, currency, amount):
+    """
+    Pay another user from the sender's spot wallet to the recipient's.
+    Both wallets are locked in a fixed order, so opposite payments between
+    the same two users can't deadlock.
+    
+    Args:
+        sender: Paying User
+        recipient: Receiving User
+        currency: Currency code
+        amount: Amount to pay
+    
+    Returns:
+        Tuple of (success, message)
+    """
+    def pay():
+        sender_transaction = Transaction(
+            user_id=sender.id,
+            transaction_type='pay',
+            status='completed',
+            currency=currency,
+            amount=-amount,  # Negative amount for sender
+            fee=0,
+            from_wallet='spot',
+            to_wallet='external',
+            address=recipient.unique_id,
+            notes=f"Payment to {recipient.username} ({recipient.unique_id})"
+        )
+        recipient_transaction = Transaction(
+            user_id=recipient.id,
+            transaction_type='pay',
+            status='completed',
+            currency=currency,
+            amount=amount,
+            fee=0,
+            from_wallet='external',
+            to_wallet='spot',
+            address=sender.unique_id,
+            notes=f"Payment from {sender.username} ({sender.unique_id})"
+        )
+        db.session.add_all([sender_transaction, recipient_transaction])
+        db.session.flush()
+        
+        post_entry('payment', [
+            (user_account(sender.id, currency), -to_amount(amount)),
+            (user_account(recipient.id, currency), amount)
+        ], reference=f"transaction:{sender_transaction.transaction_id}")
+    
+    try:
+        atomic(pay)
+    except InsufficientFunds:
+        return False, "Insufficient balance."
+    
+    return True, f"Successfully paid {amount} {currency} to {recipient.username}!"
 
 def get_conversion_rate(from_currency, to_currency):
     """
@@ -189,6 +295,12 @@ def get_conversion_rate(from_currency, to_currency):
         # For same currency, rate is 1:1
         if from_currency == to_currency:
             return 1.0
+        
+        # O(1) lookup in the precomputed cross-rate matrix
+        from app.services.rate_service import get_cross_rate
+        rate = get_cross_rate(from_currency, to_currency)
+        if rate > 0:
+            return rate
             
         # For USDT to other currencies
         if from_currency == 'USDT':
@@ -219,6 +331,55 @@ def get_conversion_rate(from_currency, to_currency):
         logger.error(f"Error getting conversion rate from {from_currency} to {to_currency}: {str(e)}")
         return 0.0
 
+def get_conversion_rates(currencies, to_currency='USDT'):
+    """
+    Get conversion rates from many currencies to one target currency.
+    Rates come from the precomputed cross-rate matrix; any currency it cannot
+    price is resolved through a single batched USDT price lookup.
+    
+    Args:
+        currencies: List of source currency codes
+        to_currency: Target currency code
+    
+    Returns:
+        dict: Mapping of currency code to exchange rate (0.0 if unavailable)
+    """
+    try:
+        currencies = set(currencies or [])
+        
+        from app.services.rate_service import get_rate_graph
+        graph = get_rate_graph()
+        rates = {currency: graph.rate(currency, to_currency) for currency in currencies}
+        missing = {currency for currency, rate in rates.items() if rate <= 0}
+        if not missing:
+            return rates
+        
+        # Remaining rates are derived from the USDT price of each currency
+        pairs = [f"{currency}/USDT" for currency in missing | {to_currency} if currency != 'USDT']
+        prices = get_current_prices(pairs) if pairs else {}
+        
+        def usdt_price(currency):
+            return 1.0 if currency == 'USDT' else float(prices.get(f"{currency}/USDT", 0) or 0)
+        
+        target_price = usdt_price(to_currency)
+        
+        for currency in missing:
+            if currency == to_currency:
+                rates[currency] = 1.0
+                continue
+            
+            source_price = usdt_price(currency)
+            if source_price > 0 and target_price > 0:
+                # Cross rate calculation: from → USDT → to
+                rates[currency] = source_price / target_price
+            else:
+                rates[currency] = 0.0
+        
+        return rates
+    except Exception as e:
+        logger.error(f"Error getting conversion rates to {to_currency}: {str(e)}")
+        return {currency: 0.0 for currency in currencies}
+
 def convert_currency(user_id, from_currency, to_currency, amount, wallet_type='spot'):
     """
     Convert currency for a user with enhanced error handling and rate fetching.
@@ -275,38 +436,36 @@ def convert_currency(user_id, from_currency, to_currency, amount, wallet_type='s
         # Log before transaction
         logger.info(f"Converting {amount} {from_currency} to {to_currency} at rate {rate} = {converted_amount} {to_currency}")
         
-        # Perform the conversion
-        
-        # 1. Subtract from source wallet
-        success, message, _ = subtract_balance(user_id, from_currency, amount, wallet_type)
-        if not success:
-            return False, message, 0
-            
-        # 2. Add to destination wallet or create if it doesn't exist
-        destination_wallet = Wallet.query.filter_by(user_id=user_id, currency=to_currency).first()
-        if not destination_wallet:
-            destination_wallet = create_wallet(user_id, to_currency)
+        # Record the conversion, then move both legs in one journal entry
+        def record_conversion():
+            transaction = Transaction(
+                user_id=user_id,
+                transaction_type='convert',
+                status='completed',
+                currency=from_currency,
+                amount=amount,
+                fee=0,  # No fee for conversions
+                from_wallet=wallet_type,
+                to_wallet=wallet_type,
+                notes=f"Converted {amount} {from_currency} to {converted_amount:.8f} {to_currency} at rate {rate:.8f}"
+            )
+            db.session.add(transaction)
+            db.session.flush()
             
-        # 3. Add converted amount to destination wallet (same wallet type)
-        add_balance(user_id, to_currency, converted_amount, wallet_type)
+            post_entry('convert', [
+                (user_account(user_id, from_currency, wallet_type), -to_amount(amount)),
+                (system_account(EXCHANGE, from_currency), amount),
+                (system_account(EXCHANGE, to_currency), -to_amount(converted_amount)),
+                (user_account(user_id, to_currency, wallet_type), converted_amount)
+            ], reference=f"transaction:{transaction.transaction_id}")
+            return transaction
         
-        # 4. Create conversion transaction record for tracking
-        transaction = Transaction(
-            user_id=user_id,
-            transaction_type='convert',
-            status='completed',
-            currency=from_currency,
-            amount=amount,
-            fee=0,  # No fee for conversions
-            from_wallet=wallet_type,
-            to_wallet=wallet_type,
-            notes=f"Converted {amount} {from_currency} to {converted_amount:.8f} {to_currency} at rate {rate:.8f}"
-        )
-        
-        db.session.add(transaction)
-        db.session.commit()
+        try:
+            transaction = atomic(record_conversion)
+        except InsufficientFunds:
+            return False, f"Insufficient {from_currency} balance in {wallet_type} wallet.", 0
         
-        # 5. Send email notification
+        # Send email notification
         try:
             user = User.query.get(user_id)
             from app.services.email_notification_service import send_transaction_notification
@@ -554,13 +713,10 @@ def verify_deposit(transaction_id, admin_notes=None):
     transaction.updated_at = datetime.utcnow()
     
     # Add funds to user's wallet
-    wallet = Wallet.query.filter_by(user_id=transaction.user_id, currency=transaction.currency).first()
-    
-    if not wallet:
-        wallet = Wallet(user_id=transaction.user_id, currency=transaction.currency, spot_balance=0)
-        db.session.add(wallet)
-    
-    wallet.spot_balance += transaction.amount
+    post_entry('deposit', [
+        (user_account(transaction.user_id, transaction.currency), transaction.amount),
+        (system_account(EXTERNAL, transaction.currency), -to_amount(transaction.amount))
+    ], reference=f"transaction:{transaction.transaction_id}")
     
     db.session.commit()
     
@@ -593,10 +749,11 @@ def process_withdrawal(transaction_id, blockchain_txid=None, admin_notes=None, r
         transaction.updated_at = datetime.utcnow()
         
         # Return funds to user's wallet (amount + fee)
-        wallet = Wallet.query.filter_by(user_id=transaction.user_id, currency=transaction.currency).first()
-        
-        if wallet:
-            wallet.spot_balance += transaction.amount + transaction.fee
+        refund = to_amount(transaction.amount) + to_amount(transaction.fee)
+        post_entry('withdrawal_reversal', [
+            (user_account(transaction.user_id, transaction.currency), refund),
+            (system_account(EXTERNAL, transaction.currency), -refund)
+        ], reference=f"transaction:{transaction.transaction_id}")
         
         db.session.commit()
         
@@ -615,114 +772,23 @@ def process_withdrawal(transaction_id, blockchain_txid=None, admin_notes=None, r
 def get_user_portfolio(user_id):
     """
     Get a user's portfolio with equivalent values in USDT using real-time rates.
+    Valuations come from the portfolio engine, cached until a balance changes
+    or a new price snapshot is built.
     
     Args:
         user_id: User ID
     
     Returns:
-        dict: Portfolio data with spot, funding, futures balances and total values
+        dict: Portfolio data with spot, funding, futures balances, total values
+            and the USDT rate used per currency
     """
     try:
-        wallets = Wallet.query.filter_by(user_id=user_id).all()
-        
-        portfolio = {
-            'spot': {},
-            'funding': {},
-            'futures': {},
-            'total_spot_value': 0,
-            'total_funding_value': 0,
-            'total_futures_value': 0,
-            'total_value': 0
-        }
-        
-        for wallet in wallets:
-            # Get safe numeric values, replacing None with 0
-            spot_balance = float(wallet.spot_balance or 0)
-            funding_balance = float(wallet.funding_balance or 0)
-            futures_balance = float(wallet.futures_balance or 0)
-            
-            # Skip entirely empty wallets
-            if spot_balance == 0 and funding_balance == 0 and futures_balance == 0:
-                continue
-            
-            # Get rate from currency to USDT (real-time rate)
-            if wallet.currency == 'USDT':
-                rate = 1.0
-            else:
-                rate = get_conversion_rate(wallet.currency, 'USDT')
-                if rate <= 0:
-                    # Log warning and use a fallback method if available
-                    logger.warning(f"Could not get rate for {wallet.currency}/USDT, using fallback")
-                    
-                    # Try alternative approach to get rate
-                    try:
-                        coin_details = get_coin_details(wallet.currency)
-                        # Assuming current_price is in USD/USDT
-                        if coin_details and 'current_price' in coin_details and coin_details['current_price'] > 0:
-                            rate = coin_details['current_price']
-                        else:
-                            # Default fallback rates if all else fails
-                            fallback_rates = {
-                                'BTC': 60000.0,
-                                'ETH': 3000.0,
-                                'BNB': 500.0,
-                                'XRP': 0.5,
-                                'DOGE': 0.1,
-                                'SOL': 100.0,
-                                'ADA': 0.5,
-                                'MATIC': 1.0,
-                                'DOT': 20.0,
-                                'AVAX': 30.0
-                            }
-                            rate = fallback_rates.get(wallet.currency, 1.0)
-                    except Exception as e:
-                        logger.error(f"Error getting fallback rate for {wallet.currency}: {str(e)}")
-                        rate = 1.0  # Use 1:1 as last resort
-            
-            # Calculate USDT values
-            spot_value = spot_balance * rate
-            funding_value = funding_balance * rate
-            futures_value = futures_balance * rate
-            
-            # Add to portfolio
-            portfolio['spot'][wallet.currency] = {
-                'balance': spot_balance,
-                'value_usdt': spot_value
-            }
-            
-            portfolio['funding'][wallet.currency] = {
-                'balance': funding_balance,
-                'value_usdt': funding_value
-            }
-            
-            portfolio['futures'][wallet.currency] = {
-                'balance': futures_balance,
-                'value_usdt': futures_value
-            }
-            
-            # Add to totals
-            portfolio['total_spot_value'] += spot_value
-            portfolio['total_funding_value'] += funding_value
-            portfolio['total_futures_value'] += futures_value
-        
-        # Calculate total value across all wallet types
-        portfolio['total_value'] = (
-            portfolio['total_spot_value'] + 
-            portfolio['total_funding_value'] + 
-            portfolio['total_futures_value']
-        )
-        
-        return portfolio
+        from app.services.portfolio_service import get_portfolio
+        return get_portfolio(user_id)
     except Exception as e:
         logger.error(f"Error calculating user portfolio: {str(e)}")
         # Return empty portfolio structure with zeros
-        return {
-            'spot': {},
-            'funding': {},
-            'futures': {},
-            'total_spot_value': 0,
-            'total_funding_value': 0,
-            'total_futures_value': 0,
-            'total_value': 0,
-            'error': str(e)
-        }
\ No newline at end of file
+        from app.services.portfolio_service import empty_portfolio
+        portfolio = empty_portfolio()
+        portfolio['error'] = str(e)
+        return portfolio
@@ -1,8 +1,10 @@
 # Add this to app/utils/crypto_api.py or create a new file app/utils/binance_api.py
 
-import requests
 import logging
+import time
 from decimal import Decimal
+from app.utils.cache import TTLCache
+from app.utils.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +22,7 @@ def get_binance_ticker_price(symbol_pair):
         float: Current price or 0 if error
     """
     try:
-        response = requests.get(f"{BINANCE_API_URL}/ticker/price", params={'symbol': symbol_pair})
+        response = http_client.get(f"{BINANCE_API_URL}/ticker/price", params={'symbol': symbol_pair})
         if response.status_code == 200:
             data = response.json()
             return float(data['price'])
@@ -46,6 +48,12 @@ def get_binance_exchange_rate(from_currency, to_currency):
         # Handle special case: same currency
         if from_currency == to_currency:
             return 1.0
+        
+        # O(1) lookup in the precomputed cross-rate matrix
+        from app.services.rate_service import get_cross_rate
+        rate = get_cross_rate(from_currency, to_currency)
+        if rate > 0:
+            return rate
             
         # Direct pair
         symbol = f"{from_currency}{to_currency}"
@@ -77,6 +85,38 @@ def get_binance_exchange_rate(from_currency, to_currency):
         logger.error(f"Error calculating exchange rate: {str(e)}")
         return 0
 
+def get_binance_klines(symbol_pair, interval='1d', start_time=None, end_time=None, limit=1000):
+    """
+    Get OHLCV klines for a trading pair from Binance.
+    
+    Args:
+        symbol_pair: Symbol pair in Binance format (e.g., 'BTCUSDT')
+        interval: Kline interval ('1m', '5m', '15m', '1h', '4h', '1d')
+        start_time: Optional start time in epoch milliseconds
+        end_time: Optional end time in epoch milliseconds
+        limit: Maximum number of klines (Binance allows up to 1000)
+    
+    Returns:
+        list: [open_time, open, high, low, close, volume] rows, oldest first;
+        None if the pair is not listed on Binance
+    """
+    params = {'symbol': symbol_pair, 'interval': interval, 'limit': limit}
+    if start_time is not None:
+        params['startTime'] = int(start_time)
+    if end_time is not None:
+        params['endTime'] = int(end_time)
+    
+    response = http_client.get(f"{BINANCE_API_URL}/klines", params=params)
+    if response.status_code == 400:
+        # Unknown symbol
+        return None
+    response.raise_for_status()
+    
+    return [
+        [int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5])]
+        for row in response.json()
+    ]
+
 def get_all_binance_tickers():
     """
     Get all available ticker prices from Binance.
@@ -85,7 +125,7 @@ def get_all_binance_tickers():
         dict: Dictionary mapping symbol pairs to their prices
     """
     try:
-        response = requests.get(f"{BINANCE_API_URL}/ticker/price")
+        response = http_client.get(f"{BINANCE_API_URL}/ticker/price")
         if response.status_code == 200:
             data = response.json()
             return {item['symbol']: float(item['price']) for item in data}
@@ -118,8 +158,33 @@ def get_binance_exchange_rates(base_currency, quote_currencies):
     return result
 
 # Cache for ticker data to avoid excessive API calls
-_ticker_cache = {}
-_last_cache_update = 0  # timestamp
+ticker_cache = TTLCache('binance_tickers', ttl=60, stale_ttl=60)
+
+def _load_ticker_snapshot():
+    return get_all_binance_tickers(), time.time()
+
+def get_binance_ticker_snapshot(max_age_seconds=60):
+    """
+    Get the ticker table together with the time it was taken.
+    
+    Args:
+        max_age_seconds: Maximum age of cache in seconds
+    
+    Returns:
+        Tuple of ({symbol: price}, epoch seconds the prices are from); a
+        stale-while-revalidate snapshot keeps its original time
+    """
+    # Serve from the live ticker stream when it is enabled, running and fresh
+    from app.utils.binance_stream import start_ticker_stream, ticker_stream
+    start_ticker_stream()
+    stream_age = ticker_stream.table.age()
+    if ticker_stream.is_running() and stream_age is not None and stream_age <= max_age_seconds:
+        return ticker_stream.table.prices(), ticker_stream.table.last_update
+    
+    # Concurrent callers share one refresh; a stale snapshot is served meanwhile
+    snapshot = ticker_cache.get_or_load('snapshot', _load_ticker_snapshot, ttl=max_age_seconds,
+                                        validate=lambda entry: bool(entry and entry[0]))
+    return snapshot if snapshot else ({}, None)
 
 def get_cached_binance_rates(max_age_seconds=60):
     """
@@ -131,14 +196,4 @@ def get_cached_binance_rates(max_age_seconds=60):
     Returns:
         dict: Dictionary of ticker data
     """
-    global _ticker_cache, _last_cache_update
-    
-    import time
-    current_time = time.time()
-    
-    # Update cache if it's empty or too old
-    if not _ticker_cache or (current_time - _last_cache_update) > max_age_seconds:
-        _ticker_cache = get_all_binance_tickers()
-        _last_cache_update = current_time
-        
-    return _ticker_cache
\ No newline at end of file
+    return get_binance_ticker_snapshot(max_age_seconds)[0]
\ No newline at end of file
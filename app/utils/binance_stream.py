@@ -0,0 +1,331 @@
+# app/utils/binance_stream.py
+"""
+Binance WebSocket ticker stream consumer.
+Subscribes to the combined !miniTicker@arr stream and keeps an in-memory
+ticker table updated in real time, with automatic reconnect and a REST
+snapshot resync on every (re)connect. A recorded-stream transport replays
+captured messages so the consumer can run offline.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+class TickerTable:
+    """
+    Thread-safe table of the latest ticker per Binance symbol (e.g., 'BTCUSDT').
+    """
+
+    def __init__(self):
+        self._tickers = {}
+        self._lock = threading.Lock()
+        self.last_update = 0
+
+    def __len__(self):
+        return len(self._tickers)
+
+    def apply_snapshot(self, prices):
+        """
+        Load a REST price snapshot ({symbol: price}).
+        """
+        now = time.time()
+        with self._lock:
+            for symbol, price in prices.items():
+                ticker = self._tickers.setdefault(symbol, {})
+                ticker.update({'price': float(price), 'received_at': now})
+            self.last_update = now
+
+    def apply_mini_tickers(self, tickers):
+        """
+        Apply a batch of 24hrMiniTicker events.
+
+        Returns:
+            Number of symbols updated
+        """
+        now = time.time()
+        updated = 0
+        with self._lock:
+            for item in tickers:
+                symbol = item.get('s')
+                if not symbol or item.get('c') is None:
+                    continue
+                self._tickers[symbol] = {
+                    'price': float(item['c']),
+                    'open': float(item.get('o') or 0),
+                    'high': float(item.get('h') or 0),
+                    'low': float(item.get('l') or 0),
+                    'volume': float(item.get('v') or 0),
+                    'quote_volume': float(item.get('q') or 0),
+                    'event_time': item.get('E'),
+                    'received_at': now
+                }
+                updated += 1
+            self.last_update = now
+        return updated
+
+    def get(self, symbol):
+        with self._lock:
+            ticker = self._tickers.get(symbol)
+            return dict(ticker) if ticker else None
+
+    def prices(self):
+        """
+        Get {symbol: price} for every known symbol.
+        """
+        with self._lock:
+            return {symbol: ticker['price'] for symbol, ticker in self._tickers.items()}
+
+    def age(self):
+        """
+        Seconds since the last update, or None if the table is empty.
+        """
+        return time.time() - self.last_update if self.last_update else None
+
+class WebSocketTransport:
+    """
+    Live transport using the websocket-client package.
+    """
+
+    finite = False
+
+    def __init__(self, url=None, timeout=30):
+        self.url = url or Config.BINANCE_STREAM_URL
+        self.timeout = timeout
+        self._connection = None
+
+    def messages(self):
+        # Imported lazily so the module loads without the websocket dependency
+        import websocket
+
+        self._connection = websocket.create_connection(self.url, timeout=self.timeout)
+        try:
+            while True:
+                message = self._connection.recv()
+                if not message:
+                    break
+                yield message
+        finally:
+            self.close()
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+class RecordedStream:
+    """
+    Replays a recorded stream for offline testing.
+
+    The source is either a path to a file with one raw message per line or a
+    list of messages (strings or already-decoded objects).
+    """
+
+    def __init__(self, source, speed=None, loop=False):
+        self.source = source
+        self.speed = speed  # None replays as fast as possible; 1.0 replays in real time
+        self.loop = loop
+        self.finite = not loop
+
+    def _load(self):
+        if isinstance(self.source, str):
+            with open(self.source) as recording:
+                return [line.strip() for line in recording if line.strip()]
+        return list(self.source)
+
+    @staticmethod
+    def _event_time(message):
+        try:
+            payload = json.loads(message) if isinstance(message, str) else message
+            payload = payload.get('data', payload) if isinstance(payload, dict) else payload
+            return payload[0].get('E') if payload else None
+        except (ValueError, TypeError, AttributeError, IndexError, KeyError):
+            return None
+
+    def messages(self):
+        while True:
+            previous_time = None
+            for message in self._load():
+                if self.speed:
+                    event_time = self._event_time(message)
+                    if previous_time is not None and event_time is not None:
+                        time.sleep(max(0, (event_time - previous_time) / 1000.0 / self.speed))
+                    previous_time = event_time
+                yield message
+            if not self.loop:
+                break
+
+    def close(self):
+        pass
+
+class BinanceTickerStream:
+    """
+    Consumes !miniTicker@arr messages into a TickerTable on a background thread.
+    """
+
+    def __init__(self, transport=None, table=None, resync=None, max_backoff=60):
+        self.transport = transport
+        self.table = table or TickerTable()
+        self.resync = resync
+        self.max_backoff = max_backoff
+
+        self.messages_received = 0
+        self.reconnects = 0
+        self.errors = 0
+        self.connected = False
+
+        self._listeners = []
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_listener(self, listener):
+        """
+        Register a callable receiving {symbol: price} for every applied batch.
+        """
+        self._listeners.append(listener)
+
+    def _resync(self):
+        resync = self.resync
+        if resync is None:
+            from app.utils.binance_api import get_all_binance_tickers
+            resync = get_all_binance_tickers
+        try:
+            prices = {symbol: float(price) for symbol, price in (resync() or {}).items()}
+            if prices:
+                self.table.apply_snapshot(prices)
+                self._notify(prices)
+                logger.info(f"Binance ticker table resynced from REST snapshot ({len(prices)} symbols)")
+        except Exception as e:
+            logger.error(f"Error resyncing Binance ticker snapshot: {str(e)}")
+
+    def _notify(self, prices):
+        for listener in self._listeners:
+            try:
+                listener(prices)
+            except Exception as e:
+                logger.error(f"Error in Binance ticker listener: {str(e)}")
+
+    def handle_message(self, message):
+        """
+        Apply one raw stream message (combined or raw stream format).
+
+        Returns:
+            Number of symbols updated
+        """
+        payload = json.loads(message) if isinstance(message, (str, bytes)) else message
+        if isinstance(payload, dict):
+            payload = payload.get('data', [])
+        if not isinstance(payload, list):
+            return 0
+
+        updated = self.table.apply_mini_tickers(payload)
+        self.messages_received += 1
+        if updated:
+            self._notify({item['s']: float(item['c']) for item in payload if item.get('s') and item.get('c') is not None})
+        return updated
+
+    def run(self):
+        """
+        Consume the stream until stopped, reconnecting with exponential backoff.
+        """
+        backoff = 1
+        while not self._stop_event.is_set():
+            transport = self.transport or WebSocketTransport()
+            self._resync()
+            try:
+                self.connected = True
+                for message in transport.messages():
+                    if self._stop_event.is_set():
+                        break
+                    try:
+                        self.handle_message(message)
+                        backoff = 1
+                    except (ValueError, TypeError, KeyError) as e:
+                        self.errors += 1
+                        logger.warning(f"Skipping malformed Binance stream message: {str(e)}")
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Binance ticker stream disconnected: {str(e)}")
+            finally:
+                self.connected = False
+                transport.close()
+
+            if self._stop_event.is_set() or getattr(transport, 'finite', False):
+                break
+
+            self.reconnects += 1
+            delay = min(self.max_backoff, backoff) * random.uniform(0.5, 1.0)
+            logger.info(f"Reconnecting to Binance ticker stream in {delay:.1f}s")
+            self._stop_event.wait(delay)
+            backoff *= 2
+
+    def start(self):
+        """
+        Start consuming on a daemon thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, name='binance-ticker-stream', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.transport is not None:
+            self.transport.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        return {
+            'running': self.is_running(),
+            'connected': self.connected,
+            'symbols': len(self.table),
+            'messages_received': self.messages_received,
+            'reconnects': self.reconnects,
+            'errors': self.errors,
+            'last_update_age': self.table.age()
+        }
+
+# Process-wide stream consumer (started on demand)
+ticker_stream = BinanceTickerStream()
+_start_lock = threading.Lock()
+
+def start_ticker_stream():
+    """
+    Start the process-wide ticker stream if enabled in Config and feed its
+    prices into the shared price oracle. Web processes start it lazily on the
+    first ticker read, so it is never started before a fork.
+
+    Returns:
+        The running BinanceTickerStream or None if disabled
+    """
+    if not Config.BINANCE_STREAM_ENABLED:
+        return None
+    if ticker_stream.is_running():
+        return ticker_stream
+
+    with _start_lock:
+        if ticker_stream.is_running():
+            return ticker_stream
+
+        if Config.BINANCE_STREAM_RECORDING and ticker_stream.transport is None:
+            ticker_stream.transport = RecordedStream(Config.BINANCE_STREAM_RECORDING, speed=1.0, loop=True)
+
+        from app.utils.price_oracle import price_oracle
+        if price_oracle.apply_binance_prices not in ticker_stream._listeners:
+            ticker_stream.add_listener(price_oracle.apply_binance_prices)
+
+        ticker_stream.start()
+        logger.info("Binance ticker stream started")
+    return ticker_stream
@@ -0,0 +1,312 @@
+# app/utils/cache.py
+"""
+Stampede-safe TTL cache.
+Concurrent misses for one key share a single load (single-flight), expired
+entries keep being served while one background thread refreshes them
+(stale-while-revalidate), and every cache keeps hit/miss counters. Entries
+live in the backend selected in Config (see cache_backends), under the
+cache's name as namespace.
+"""
+import functools
+import logging
+import threading
+import time
+from app.config import Config
+from app.utils.cache_backends import NamespacedStore, get_cache_backend
+
+logger = logging.getLogger(__name__)
+
+# Every named cache in the process, for stats and admin tooling
+caches = {}
+
+class TTLCache:
+    """
+    Named TTL cache with single-flight loading and stale-while-revalidate.
+
+    Entries are stored as (value, stored_at, ttl). An entry is fresh for ttl
+    seconds and may be served stale for a further stale_ttl seconds while a
+    background refresh runs.
+    """
+
+    def __init__(self, name, ttl, stale_ttl=None, store=None, background_refresh=True, lock_timeout=None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self.background_refresh = background_refresh
+        self.lock_timeout = lock_timeout or Config.CACHE_LOCK_TIMEOUT
+        self._store = store
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.background_refreshes = 0
+
+        self._key_locks = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        caches[name] = self
+
+    @property
+    def store(self):
+        # Resolved on first use so the backend can be configured after import
+        if self._store is None:
+            self._store = NamespacedStore(get_cache_backend(), self.name)
+        return self._store
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _read(self, key):
+        try:
+            return self.store.get(key)
+        except Exception as e:
+            logger.error(f"Error reading cache {self.name}[{key}]: {str(e)}")
+            return None
+
+    def get(self, key, default=None, ttl=None):
+        """
+        Get a fresh value without loading.
+
+        Returns:
+            Cached value or default if missing or expired
+        """
+        entry = self._read(key)
+        if entry is None:
+            return default
+        value, stored_at, entry_ttl = entry
+        if time.time() - stored_at > (ttl if ttl is not None else entry_ttl):
+            return default
+        return value
+
+    def get_many(self, keys, ttl=None):
+        """
+        Get fresh values for several keys with one backend read, without
+        loading.
+
+        Returns:
+            Dictionary mapping each key with a fresh value to that value
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        try:
+            entries = self.store.get_many(keys)
+        except Exception as e:
+            logger.error(f"Error reading cache {self.name} ({len(keys)} keys): {str(e)}")
+            return {}
+
+        now = time.time()
+        values = {}
+        for key, entry in zip(keys, entries):
+            if entry is None:
+                continue
+            value, stored_at, entry_ttl = entry
+            if now - stored_at <= (ttl if ttl is not None else entry_ttl):
+                values[key] = value
+        return values
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value with an optional per-key TTL.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            self.store.set(key, (value, time.time(), ttl), ttl + self.stale_ttl)
+        except Exception as e:
+            logger.error(f"Error writing cache {self.name}[{key}]: {str(e)}")
+
+    def invalidate(self, key):
+        try:
+            self.store.delete(key)
+        except Exception as e:
+            logger.error(f"Error invalidating cache {self.name}[{key}]: {str(e)}")
+
+    def clear(self):
+        self.store.clear()
+
+    def _load(self, key, loader, ttl, validate):
+        """
+        Run the loader and store its result if valid.
+
+        Returns:
+            Tuple of (value, stored, error)
+        """
+        self.loads += 1
+        try:
+            value = loader()
+        except Exception as e:
+            self.load_errors += 1
+            logger.error(f"Error loading cache {self.name}[{key}]: {str(e)}")
+            return None, False, e
+
+        if not validate(value):
+            self.load_errors += 1
+            return value, False, None
+
+        self.set(key, value, ttl)
+        return value, True, None
+
+    def _acquire(self, key):
+        try:
+            return self.store.acquire(key, self.lock_timeout)
+        except Exception as e:
+            logger.error(f"Error locking cache {self.name}[{key}]: {str(e)}")
+            return True
+
+    def _release(self, key, token):
+        try:
+            self.store.release(key, token)
+        except Exception as e:
+            logger.error(f"Error unlocking cache {self.name}[{key}]: {str(e)}")
+
+    def _wait_for_peer(self, key, ttl):
+        """
+        Wait for another process holding the load lock to store the value.
+
+        Returns:
+            Fresh entry or None on timeout
+        """
+        deadline = time.time() + self.lock_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = self._read(key)
+            if entry is not None and time.time() - entry[1] <= ttl:
+                return entry
+        return None
+
+    def _refresh_in_background(self, key, loader, ttl, validate):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                with self._key_lock(key):
+                    token = self._acquire(key)
+                    if token is None:
+                        # Another worker process is already refreshing it
+                        return
+                    try:
+                        self._load(key, loader, ttl, validate)
+                    finally:
+                        self._release(key, token)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self.background_refreshes += 1
+        threading.Thread(target=run, name=f"cache-refresh-{self.name}", daemon=True).start()
+
+    def get_or_load(self, key, loader, ttl=None, validate=None, force=False):
+        """
+        Get a value, loading it at most once across concurrent callers.
+
+        Args:
+            key: Cache key
+            loader: Callable returning the value
+            ttl: Optional per-key TTL in seconds
+            validate: Optional callable; values failing it are not cached
+                (defaults to rejecting None)
+            force: Reload even if a fresh value is cached
+
+        Returns:
+            Cached or loaded value; a stale value if the load fails or
+            returns an invalid value. Loader exceptions propagate only when
+            there is no stale value to serve.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        validate = validate or (lambda value: value is not None)
+
+        entry = None if force else self._read(key)
+        if entry is not None:
+            value, stored_at, _ = entry
+            age = time.time() - stored_at
+            if age <= ttl:
+                self.hits += 1
+                return value
+            if age <= ttl + self.stale_ttl and self.background_refresh:
+                self.stale_hits += 1
+                self._refresh_in_background(key, loader, ttl, validate)
+                return value
+
+        self.misses += 1
+        with self._key_lock(key):
+            # Another caller may have loaded it while we waited
+            if not force:
+                current = self._read(key)
+                if current is not None and current is not entry and time.time() - current[1] <= ttl:
+                    return current[0]
+
+            # Only one process loads; the others pick up its result
+            token = self._acquire(key)
+            if token is None:
+                current = self._wait_for_peer(key, ttl)
+                if current is not None:
+                    return current[0]
+            try:
+                value, stored, error = self._load(key, loader, ttl, validate)
+            finally:
+                if token is not None:
+                    self._release(key, token)
+            if stored:
+                return value
+
+        # Fall back to whatever we had rather than failing the request
+        stale = entry or self._read(key)
+        if stale is not None:
+            return stale[0]
+        if error is not None:
+            raise error
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits + self.stale_hits) / lookups if lookups else None,
+            'loads': self.loads,
+            'load_errors': self.load_errors,
+            'background_refreshes': self.background_refreshes
+        }
+
+def cached(cache, ttl=None, validate=bool):
+    """
+    Decorator caching a function's result per argument list.
+
+    Args:
+        cache: TTLCache to store results in
+        ttl: Optional TTL in seconds (defaults to the cache's TTL)
+        validate: Callable deciding whether a result is cached; by default
+            empty results (e.g. [] returned on upstream errors) are not
+
+    Returns:
+        Decorator; the undecorated function stays available as .uncached
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = ':'.join([func.__name__] + [str(arg) for arg in args] +
+                           [f"{name}={value}" for name, value in sorted(kwargs.items())])
+            return cache.get_or_load(key, lambda: func(*args, **kwargs), ttl=ttl, validate=validate)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+def get_cache_stats():
+    """
+    Get hit/miss counters for every named cache.
+
+    Returns:
+        Dictionary mapping cache name to stats
+    """
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -0,0 +1,256 @@
+# app/utils/cache_backends.py
+"""
+Cache storage backends.
+An in-process LRU backend for single-worker setups and a Redis backend shared
+by every gunicorn worker, selected with Config.CACHE_BACKEND. Caches reach a
+backend through a NamespacedStore, so keys look like 'investro:<cache>:<key>'.
+"""
+import logging
+import math
+import pickle
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend(ABC):
+    """
+    Interface every cache backend implements. Values are arbitrary picklable
+    objects; ttl is in seconds (None keeps the value until evicted).
+    """
+
+    @abstractmethod
+    def get(self, key):
+        pass
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        pass
+
+    def get_many(self, keys):
+        """
+        Get several values in one round trip where the backend allows it.
+
+        Returns:
+            List of values in key order (None for missing keys)
+        """
+        return [self.get(key) for key in keys]
+
+    @abstractmethod
+    def delete(self, key):
+        pass
+
+    @abstractmethod
+    def delete_prefix(self, prefix):
+        pass
+
+    def acquire(self, key, timeout):
+        """
+        Take a short-lived load lock for a key, shared by every process using
+        the backend.
+
+        Returns:
+            Lock token, or None if another process holds the lock
+        """
+        return True
+
+    def release(self, key, token):
+        pass
+
+class LRUBackend(CacheBackend):
+    """
+    Bounded in-process backend with least-recently-used eviction.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        with self._lock:
+            values = []
+            now = time.time()
+            for key in keys:
+                item = self._entries.get(key)
+                if item is not None and item[1] is not None and item[1] < now:
+                    del self._entries[key]
+                    item = None
+                if item is not None:
+                    self._entries.move_to_end(key)
+                values.append(item[0] if item is not None else None)
+            return values
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+class RedisBackend(CacheBackend):
+    """
+    Shared backend speaking the Redis protocol. Values are pickled.
+
+    A ready client (e.g. fakeredis.FakeRedis()) can be passed for testing;
+    otherwise one is created from the URL on first use.
+    """
+
+    def __init__(self, url=None, client=None):
+        self.url = url or Config.CACHE_REDIS_URL
+        self._client = client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # Imported lazily so the app runs without redis installed
+                    import redis
+                    self._client = redis.Redis.from_url(
+                        self.url,
+                        socket_connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+                        socket_timeout=Config.HTTP_CONNECT_TIMEOUT
+                    )
+        return self._client
+
+    def get(self, key):
+        data = self.client.get(key)
+        return pickle.loads(data) if data is not None else None
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return []
+        return [pickle.loads(data) if data is not None else None for data in self.client.mget(keys)]
+
+    def set(self, key, value, ttl=None):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if ttl is None:
+            self.client.set(key, data)
+        else:
+            self.client.set(key, data, ex=max(1, math.ceil(ttl)))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def delete_prefix(self, prefix):
+        keys = list(self.client.scan_iter(match=f"{prefix}*", count=500))
+        for offset in range(0, len(keys), 500):
+            self.client.delete(*keys[offset:offset + 500])
+
+    def acquire(self, key, timeout):
+        token = uuid.uuid4().hex
+        if self.client.set(f"{key}:lock", token, nx=True, px=max(1, int(timeout * 1000))):
+            return token
+        return None
+
+    def release(self, key, token):
+        lock_key = f"{key}:lock"
+        current = self.client.get(lock_key)
+        if current is not None and current.decode() == token:
+            self.client.delete(lock_key)
+
+class NamespacedStore:
+    """
+    View of a backend restricted to one namespace.
+    """
+
+    def __init__(self, backend, namespace, prefix=None):
+        self.backend = backend
+        self.namespace = namespace
+        self.prefix = f"{prefix or Config.CACHE_KEY_PREFIX}:{namespace}:"
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def get(self, key):
+        return self.backend.get(self._key(key))
+
+    def get_many(self, keys):
+        return self.backend.get_many([self._key(key) for key in keys])
+
+    def set(self, key, entry, ttl=None):
+        self.backend.set(self._key(key), entry, ttl)
+
+    def delete(self, key):
+        self.backend.delete(self._key(key))
+
+    def clear(self):
+        self.backend.delete_prefix(self.prefix)
+
+    def acquire(self, key, timeout):
+        return self.backend.acquire(self._key(key), timeout)
+
+    def release(self, key, token):
+        self.backend.release(self._key(key), token)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def create_cache_backend(name=None):
+    """
+    Create a backend by name ('memory' or 'redis').
+    """
+    name = (name or Config.CACHE_BACKEND).lower()
+    if name == 'redis':
+        return RedisBackend()
+    if name != 'memory':
+        logger.warning(f"Unknown cache backend '{name}', using in-process LRU")
+    return LRUBackend()
+
+def get_cache_backend():
+    """
+    Get the process-wide backend selected in Config.
+
+    Returns:
+        CacheBackend instance
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_cache_backend()
+                logger.info(f"Using {type(_backend).__name__} for caches")
+    return _backend
+
+def set_cache_backend(backend):
+    """
+    Replace the process-wide backend (e.g. with a fakeredis-backed one).
+    Caches created afterwards use the new backend.
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -4,20 +4,130 @@ Cryptocurrency API integration.
 Functions for fetching market data, prices, and other cryptocurrency information.
 Using CoinGecko Pro API.
 """
+import asyncio
 import requests
 import logging
 import time
-from datetime import datetime, timedelta
 from app.config import Config
+from app.utils.cache import TTLCache, cached
+from app.utils.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
 # Base URL for CoinGecko API
 COINGECKO_API_URL = 'https://pro-api.coingecko.com/api/v3'
 
+async def _gather_bounded(calls, limit):
+    """
+    Run blocking fetch calls concurrently on worker threads, with at most
+    `limit` in flight at once.
+    
+    Args:
+        calls: List of (func, args, kwargs) tuples
+        limit: Maximum number of concurrent calls
+    
+    Returns:
+        List of results in call order; failed calls yield their exception
+    """
+    semaphore = asyncio.Semaphore(limit)
+    
+    async def run(func, args, kwargs):
+        async with semaphore:
+            return await asyncio.to_thread(func, *args, **kwargs)
+    
+    return await asyncio.gather(
+        *(run(func, args, kwargs) for func, args, kwargs in calls),
+        return_exceptions=True
+    )
+
+def fetch_concurrently(calls, limit=None):
+    """
+    Synchronous facade for issuing independent upstream requests concurrently.
+    Intended for Flask views: the whole fan-out costs one round trip instead
+    of the sum of all of them.
+    
+    Args:
+        calls: Dictionary mapping a name to a (func, *args) tuple
+        limit: Maximum number of concurrent calls (defaults to ASYNC_FETCH_CONCURRENCY)
+    
+    Returns:
+        Dictionary mapping each name to its result; failed calls yield their exception
+    """
+    if not calls:
+        return {}
+    
+    names = list(calls)
+    call_list = [(calls[name][0], tuple(calls[name][1:]), {}) for name in names]
+    results = asyncio.run(_gather_bounded(call_list, limit or Config.ASYNC_FETCH_CONCURRENCY))
+    
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            logger.error(f"Concurrent fetch '{name}' failed: {str(result)}")
+    
+    return dict(zip(names, results))
+
+# Coin ids pinned regardless of the search index (well-known tickers)
+COIN_ID_OVERRIDES = {
+    'BTC': 'bitcoin',
+    'ETH': 'ethereum',
+    'BNB': 'binancecoin',
+    'XRP': 'ripple',
+    'USDT': 'tether',
+    'USDC': 'usd-coin',
+    'ADA': 'cardano',
+    'DOGE': 'dogecoin',
+    'SOL': 'solana',
+    'DOT': 'polkadot',
+    'SHIB': 'shiba-inu',
+    'AVAX': 'avalanche-2',
+    'MATIC': 'polygon',
+    'LTC': 'litecoin',
+    'UNI': 'uniswap',
+    'LINK': 'chainlink',
+    'XLM': 'stellar',
+    'ATOM': 'cosmos',
+    'CRO': 'crypto-com-chain',
+    'XMR': 'monero',
+    'ALGO': 'algorand',
+    'FTM': 'fantom',
+    'NEAR': 'near',
+    'FIL': 'filecoin',
+    'ICP': 'internet-computer',
+    'APE': 'apecoin',
+    'BCH': 'bitcoin-cash',
+    'TRX': 'tron',
+    'XTZ': 'tezos',
+    'EOS': 'eos',
+    'ZEC': 'zcash',
+    'ETC': 'ethereum-classic',
+    'XCH': 'chia',
+    'CHZ': 'chiliz',
+    'MIOTA': 'iota',
+    'MANA': 'decentraland',
+    'DASH': 'dash',
+    'CAKE': 'pancakeswap-token',
+    'THETA': 'theta-token',
+    'AXS': 'axie-infinity',
+    'OP': 'optimism',
+    'ARB': 'arbitrum',
+    'KLAY': 'klaytn',
+    'SAND': 'the-sandbox',
+    'AAVE': 'aave',
+    'MKR': 'maker',
+    'GRT': 'the-graph',
+    'CRV': 'curve-dao-token',
+    'QNT': 'quant-network',
+    'EGLD': 'elrond-erd-2',
+    'STX': 'blockstack',
+    'HBAR': 'hedera-hashgraph',
+    'VET': 'vechain'
+}
+
 def _get_coin_id(symbol):
     """
     Map cryptocurrency symbol to CoinGecko ID.
+    Pinned ids win; other tickers resolve through the coin search index
+    (collisions go to the largest coin by market cap).
     
     Args:
         symbol: Cryptocurrency symbol (e.g., 'BTC')
@@ -25,72 +135,67 @@ def _get_coin_id(symbol):
     Returns:
         CoinGecko coin ID
     """
+    from app.services.coin_search import resolve_coin_id
+    
     # Normalize symbol to uppercase
     symbol = symbol.upper() if isinstance(symbol, str) else ''
     
-    # Enhanced mappings for better icon fetching
-    mappings = {
-        'BTC': 'bitcoin',
-        'ETH': 'ethereum',
-        'BNB': 'binancecoin',
-        'XRP': 'ripple',
-        'USDT': 'tether',
-        'USDC': 'usd-coin',
-        'ADA': 'cardano',
-        'DOGE': 'dogecoin',
-        'SOL': 'solana',
-        'DOT': 'polkadot',
-        'SHIB': 'shiba-inu',
-        'AVAX': 'avalanche-2',
-        'MATIC': 'polygon',
-        'LTC': 'litecoin',
-        'UNI': 'uniswap',
-        'LINK': 'chainlink',
-        'XLM': 'stellar',
-        'ATOM': 'cosmos',
-        'CRO': 'crypto-com-chain',
-        'XMR': 'monero',
-        'ALGO': 'algorand',
-        'FTM': 'fantom',
-        'NEAR': 'near',
-        'FIL': 'filecoin',
-        'ICP': 'internet-computer',
-        'APE': 'apecoin',
-        'BCH': 'bitcoin-cash',
-        'TRX': 'tron',
-        'XTZ': 'tezos',
-        'EOS': 'eos',
-        'ZEC': 'zcash',
-        'ETC': 'ethereum-classic',
-        'XCH': 'chia',
-        'CHZ': 'chiliz',
-        'MIOTA': 'iota',
-        'MANA': 'decentraland',
-        'DASH': 'dash',
-        'CAKE': 'pancakeswap-token',
-        'THETA': 'theta-token',
-        'AXS': 'axie-infinity',
-        'OP': 'optimism',
-        'ARB': 'arbitrum',
-        'KLAY': 'klaytn',
-        'SAND': 'the-sandbox',
-        'AAVE': 'aave',
-        'MKR': 'maker',
-        'GRT': 'the-graph',
-        'CRV': 'curve-dao-token',
-        'QNT': 'quant-network',
-        'EGLD': 'elrond-erd-2',
-        'STX': 'blockstack',
-        'HBAR': 'hedera-hashgraph',
-        'VET': 'vechain'
-    }
+    coin_id = COIN_ID_OVERRIDES.get(symbol)
+    if coin_id:
+        return coin_id
+    
+    # Index resolution, or lowercase symbol as fallback
+    return resolve_coin_id(symbol) or symbol.lower()
+
+# Coin metadata cache: the /coins/list index is refreshed every 15 minutes,
+# individually looked-up coins are kept for an hour
+coin_cache = TTLCache('coins', ttl=900, stale_ttl=3600)
+
+# Market data and conversion rate caches, shared by all workers when the
+# Redis backend is configured
+market_cache = TTLCache('market', ttl=Config.MARKET_CACHE_TTL)
+rates_cache = TTLCache('rates', ttl=Config.RATES_CACHE_TTL)
+
+def _load_coin_list():
+    """
+    Fetch the full CoinGecko coin list.
+
+    Returns:
+        List of dictionaries with id, name and upper-case symbol, or None on failure
+    """
+    response = http_client.get(
+        f'{COINGECKO_API_URL}/coins/list',
+        params={
+            'include_platform': 'false',
+            'x_cg_pro_api_key': Config.COINGECKO_API_KEY
+        }
+    )
     
-    # Return mapped ID or lowercase symbol as fallback
-    return mappings.get(symbol, symbol.lower())
+    if response.status_code != 200:
+        logger.warning(f"Failed to get coin list from CoinGecko: {response.status_code}")
+        return None
+    
+    return [{
+        'id': coin['id'],
+        'name': coin['name'],
+        'symbol': coin['symbol'].upper()
+    } for coin in response.json()]
 
-# Add a caching mechanism to reduce API calls
-_coin_cache = {}
-_cache_timestamp = 0
+def get_coin_list(force_refresh=False):
+    """
+    Get the full coin list (one shared refresh for all callers).
+    
+    Args:
+        force_refresh: Force a refresh of the cache
+    
+    Returns:
+        List of coin dictionaries (empty if it has never loaded)
+    """
+    try:
+        return coin_cache.get_or_load('all', _load_coin_list, validate=bool, force=force_refresh) or []
+    except Exception as e:
+        logger.error(f"Error refreshing coin cache: {str(e)}")
+        return []
 
 def get_coin_data(symbol, force_refresh=False):
     """
@@ -103,66 +208,35 @@ def get_coin_data(symbol, force_refresh=False):
     Returns:
         Dictionary with coin data or None if not found
     """
-    import time
-    
-    global _coin_cache, _cache_timestamp
-    current_time = time.time()
-    
-    # Refresh cache if it's older than 15 minutes or forced refresh
-    if force_refresh or not _coin_cache or (current_time - _cache_timestamp > 900):  # 15 minutes
-        try:
-            # Get list of coins from CoinGecko
-            response = requests.get(
-                f'{COINGECKO_API_URL}/coins/list',
-                params={
-                    'include_platform': 'false',
-                    'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-                },
-                timeout=1000
-            )
-            
-            if response.status_code == 200:
-                coin_list = response.json()
-                
-                # Build cache from response
-                for coin in coin_list:
-                    _coin_cache[coin['symbol'].upper()] = {
-                        'id': coin['id'],
-                        'name': coin['name'],
-                        'symbol': coin['symbol'].upper()
-                    }
-                
-                _cache_timestamp = current_time
-            else:
-                logger.warning(f"Failed to get coin list from CoinGecko: {response.status_code}")
-        except Exception as e:
-            logger.error(f"Error refreshing coin cache: {str(e)}")
+    from app.services.coin_search import get_coin_index
     
     # Try with direct mapping first
     coin_id = _get_coin_id(symbol)
-    
-    # Then check cache
     symbol_upper = symbol.upper()
-    if symbol_upper in _coin_cache:
-        return _coin_cache[symbol_upper]
     
-    # If not in cache, try to get it directly (for newly added coins)
-    try:
-        # Get coin details via API
-        # (continue to use existing get_coin_details function)
+    # Then check the coin search index (pinned ids still win on collisions)
+    index = get_coin_index(force_refresh)
+    if index is not None:
+        coin = index.coins[index.slots[coin_id]] if coin_id in index.slots else index.resolve(symbol_upper)
+        if coin:
+            return dict(coin)
+    
+    # If not in the index, try to get it directly (for newly added coins)
+    def load_coin():
         details = get_coin_details(symbol)
-        if details:
-            # Add to cache
-            _coin_cache[symbol_upper] = {
-                'id': details.get('id', coin_id),
-                'name': details.get('name', symbol),
-                'symbol': symbol_upper,
-                'current_price': details.get('current_price', 0),
-                'image': details.get('image', '')
-            }
-            return _coin_cache[symbol_upper]
-    except Exception as e:
-        logger.error(f"Error getting coin data for {symbol}: {str(e)}")
+        if not details:
+            return None
+        return {
+            'id': details.get('id', coin_id),
+            'name': details.get('name', symbol),
+            'symbol': symbol_upper,
+            'current_price': details.get('current_price', 0),
+            'image': details.get('image', '')
+        }
+    
+    coin = coin_cache.get_or_load(f"symbol:{symbol_upper}", load_coin, ttl=3600)
+    if coin:
+        return coin
     
     # If nothing found, return basic info
     return {
@@ -173,7 +247,7 @@ def get_coin_data(symbol, force_refresh=False):
 
 def get_icon_url(symbol, size='large'):
     """
-    Get coin icon URL for a specific symbol
+    Get coin icon URL for a specific symbol (served by the local icon proxy)
     
     Args:
         symbol: Cryptocurrency symbol (e.g., 'BTC')
@@ -182,25 +256,15 @@ def get_icon_url(symbol, size='large'):
     Returns:
         String URL for the coin icon or empty string if not found
     """
+    from app.services.icon_service import icon_url
+    
     try:
-        coin_id = _get_coin_id(symbol)
-        
-        # Use a standard format for CoinGecko icon URLs
-        size_suffix = "small" if size == "small" else "large"
-        
-        # Try to fetch specific coin data
-        coin_data = get_coin_data(symbol)
-        
-        # If we got specific image URL from coin data, use that
-        if coin_data and 'image' in coin_data:
-            return coin_data['image']
-        
-        # Otherwise use the standard URL format
-        return f"https://assets.coingecko.com/coins/images/1/{size_suffix}/{coin_id}.png"
+        return icon_url(symbol, size)
     except Exception as e:
         logger.error(f"Error getting icon URL for {symbol}: {str(e)}")
         return ""
 
+@cached(rates_cache)
 def get_exchange_rates(base_currency='USDT', quote_currencies=None):
     """
     Get exchange rates for the specified currencies.
@@ -219,73 +283,39 @@ def get_exchange_rates(base_currency='USDT', quote_currencies=None):
         # Filter out base currency if it's in quote_currencies
         quote_currencies = [c for c in quote_currencies if c != base_currency]
         
+        # Resolve the USD price of every currency in one batched request
+        coin_ids = {currency: _get_coin_id(currency) for currency in quote_currencies + [base_currency]}
+        data = get_simple_prices(sorted(set(coin_ids.values())), ['usd'])
+        
+        def usd_price(currency):
+            return data.get(coin_ids[currency], {}).get('usd')
+        
         # If base currency is USDT, we can use simpler approach
         if base_currency == 'USDT':
             # Get rates for each crypto against USD/USDT
             rates = {}
             for currency in quote_currencies:
-                coin_id = _get_coin_id(currency)
-                response = requests.get(
-                    f'{COINGECKO_API_URL}/simple/price',
-                    params={
-                        'ids': coin_id,
-                        'vs_currencies': 'usd',
-                        'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-                    },
-                    timeout=1000
-                )
-                response.raise_for_status()
-                data = response.json()
-                
                 # For USDT as base, rate is 1/usd_price 
-                if coin_id in data and 'usd' in data[coin_id]:
-                    usd_price = data[coin_id]['usd']
-                    if usd_price > 0:
-                        rates[currency] = 1 / usd_price
+                price = usd_price(currency)
+                if price and price > 0:
+                    rates[currency] = 1 / price
             
             return rates
         else:
             # For other base currencies, get their USD rate first
-            base_id = _get_coin_id(base_currency)
-            base_response = requests.get(
-                f'{COINGECKO_API_URL}/simple/price',
-                params={
-                    'ids': base_id,
-                    'vs_currencies': 'usd',
-                    'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-                },
-                timeout=1000
-            )
-            base_response.raise_for_status()
-            base_data = base_response.json()
+            base_usd_price = usd_price(base_currency)
             
-            if base_id not in base_data or 'usd' not in base_data[base_id]:
+            if not base_usd_price:
                 logger.error(f"Could not get USD price for {base_currency}")
                 return {}
-                
-            base_usd_price = base_data[base_id]['usd']
             
             # Then get USD rates for quote currencies
             rates = {}
             for currency in quote_currencies:
-                coin_id = _get_coin_id(currency)
-                response = requests.get(
-                    f'{COINGECKO_API_URL}/simple/price',
-                    params={
-                        'ids': coin_id,
-                        'vs_currencies': 'usd',
-                        'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-                    },
-                    timeout=1000
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                if coin_id in data and 'usd' in data[coin_id]:
-                    quote_usd_price = data[coin_id]['usd']
-                    # Calculate the cross rate: quote_currency/base_currency
-                    if base_usd_price > 0:
-                        rates[currency] = quote_usd_price / base_usd_price
+                quote_usd_price = usd_price(currency)
+                # Calculate the cross rate: quote_currency/base_currency
+                if quote_usd_price is not None and base_usd_price > 0:
+                    rates[currency] = quote_usd_price / base_usd_price
             
             return rates
                 
@@ -293,6 +323,8 @@ def get_exchange_rates(base_currency='USDT', quote_currencies=None):
         logger.error(f"Error fetching exchange rates: {str(e)}")
         return {}
 
+# Fallback structures returned on upstream errors carry no 'id' and are not cached
+@cached(coin_cache, ttl=Config.MARKET_CACHE_TTL, validate=lambda details: bool(details and details.get('id')))
 def get_coin_details(symbol):
     """
     Get detailed information for a cryptocurrency.
@@ -308,7 +340,7 @@ def get_coin_details(symbol):
         coin_id = _get_coin_id(symbol)
         
         # Fetch coin data from CoinGecko
-        response = requests.get(
+        response = http_client.get(
             f'{COINGECKO_API_URL}/coins/{coin_id}',
             params={
                 'localization': 'false',
@@ -317,8 +349,7 @@ def get_coin_details(symbol):
                 'community_data': 'false',
                 'developer_data': 'false',
                 'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-            },
-            timeout=1000
+            }
         )
         
         response.raise_for_status()
@@ -374,62 +405,117 @@ def get_coin_details(symbol):
             'price_change_percentage_24h': 0
         }
 
-def get_market_overview(limit=100, offset=0):
+# CoinGecko's /coins/markets page size limit
+MARKETS_PAGE_SIZE = 250
+
+def _fetch_market_page(per_page, page):
     """
-    Get an overview of the cryptocurrency market.
+    Fetch one page of coins ordered by market cap.
     
     Args:
-        limit: Number of coins to return
-        offset: Offset for pagination
+        per_page: Coins per page (at most MARKETS_PAGE_SIZE)
+        page: 1-based page number
     
     Returns:
         List of dictionaries with market data
     """
+    response = http_client.get(
+        f'{COINGECKO_API_URL}/coins/markets',
+        params={
+            'vs_currency': 'usd',
+            'order': 'market_cap_desc',
+            'per_page': per_page,
+            'page': page,
+            'sparkline': 'false',
+            'x_cg_pro_api_key': Config.COINGECKO_API_KEY
+        }
+    )
+    
+    response.raise_for_status()
+    data = response.json()
+    
+    # Transform data to match expected format
+    result = []
+    for coin in data:
+        result.append({
+            'id': coin['id'],
+            'symbol': coin['symbol'].upper(),
+            'name': coin['name'],
+            'image': coin['image'],  # Make sure this is included
+            'current_price': coin['current_price'],
+            'market_cap': coin['market_cap'],
+            'market_cap_rank': coin['market_cap_rank'],
+            'total_volume': coin['total_volume'],
+            'price_change_percentage_24h': coin['price_change_percentage_24h'],
+            'circulating_supply': coin['circulating_supply'],
+            'total_supply': coin['total_supply'],
+            'max_supply': coin['max_supply'],
+            'last_updated': coin['last_updated']
+        })
+    
+    return result
+
+def fetch_coin_markets(count):
+    """
+    Fetch the top coins by market cap, requesting pages concurrently when
+    count exceeds one page.
+    
+    Args:
+        count: Number of coins to fetch
+    
+    Returns:
+        List of dictionaries with market data in market cap order
+    
+    Raises:
+        RuntimeError: If the first page can't be fetched
+    """
+    pages = max(1, -(-count // MARKETS_PAGE_SIZE))
+    per_page = min(count, MARKETS_PAGE_SIZE)
+    if pages == 1:
+        results = {1: _fetch_market_page(per_page, 1)}
+    else:
+        results = fetch_concurrently({page: (_fetch_market_page, per_page, page) for page in range(1, pages + 1)})
+    
+    coins = []
+    for page in range(1, pages + 1):
+        data = results.get(page)
+        if isinstance(data, Exception) or data is None:
+            if page == 1:
+                raise RuntimeError(f"Unable to fetch market data: {str(data)}")
+            # Keep the contiguous prefix so ranks stay consistent
+            break
+        coins.extend(data)
+        if len(data) < per_page:
+            break
+    return coins[:count]
+
+@cached(market_cache)
+def _get_market_page(limit, offset):
     try:
-        # Calculate page number for API request
-        page = offset // limit + 1
-        
-        # Fetch market data from CoinGecko
-        response = requests.get(
-            f'{COINGECKO_API_URL}/coins/markets',
-            params={
-                'vs_currency': 'usd',
-                'order': 'market_cap_desc',
-                'per_page': limit,
-                'page': page,
-                'sparkline': 'false',
-                'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-            },
-            timeout=1000
-        )
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        # Transform data to match expected format
-        result = []
-        for coin in data:
-            result.append({
-                'id': coin['id'],
-                'symbol': coin['symbol'].upper(),
-                'name': coin['name'],
-                'image': coin['image'],  # Make sure this is included
-                'current_price': coin['current_price'],
-                'market_cap': coin['market_cap'],
-                'market_cap_rank': coin['market_cap_rank'],
-                'total_volume': coin['total_volume'],
-                'price_change_percentage_24h': coin['price_change_percentage_24h'],
-                'circulating_supply': coin['circulating_supply'],
-                'total_supply': coin['total_supply'],
-                'max_supply': coin['max_supply'],
-                'last_updated': coin['last_updated']
-            })
-        
-        return result
+        return _fetch_market_page(limit, offset // limit + 1)
     except requests.RequestException as e:
         logger.error(f"Error fetching market overview: {str(e)}")
         raise RuntimeError("Unable to fetch market data. Please try again later.")
 
+def get_market_overview(limit=100, offset=0):
+    """
+    Get an overview of the cryptocurrency market.
+    Served from the shared market snapshot; pages past it are fetched directly.
+    
+    Args:
+        limit: Number of coins to return
+        offset: Offset for pagination
+    
+    Returns:
+        List of dictionaries with market data
+    """
+    from app.services.market_snapshot import get_market_snapshot
+    
+    snapshot = get_market_snapshot()
+    if offset + limit <= len(snapshot):
+        return snapshot.overview(limit, offset)
+    return _get_market_page(limit, offset)
+
 def get_chart_data(symbol, interval='1d', limit=100):
     """
     Get historical chart data for a cryptocurrency.
@@ -461,15 +547,14 @@ def get_chart_data(symbol, interval='1d', limit=100):
         days = days_map.get(interval, 30)
         
         # Fetch market chart data from CoinGecko
-        response = requests.get(
+        response = http_client.get(
             f'{COINGECKO_API_URL}/coins/{coin_id}/market_chart',
             params={
                 'vs_currency': 'usd',
                 'days': days,
                 'interval': 'daily',
                 'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-            },
-            timeout=1000
+            }
         )
         
         response.raise_for_status()
@@ -515,9 +600,61 @@ def get_chart_data(symbol, interval='1d', limit=100):
         logger.error(f"Error fetching chart data: {str(e)}")
         raise RuntimeError(f"Unable to fetch chart data for {symbol}. Please try again later.")
 
+def get_market_chart_points(symbol, days):
+    """
+    Get raw price points for a cryptocurrency from CoinGecko.
+    CoinGecko picks the granularity from the range (5-minute points for one
+    day, hourly up to 90 days, daily beyond).
+    
+    Args:
+        symbol: Cryptocurrency symbol (e.g., 'BTC')
+        days: Number of days of history (or 'max')
+    
+    Returns:
+        List of [timestamp_ms, price] pairs, oldest first
+    """
+    response = http_client.get(
+        f'{COINGECKO_API_URL}/coins/{_get_coin_id(symbol)}/market_chart',
+        params={
+            'vs_currency': 'usd',
+            'days': days,
+            'x_cg_pro_api_key': Config.COINGECKO_API_KEY
+        }
+    )
+    response.raise_for_status()
+    return response.json().get('prices', [])
+
+def get_simple_prices(coin_ids, vs_currencies):
+    """
+    Get prices for many coins in a single CoinGecko request.
+    
+    Args:
+        coin_ids: List of CoinGecko coin IDs (e.g., ['bitcoin', 'ethereum'])
+        vs_currencies: List of CoinGecko vs currencies (e.g., ['usd', 'btc'])
+    
+    Returns:
+        Dictionary mapping coin ID to {vs_currency: price}
+    """
+    if not coin_ids or not vs_currencies:
+        return {}
+    
+    response = http_client.get(
+        f'{COINGECKO_API_URL}/simple/price',
+        params={
+            'ids': ','.join(coin_ids),
+            'vs_currencies': ','.join(vs_currencies),
+            'x_cg_pro_api_key': Config.COINGECKO_API_KEY
+        }
+    )
+    
+    response.raise_for_status()
+    return response.json()
+
 def get_current_price(currency_pair):
     """
     Get the current price for a trading pair.
+    Served from the shared price oracle, falling back to a direct lookup
+    when the oracle has no usable quote.
     
     Args:
         currency_pair: Trading pair (e.g., 'BTC/USDT')
@@ -526,79 +663,96 @@ def get_current_price(currency_pair):
         Current price as a float
     """
     try:
-        # Extract base currency from the pair format
-        parts = currency_pair.split('/')
-        if len(parts) != 2:
-            logger.error(f"Invalid currency pair format: {currency_pair}")
-            return 0
-            
-        base_currency = parts[0]  # e.g., 'BTC' from 'BTC/USDT'
-        quote_currency = parts[1]  # e.g., 'USDT' from 'BTC/USDT'
-        
-        # Map quote currency properly - CoinGecko uses 'usd' for USDT
-        vs_currency = quote_currency.lower()
-        if vs_currency == 'usdt':
-            vs_currency = 'usd'  # CoinGecko uses USD as equivalent to USDT
-        
-        # Get coin ID for the base currency
-        coin_id = _get_coin_id(base_currency)
-        
-        # Fetch current price from CoinGecko
-        response = requests.get(
-            f'{COINGECKO_API_URL}/simple/price',
-            params={
-                'ids': coin_id,
-                'vs_currencies': vs_currency,
-                'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-            },
-            timeout=1000
-        )
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        # Extract price from response
-        if coin_id in data and vs_currency in data[coin_id]:
-            return float(data[coin_id][vs_currency])
+        from app.utils.price_oracle import price_oracle
+        price = price_oracle.get_current_price(currency_pair)
+        if price > 0:
+            return price
+    except Exception as e:
+        logger.error(f"Error reading price oracle for {currency_pair}: {str(e)}")
+    
+    return _fetch_current_price(currency_pair)
+
+def get_current_prices(currency_pairs):
+    """
+    Get current prices for many trading pairs at once.
+    Duplicate pairs are collapsed and all of them are resolved from the shared
+    price oracle with at most one batched upstream request. Pairs the oracle
+    cannot quote fall back to one direct price-source lookup.
+    
+    Args:
+        currency_pairs: List of trading pairs (e.g., ['BTC/USDT', 'ETH/USDT'])
+    
+    Returns:
+        Dictionary mapping each pair to its current price as a float
+    """
+    unique_pairs = set(currency_pairs or [])
+    
+    try:
+        from app.utils.price_oracle import price_oracle
+        prices = price_oracle.get_current_prices(unique_pairs)
+    except Exception as e:
+        logger.error(f"Error reading price oracle: {str(e)}")
+        prices = {}
+    
+    missing = [currency_pair for currency_pair in unique_pairs if prices.get(currency_pair, 0) <= 0]
+    if missing:
+        prices.update(_fetch_current_prices(missing))
+    
+    return prices
+
+def _fetch_current_prices(currency_pairs):
+    """
+    Fetch current prices for trading pairs directly from the price sources,
+    bypassing the oracle. Sources are tried behind their circuit breakers and
+    hedged, so this returns within PRICE_SOURCE_TIMEOUT even during an
+    upstream brownout.
+    
+    Args:
+        currency_pairs: Iterable of trading pairs (e.g., ['BTC/USDT'])
+    
+    Returns:
+        Dictionary mapping each pair to its price as a float (0 if unavailable)
+    """
+    from app.utils.price_oracle import PriceOracle
+    from app.utils.price_sources import price_router
+    
+    pairs = {}
+    for currency_pair in currency_pairs:
+        normalized = PriceOracle.normalize_pair(currency_pair)
+        if normalized:
+            pairs[currency_pair] = normalized
         else:
-            logger.error(f"Could not find price for {currency_pair} in API response. Response: {data}")
-            # Try fallback using market data
-            try:
-                # Fetch coin market data which includes price
-                market_response = requests.get(
-                    f'{COINGECKO_API_URL}/coins/markets',
-                    params={
-                        'vs_currency': vs_currency,
-                        'ids': coin_id,
-                        'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-                    },
-                    timeout=1000
-                )
-                market_response.raise_for_status()
-                market_data = market_response.json()
-                
-                if market_data and len(market_data) > 0 and 'current_price' in market_data[0]:
-                    return float(market_data[0]['current_price'])
-                else:
-                    logger.error(f"Fallback also failed to find price for {currency_pair}")
-                    return 0
-            except Exception as e:
-                logger.error(f"Error in fallback price fetch: {str(e)}")
-                return 0
-            
-    except requests.RequestException as e:
-        logger.error(f"Error fetching current price: {str(e)}")
-        return 0
-    except (KeyError, IndexError, ValueError) as e:
-        logger.error(f"Error parsing price data: {str(e)}")
-        return 0
+            logger.error(f"Invalid currency pair format: {currency_pair}")
+    
+    try:
+        fetched = price_router.get_prices(pairs.values()) if pairs else {}
     except Exception as e:
-        logger.error(f"Unexpected error in get_current_price: {str(e)}")
-        return 0
+        logger.error(f"Error fetching current prices: {str(e)}")
+        fetched = {}
+    
+    prices = {}
+    for currency_pair in currency_pairs:
+        price = fetched.get(pairs.get(currency_pair), 0)
+        if price <= 0 and currency_pair in pairs:
+            logger.error(f"Could not find price for {currency_pair} from any price source")
+        prices[currency_pair] = price
+    return prices
+
+def _fetch_current_price(currency_pair):
+    """
+    Fetch the current price for a trading pair directly from the price sources.
+    
+    Args:
+        currency_pair: Trading pair (e.g., 'BTC/USDT')
+    
+    Returns:
+        Current price as a float
+    """
+    return _fetch_current_prices([currency_pair])[currency_pair]
 
 def get_popular_coins(limit=5):
     """
-    Get a list of popular coins.
+    Get a list of popular coins (largest by market cap, from the market snapshot).
     
     Args:
         limit: Number of coins to return
@@ -606,45 +760,17 @@ def get_popular_coins(limit=5):
     Returns:
         List of popular cryptocurrency details
     """
-    try:
-        # Fetch popular coins from CoinGecko (based on market cap)
-        response = requests.get(
-            f'{COINGECKO_API_URL}/coins/markets',
-            params={
-                'vs_currency': 'usd',
-                'order': 'market_cap_desc',
-                'per_page': limit,
-                'page': 1,
-                'sparkline': 'false',
-                'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-            },
-            timeout=1000
-        )
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        # Transform data to the expected format
-        result = []
-        for coin in data:
-            result.append({
-                'symbol': coin['symbol'].upper(),
-                'name': coin['name'],
-                'price': coin['current_price'],
-                'change_24h': coin['price_change_percentage_24h'] or 0.0,  # Handle None values
-                'image': coin['image']  # Include the image URL
-            })
-        
-        return result
-    except requests.RequestException as e:
-        logger.error(f"Error fetching popular coins: {str(e)}")
+    from app.services.market_snapshot import get_market_snapshot
+    
+    snapshot = get_market_snapshot()
+    if not len(snapshot):
         raise RuntimeError("Unable to fetch popular coins. Please try again later.")
-
-# Update this function in app/utils/crypto_api.py
+    return snapshot.popular(limit)
 
 def get_new_listings(limit=5):
     """
-    Get a list of new cryptocurrency listings.
+    Get a list of new cryptocurrency listings (most recently updated coins in
+    the market snapshot; timestamps are parsed once per snapshot).
     
     Args:
         limit: Number of new listings to return
@@ -652,98 +778,18 @@ def get_new_listings(limit=5):
     Returns:
         List of new cryptocurrency listings
     """
+    from app.services.market_snapshot import get_market_snapshot
+    
     try:
-        # Fetch new listings from CoinGecko
-        response = requests.get(
-            f'{COINGECKO_API_URL}/coins/markets',
-            params={
-                'vs_currency': 'usd',
-                'order': 'id_asc',  # New coins typically have higher IDs
-                'per_page': 250,    # Fetch a larger set to filter
-                'page': 1,
-                'sparkline': 'false',
-                'x_cg_pro_api_key': Config.COINGECKO_API_KEY
-            },
-            timeout=1000
-        )
-        
-        response.raise_for_status()
-        all_coins = response.json()
-        
-        # Get current time in UTC with no timezone info
-        current_time_naive = datetime.utcnow()
-        one_year_ago = current_time_naive - timedelta(days=365)
-        
-        # Sort coins by the 'last_updated' field to get the most recently added ones
-        # Convert date strings to datetime objects for proper sorting
-        for coin in all_coins:
-            try:
-                # Check if last_updated is None or empty
-                if not coin.get('last_updated'):
-                    # Use a default old date for sorting
-                    coin['last_updated_datetime'] = one_year_ago
-                else:
-                    # Try to parse the date string (handle different formats)
-                    last_updated = coin['last_updated']
-                    if isinstance(last_updated, str):
-                        # Parse the date string to datetime object
-                        if 'Z' in last_updated:
-                            # Convert to naive datetime by removing timezone info
-                            dt = datetime.strptime(last_updated.replace('Z', ''), '%Y-%m-%dT%H:%M:%S.%f')
-                        elif '+' in last_updated:
-                            # Parse with timezone, then convert to naive
-                            dt = datetime.strptime(last_updated.split('+')[0], '%Y-%m-%dT%H:%M:%S.%f')
-                        else:
-                            # Regular ISO format without timezone
-                            dt = datetime.strptime(last_updated, '%Y-%m-%dT%H:%M:%S.%f')
-                        
-                        coin['last_updated_datetime'] = dt
-                    else:
-                        # If it's not a string, use fallback
-                        coin['last_updated_datetime'] = one_year_ago
-            except (ValueError, TypeError, AttributeError) as e:
-                logger.warning(f"Error parsing date '{coin.get('last_updated')}': {str(e)}")
-                # If parsing fails, use the fallback date
-                coin['last_updated_datetime'] = one_year_ago
-        
-        # Sort by last_updated in descending order
-        # Use a safe getter function with default value for missing keys
-        def get_date(coin_data):
-            date = coin_data.get('last_updated_datetime')
-            return date if date is not None else one_year_ago
-            
-        all_coins.sort(key=get_date, reverse=True)
-        
-        # Take only the required number of coins
-        new_coins = all_coins[:limit]
-        
-        # Transform data to the expected format
-        result = []
-        for coin in new_coins:
-            # Handle potential missing data
-            price_change = coin.get('price_change_percentage_24h')
-            if price_change is None:
-                price_change = 0.0
-                
-            result.append({
-                'symbol': coin.get('symbol', '').upper(),
-                'name': coin.get('name', 'Unknown'),
-                'price': coin.get('current_price', 0),
-                'change_24h': price_change,
-                'image': coin.get('image')  # Include the image URL
-            })
-        
-        return result
-    except requests.RequestException as e:
-        logger.error(f"Error fetching new listings: {str(e)}")
-        # Return empty list as fallback
-        return []
+        return get_market_snapshot().new_listings(limit)
     except Exception as e:
         logger.error(f"Unexpected error in get_new_listings: {str(e)}")
         # Return empty list as fallback
         return []
-    
-# Add these functions to app/utils/crypto_api.py
+
+def _get_top(order, limit):
+    from app.services.market_snapshot import get_market_snapshot
+    return get_market_snapshot().top(order, limit)
 
 def get_top_gainers(limit=20):
     """
@@ -756,17 +802,7 @@ def get_top_gainers(limit=20):
         List of top gaining cryptocurrencies
     """
     try:
-        # Get market data and sort by price change percentage (descending)
-        market_data = get_market_overview(limit=100)
-        
-        # Filter out entries with None price change
-        filtered_data = [coin for coin in market_data if coin.get('price_change_percentage_24h') is not None]
-        
-        # Sort by price change percentage (descending)
-        filtered_data.sort(key=lambda x: x.get('price_change_percentage_24h', 0), reverse=True)
-        
-        # Return the top N coins
-        return filtered_data[:limit]
+        return _get_top('gainers', limit)
     except Exception as e:
         logger.error(f"Error fetching top gainers: {str(e)}")
         return []
@@ -782,17 +818,7 @@ def get_top_losers(limit=20):
         List of top losing cryptocurrencies
     """
     try:
-        # Get market data and sort by price change percentage (ascending)
-        market_data = get_market_overview(limit=100)
-        
-        # Filter out entries with None price change
-        filtered_data = [coin for coin in market_data if coin.get('price_change_percentage_24h') is not None]
-        
-        # Sort by price change percentage (ascending)
-        filtered_data.sort(key=lambda x: x.get('price_change_percentage_24h', 0))
-        
-        # Return the top N coins
-        return filtered_data[:limit]
+        return _get_top('losers', limit)
     except Exception as e:
         logger.error(f"Error fetching top losers: {str(e)}")
         return []
@@ -808,17 +834,7 @@ def get_top_volume(limit=20):
         List of cryptocurrencies with highest trading volume
     """
     try:
-        # Get market data and sort by total volume (descending)
-        market_data = get_market_overview(limit=100)
-        
-        # Filter out entries with None volume
-        filtered_data = [coin for coin in market_data if coin.get('total_volume') is not None]
-        
-        # Sort by total volume (descending)
-        filtered_data.sort(key=lambda x: x.get('total_volume', 0), reverse=True)
-        
-        # Return the top N coins
-        return filtered_data[:limit]
+        return _get_top('volume', limit)
     except Exception as e:
         logger.error(f"Error fetching top volume: {str(e)}")
-        return []
\ No newline at end of file
+        return []
@@ -48,36 +48,9 @@ def format_currency_amount(amount, currency=None, precision=None):
     Returns:
         Formatted amount string
     """
-    # Handle None case safely
-    if amount is None:
-        amount = 0
-    
-    # Ensure amount is a float for formatting
-    try:
-        amount = float(amount)
-    except (TypeError, ValueError):
-        # If conversion fails, default to 0
-        amount = 0
-    
-    # Set precision based on currency if not explicitly specified
-    if precision is None:
-        if currency in ['BTC']:
-            precision = 8
-        elif currency in ['ETH', 'BNB']:
-            precision = 6
-        elif currency in ['USDT', 'USDC', 'DAI']:
-            precision = 2
-        else:
-            precision = 4
-    
-    # Format the amount
-    formatted = f"{float(amount):.{precision}f}"
-    
-    # Remove trailing zeros after decimal point
-    if '.' in formatted:
-        formatted = formatted.rstrip('0').rstrip('.') if '.' in formatted else formatted
-    
-    return formatted
+    # Rounded once, in decimal, at the currency's display precision
+    from app.utils.money import format_money
+    return format_money(amount, currency, precision)
 
 def format_datetime(dt, format_str='%Y-%m-%d %H:%M:%S'):
     """
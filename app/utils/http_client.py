@@ -0,0 +1,178 @@
+# app/utils/http_client.py
+"""
+Shared outbound HTTP client.
+Keeps one pooled keep-alive session per upstream host, applies sane
+connect/read timeouts, retries idempotent requests with backoff on 429/5xx and
+records per-host latency histograms.
+"""
+import bisect
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +inf
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram for one upstream host.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            if error:
+                self.errors += 1
+
+    def percentile(self, fraction):
+        """
+        Approximate a latency percentile from the bucket counts.
+
+        Returns:
+            Bucket upper bound in seconds, or None if nothing was observed
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            target = fraction * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if seen >= target:
+                    return self.buckets[index] if index < len(self.buckets) else float('inf')
+            return float('inf')
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"le_{bucket}" for bucket in self.buckets] + ['le_inf']
+            return {
+                'count': self.count,
+                'errors': self.errors,
+                'avg_seconds': self.total / self.count if self.count else None,
+                'buckets': dict(zip(labels, self.counts))
+            }
+
+class HttpClient:
+    """
+    Pooled HTTP client with one requests.Session per host.
+    """
+
+    def __init__(self, connect_timeout=None, read_timeout=None, max_retries=None,
+                 retry_backoff=None, pool_maxsize=None):
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else Config.HTTP_CONNECT_TIMEOUT,
+            read_timeout if read_timeout is not None else Config.HTTP_READ_TIMEOUT
+        )
+        self.max_retries = max_retries if max_retries is not None else Config.HTTP_MAX_RETRIES
+        self.retry_backoff = retry_backoff if retry_backoff is not None else Config.HTTP_RETRY_BACKOFF
+        self.pool_maxsize = pool_maxsize or Config.HTTP_POOL_MAXSIZE
+
+        self._sessions = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self):
+        # Only idempotent methods are retried; POSTs (SMS, push) must not be sent twice
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            status=self.max_retries,
+            backoff_factor=self.retry_backoff,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def session(self, host):
+        """
+        Get the pooled session for a host, creating it on first use.
+        """
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._sessions[host] = self._create_session()
+                    self._histograms.setdefault(host, LatencyHistogram())
+        return session
+
+    def histogram(self, host):
+        self.session(host)
+        return self._histograms[host]
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request through the pooled session for the URL's host.
+
+        Accepts the same keyword arguments as requests.request. A default
+        (connect, read) timeout is applied when none is given.
+
+        Returns:
+            requests.Response
+        """
+        host = urlsplit(url).netloc
+        session = self.session(host)
+        kwargs.setdefault('timeout', self.timeout)
+
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._histograms[host].observe(time.perf_counter() - started, error=True)
+            raise
+
+        self._histograms[host].observe(time.perf_counter() - started, error=response.status_code >= 500)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """
+        Get per-host latency histograms.
+
+        Returns:
+            Dictionary mapping host to histogram snapshot
+        """
+        with self._lock:
+            hosts = list(self._histograms.items())
+        return {host: histogram.snapshot() for host, histogram in hosts}
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+# Process-wide client instance
+http_client = HttpClient()
@@ -0,0 +1,179 @@
+# app/utils/money.py
+"""
+Fixed-point money.
+Money columns are stored as NUMERIC(28, 8): every amount written is rounded
+once to 8 decimal places (satoshi precision) from its decimal representation,
+so values no longer pick up binary float drift across read-modify-write
+cycles and SQL SUM() over them is exact. Aggregations in Python go through
+integer minor units (1e-8) in NumPy, so sums and statistics over many
+amounts are exact without per-value rounding loops.
+
+Display precision is per currency metadata; amounts are only rounded to it
+when formatted.
+"""
+from decimal import Decimal, ROUND_HALF_EVEN
+import numpy as np
+from sqlalchemy.types import Numeric, TypeDecorator
+
+# Stored precision of every money column and ledger amount
+SCALE = 8
+QUANTUM = Decimal(1).scaleb(-SCALE)
+MINOR_UNITS = 10 ** SCALE
+
+# Decimal places shown per currency (amounts are stored at SCALE regardless)
+DISPLAY_PRECISION = {
+    'BTC': 8,
+    'ETH': 6,
+    'BNB': 6,
+    'USDT': 2,
+    'USDC': 2,
+    'DAI': 2
+}
+DEFAULT_DISPLAY_PRECISION = 4
+
+# Largest float magnitude whose minor units are still exact in float64 (2**53)
+_EXACT_FLOAT_LIMIT = 2 ** 53 / MINOR_UNITS
+
+def display_precision(currency):
+    """
+    Decimal places to show for a currency.
+    """
+    return DISPLAY_PRECISION.get((currency or '').upper(), DEFAULT_DISPLAY_PRECISION)
+
+def to_decimal(value, places=SCALE):
+    """
+    Convert a number to a Decimal rounded to places (half-even). Floats are
+    converted through their shortest repr, so 0.1 becomes Decimal('0.1').
+    """
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value or 0))
+    return value.quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_EVEN)
+
+class Money(TypeDecorator):
+    """
+    NUMERIC(28, 8) money column. Bound values are rounded to 8 places from
+    their decimal representation; loaded values are Python floats, so model
+    arithmetic and templates keep working unchanged (any 8-place amount
+    below 2**53 / 1e8 round-trips through float exactly).
+    """
+    impl = Numeric(28, SCALE)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_decimal(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return float(value)
+
+def _units_array(units):
+    # Amounts past ~9.2e10 whole units don't fit int64; keep them as Python ints
+    try:
+        return np.array(units, dtype=np.int64)
+    except OverflowError:
+        return np.array(units, dtype=object)
+
+def to_minor_units(values):
+    """
+    Convert amounts to int64 minor units (1e-8); amounts too large for int64
+    give an object array of Python ints.
+
+    Args:
+        values: Sequence or array of floats, ints or Decimals (None counts as 0)
+
+    Returns:
+        numpy int64 array
+    """
+    if isinstance(values, np.ndarray) and values.dtype != object:
+        array = values
+    else:
+        values = [0 if value is None else value for value in values]
+        if any(isinstance(value, Decimal) for value in values):
+            return _units_array([int(to_decimal(value).scaleb(SCALE)) for value in values])
+        array = np.asarray(values)
+
+    array = np.nan_to_num(array.astype(np.float64))
+    if array.size and np.abs(array).max() >= _EXACT_FLOAT_LIMIT:
+        return _units_array([int(to_decimal(float(value)).scaleb(SCALE)) for value in array.ravel()]).reshape(array.shape)
+    return np.rint(array * MINOR_UNITS).astype(np.int64)
+
+def from_minor_units(units):
+    """
+    Convert an integer number of minor units to a Decimal amount.
+    """
+    return Decimal(int(units)).scaleb(-SCALE)
+
+def _exact_sum(units, axis=None):
+    # int64 sums overflow only past ~9.2e10 whole units; fall back to Python ints
+    if units.size and int(np.abs(units).max()) * units.size >= 2 ** 63:
+        return np.sum(units.astype(object), axis=axis)
+    return np.sum(units, axis=axis)
+
+def sum_money(values):
+    """
+    Exact sum of amounts.
+
+    Returns:
+        Decimal total
+    """
+    return from_minor_units(_exact_sum(to_minor_units(values)))
+
+def money_stats(values):
+    """
+    Exact count, sum, min, max and mean (rounded to 8 places) of amounts.
+
+    Returns:
+        Dictionary of Decimals (count is an int)
+    """
+    units = to_minor_units(values)
+    if not units.size:
+        return {'count': 0, 'sum': Decimal(0), 'min': None, 'max': None, 'mean': None}
+
+    total = int(_exact_sum(units))
+    return {
+        'count': int(units.size),
+        'sum': from_minor_units(total),
+        'min': from_minor_units(units.min()),
+        'max': from_minor_units(units.max()),
+        'mean': to_decimal(Decimal(total) / units.size / MINOR_UNITS)
+    }
+
+def value_in(balances, rates):
+    """
+    Value amounts at exchange rates, each value rounded once to 8 places.
+
+    Args:
+        balances: Array-like of amounts, any shape (e.g., wallets x wallet types)
+        rates: Array-like of rates broadcastable against balances
+
+    Returns:
+        numpy int64 array of values in minor units (sum with sum_units)
+    """
+    balances = np.asarray(balances, dtype=object)
+    units = to_minor_units(list(balances.ravel())).reshape(balances.shape).astype(np.float64)
+    return np.rint(units * np.asarray(rates, dtype=np.float64)).astype(np.int64)
+
+def sum_units(units, axis=None):
+    """
+    Exact sum of minor-unit arrays as a Decimal, or a list of Decimals along axis.
+    """
+    total = _exact_sum(np.asarray(units), axis=axis)
+    if axis is None:
+        return from_minor_units(total)
+    return [from_minor_units(value) for value in np.ravel(total)]
+
+def format_money(amount, currency=None, precision=None):
+    """
+    Format an amount at its currency's display precision without trailing zeros.
+    """
+    places = display_precision(currency) if precision is None else precision
+    try:
+        formatted = f"{to_decimal(amount if amount is not None else 0, places):f}"
+    except Exception:
+        formatted = f"{Decimal(0):.{places}f}"
+    if '.' in formatted:
+        formatted = formatted.rstrip('0').rstrip('.')
+    return '0' if formatted in ('-0', '') else formatted
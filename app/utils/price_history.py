@@ -0,0 +1,189 @@
+# app/utils/price_history.py
+"""
+Memory-mapped columnar price history.
+Each symbol is a directory with one raw little-endian file per column
+(timestamp as int64 epoch milliseconds; open/high/low/close/volume as
+float64). Columns are opened with numpy.memmap, so time-range slices are
+zero-copy views, and new rows are appended without rewriting the files.
+"""
+import logging
+import os
+import threading
+import numpy as np
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = {
+    'timestamp': np.dtype('<i8'),
+    'open': np.dtype('<f8'),
+    'high': np.dtype('<f8'),
+    'low': np.dtype('<f8'),
+    'close': np.dtype('<f8'),
+    'volume': np.dtype('<f8')
+}
+
+class PriceHistory:
+    """
+    Price history of one symbol, ordered by timestamp.
+    """
+
+    def __init__(self, symbol, root=None):
+        self.symbol = symbol.upper()
+        self.path = os.path.join(root or Config.PRICE_HISTORY_DIR, self.symbol)
+        self._maps = None
+        self._lock = threading.Lock()
+
+    def _column_path(self, column):
+        return os.path.join(self.path, f"{column}.bin")
+
+    def _load(self):
+        maps = {}
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(column)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            length = size // dtype.itemsize
+            maps[column] = np.memmap(path, dtype=dtype, mode='r', shape=(length,)) if length else np.empty(0, dtype=dtype)
+
+        # A crash mid-append can leave columns of different lengths
+        length = min(len(values) for values in maps.values())
+        return {column: values[:length] for column, values in maps.items()}
+
+    @property
+    def columns(self):
+        """
+        Read-only memory-mapped column arrays.
+        """
+        if self._maps is None:
+            with self._lock:
+                if self._maps is None:
+                    self._maps = self._load()
+        return self._maps
+
+    def __len__(self):
+        return len(self.columns['timestamp'])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def index_range(self, start=None, end=None):
+        """
+        Row indices [first, last) covering a time range.
+
+        Args:
+            start: Range start, epoch milliseconds (inclusive)
+            end: Range end, epoch milliseconds (inclusive)
+        """
+        timestamps = self.columns['timestamp']
+        first = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        last = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+        return first, last
+
+    def slice(self, start=None, end=None):
+        """
+        Zero-copy views of every column for a time range.
+
+        Returns:
+            Dictionary mapping column name to array view
+        """
+        first, last = self.index_range(start, end)
+        return {column: values[first:last] for column, values in self.columns.items()}
+
+    def last_timestamp(self):
+        timestamps = self.columns['timestamp']
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def append(self, rows):
+        """
+        Append rows newer than the last stored timestamp.
+
+        Args:
+            rows: Iterable of [timestamp_ms, open, high, low, close, volume]
+
+        Returns:
+            Number of rows appended
+        """
+        data = np.asarray(rows, dtype=np.float64).reshape(-1, len(COLUMNS))
+        if not len(data):
+            return 0
+
+        data = data[np.argsort(data[:, 0], kind='stable')]
+        last = self.last_timestamp()
+        if last is not None:
+            data = data[data[:, 0] > last]
+        if not len(data):
+            return 0
+
+        # Drop duplicate timestamps within the batch, keeping the latest row
+        keep = np.append(data[1:, 0] != data[:-1, 0], True)
+        data = data[keep]
+
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            for position, (column, dtype) in enumerate(COLUMNS.items()):
+                with open(self._column_path(column), 'ab') as column_file:
+                    column_file.write(data[:, position].astype(dtype).tobytes())
+            self._maps = None
+
+        return len(data)
+
+class PriceHistoryStore:
+    """
+    Directory of per-symbol price histories.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or Config.PRICE_HISTORY_DIR
+        self._histories = {}
+
+    def open(self, symbol):
+        symbol = symbol.upper()
+        history = self._histories.get(symbol)
+        if history is None:
+            history = self._histories[symbol] = PriceHistory(symbol, self.root)
+        return history
+
+    def symbols(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, 'timestamp.bin'))
+        )
+
+def import_candles(symbol, interval='1m', store=None, batch_size=50000):
+    """
+    Append candles from the ohlcv_candle table to a symbol's price history.
+    Only candles newer than the history's last timestamp are read. Requires
+    an application context.
+
+    Returns:
+        Number of rows appended
+    """
+    from app.models.ohlcv_candle import OHLCVCandle
+
+    history = (store or PriceHistoryStore()).open(symbol)
+    last = history.last_timestamp()
+    appended = 0
+
+    while True:
+        query = OHLCVCandle.query.with_entities(
+            OHLCVCandle.open_time, OHLCVCandle.open, OHLCVCandle.high,
+            OHLCVCandle.low, OHLCVCandle.close, OHLCVCandle.volume
+        ).filter(
+            OHLCVCandle.symbol == history.symbol,
+            OHLCVCandle.interval == interval
+        )
+        if last is not None:
+            query = query.filter(OHLCVCandle.open_time > last)
+        rows = query.order_by(OHLCVCandle.open_time).limit(batch_size).all()
+        if not rows:
+            break
+
+        appended += history.append([[value or 0.0 for value in row] for row in rows])
+        last = rows[-1][0]
+        if len(rows) < batch_size:
+            break
+
+    logger.info(f"Imported {appended} {interval} candles into price history for {history.symbol}")
+    return appended
@@ -0,0 +1,288 @@
+# app/utils/price_oracle.py
+"""
+In-process price oracle.
+Holds the latest quote for every traded pair and refreshes all of them with a
+single batched request through the price sources (CoinGecko, failing over to
+Binance), so price lookups are answered from memory.
+"""
+import logging
+import threading
+import time
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+class PriceOracle:
+    """
+    Shared quote table for trading pairs (e.g., 'BTC/USDT').
+
+    Quotes are refreshed on a fixed cadence by a background thread. A quote
+    older than max_staleness is considered unusable and triggers a synchronous
+    refresh before it is served.
+    """
+
+    def __init__(self, refresh_interval=None, max_staleness=None, pairs=None, min_retry_interval=2.0):
+        self.refresh_interval = refresh_interval if refresh_interval is not None else Config.PRICE_ORACLE_REFRESH_INTERVAL
+        self.max_staleness = max_staleness if max_staleness is not None else Config.PRICE_ORACLE_MAX_STALENESS
+        self.min_retry_interval = min_retry_interval
+
+        self._pairs = set()
+        self._quotes = {}  # pair -> (price, timestamp)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self._last_refresh = 0
+        self._last_refresh_pairs = frozenset()
+        self._last_attempt = 0
+        self.refresh_count = 0
+        self.error_count = 0
+
+        self.track(pairs if pairs is not None else Config.PRICE_ORACLE_PAIRS)
+
+    @staticmethod
+    def normalize_pair(currency_pair):
+        """
+        Normalize a trading pair to 'BASE/QUOTE' upper case.
+
+        Returns:
+            Normalized pair or None if the format is invalid
+        """
+        if not isinstance(currency_pair, str):
+            return None
+        parts = currency_pair.upper().split('/')
+        if len(parts) != 2 or not parts[0] or not parts[1]:
+            return None
+        return f"{parts[0]}/{parts[1]}"
+
+    @staticmethod
+    def _vs_currency(quote_currency):
+        # CoinGecko uses USD as the equivalent of USDT
+        vs_currency = quote_currency.lower()
+        return 'usd' if vs_currency == 'usdt' else vs_currency
+
+    def track(self, pairs):
+        """
+        Add trading pairs to the set refreshed by the oracle.
+
+        Args:
+            pairs: Iterable of trading pairs
+
+        Returns:
+            Set of pairs that were not tracked before
+        """
+        new_pairs = set()
+        with self._lock:
+            for pair in pairs or []:
+                pair = self.normalize_pair(pair)
+                if pair and pair not in self._pairs:
+                    self._pairs.add(pair)
+                    new_pairs.add(pair)
+        return new_pairs
+
+    def refresh(self):
+        """
+        Refresh every tracked pair with one batched price-source request.
+
+        Concurrent callers are collapsed: a thread that waited for another
+        refresh which already covered all tracked pairs returns immediately.
+
+        Returns:
+            Boolean indicating success or failure
+        """
+        from app.utils.price_sources import price_router
+
+        started = time.time()
+        with self._refresh_lock:
+            with self._lock:
+                pairs = frozenset(self._pairs)
+            if self._last_refresh >= started and pairs <= self._last_refresh_pairs:
+                return True
+
+            self._last_attempt = time.time()
+            if not pairs:
+                return True
+
+            # Breakers and hedging across price sources bound how long this takes
+            try:
+                prices = price_router.get_prices(pairs)
+            except Exception as e:
+                self.error_count += 1
+                logger.error(f"Error refreshing price oracle: {str(e)}")
+                return False
+
+            now = time.time()
+            quotes = {pair: (price, now) for pair, price in prices.items()}
+
+            with self._lock:
+                self._quotes.update(quotes)
+
+            self._last_refresh = now
+            self._last_refresh_pairs = pairs
+            self.refresh_count += 1
+
+            missing = len(pairs) - len(quotes)
+            if missing:
+                logger.debug(f"Price oracle refresh returned no quote for {missing} of {len(pairs)} pairs")
+            return True
+
+    def apply_binance_prices(self, prices):
+        """
+        Update tracked pairs from streamed Binance prices ({'BTCUSDT': price}).
+
+        Returns:
+            Number of quotes updated
+        """
+        now = time.time()
+        updated = 0
+        with self._lock:
+            for pair in self._pairs:
+                base_currency, quote_currency = pair.split('/')
+                price = prices.get(f"{base_currency}{quote_currency}")
+                if price is not None and price > 0:
+                    self._quotes[pair] = (float(price), now)
+                    updated += 1
+        return updated
+
+    def get_quote(self, currency_pair):
+        """
+        Get the cached quote for a trading pair without touching the network.
+
+        Returns:
+            Dictionary with price, timestamp and age, or None if unknown
+        """
+        pair = self.normalize_pair(currency_pair)
+        quote = self._quotes.get(pair) if pair else None
+        if quote is None:
+            return None
+        price, timestamp = quote
+        return {
+            'pair': pair,
+            'price': price,
+            'timestamp': timestamp,
+            'age': time.time() - timestamp,
+            'stale': time.time() - timestamp > self.max_staleness
+        }
+
+    def quote_age(self, currency_pair):
+        """
+        Get the age of the cached quote in seconds, or None if unknown.
+        """
+        quote = self.get_quote(currency_pair)
+        return quote['age'] if quote else None
+
+    def is_stale(self, currency_pair):
+        """
+        Check whether the quote is missing or older than max_staleness.
+        """
+        age = self.quote_age(currency_pair)
+        return age is None or age > self.max_staleness
+
+    def get_current_prices(self, currency_pairs):
+        """
+        Get current prices for many trading pairs from memory.
+
+        Unknown pairs are added to the tracked set and all of them are fetched
+        with one refresh. Stale quotes are refreshed synchronously before
+        being served.
+
+        Args:
+            currency_pairs: Iterable of trading pairs (e.g., ['BTC/USDT', 'ETH/USDT'])
+
+        Returns:
+            Dictionary mapping each requested pair to its price (0 if no usable quote exists)
+        """
+        normalized = {}
+        for currency_pair in set(currency_pairs or []):
+            pair = self.normalize_pair(currency_pair)
+            if not pair:
+                logger.error(f"Invalid currency pair format: {currency_pair}")
+            normalized[currency_pair] = pair
+
+        valid_pairs = {pair for pair in normalized.values() if pair}
+        if valid_pairs:
+            self.ensure_started()
+
+            if self.track(valid_pairs):
+                self.refresh()
+            elif any(self.is_stale(pair) for pair in valid_pairs) and \
+                    time.time() - self._last_attempt >= self.min_retry_interval:
+                self.refresh()
+
+        prices = {}
+        for currency_pair, pair in normalized.items():
+            quote = self.get_quote(pair) if pair else None
+            prices[currency_pair] = quote['price'] if quote and not quote['stale'] else 0
+        return prices
+
+    def get_current_price(self, currency_pair):
+        """
+        Get the current price for a trading pair from memory.
+
+        Args:
+            currency_pair: Trading pair (e.g., 'BTC/USDT')
+
+        Returns:
+            Current price as a float or 0 if no usable quote exists
+        """
+        return self.get_current_prices([currency_pair]).get(currency_pair, 0)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Unexpected error in price oracle refresh loop: {str(e)}")
+            self._stop_event.wait(self.refresh_interval)
+
+    def ensure_started(self):
+        """
+        Start the background refresh thread if enabled and not yet running,
+        along with the Binance ticker stream that feeds it (if enabled).
+        """
+        from app.utils.binance_stream import start_ticker_stream
+        start_ticker_stream()
+
+        if not Config.PRICE_ORACLE_BACKGROUND_REFRESH:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='price-oracle', daemon=True)
+            self._thread.start()
+            logger.info(f"Price oracle started (refresh every {self.refresh_interval}s)")
+
+    def stop(self):
+        """
+        Stop the background refresh thread.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self):
+        """
+        Get oracle status for monitoring.
+
+        Returns:
+            Dictionary with tracked pair count, refresh counters and quote ages
+        """
+        now = time.time()
+        return {
+            'tracked_pairs': len(self._pairs),
+            'quoted_pairs': len(self._quotes),
+            'refresh_count': self.refresh_count,
+            'error_count': self.error_count,
+            'last_refresh_age': now - self._last_refresh if self._last_refresh else None,
+            'refresh_interval': self.refresh_interval,
+            'max_staleness': self.max_staleness,
+            'running': self._thread is not None and self._thread.is_alive()
+        }
+
+# Process-wide oracle instance
+price_oracle = PriceOracle()
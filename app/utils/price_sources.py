@@ -0,0 +1,370 @@
+# app/utils/price_sources.py
+"""
+Price sources with circuit breakers and hedged requests.
+CoinGecko and Binance are wrapped behind one fetch_prices(pairs) interface.
+Each source has a circuit breaker over its recent calls: when too many of
+them fail or are slower than the slow-call threshold it opens and the source
+is skipped, then after a cool-down a single half-open probe decides whether
+it closes again.
+
+The router asks the preferred healthy source first. If it hasn't answered
+within its own recent p95 latency, the next source is fired as well (a hedged
+request) and whichever answers first wins. Callers never wait longer than
+PRICE_SOURCE_TIMEOUT, so an upstream brownout costs a bounded delay instead
+of a blocked worker.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from app.config import Config
+from app.utils.http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+class PriceSourcesUnavailable(RuntimeError):
+    """No price source could answer."""
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker over a window of recent calls. A call
+    counts as failed if it raised or took longer than slow_call_seconds.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, window=None, min_calls=None, error_threshold=None,
+                 slow_call_seconds=None, open_seconds=None):
+        self.name = name
+        self.min_calls = min_calls if min_calls is not None else Config.BREAKER_MIN_CALLS
+        self.error_threshold = error_threshold if error_threshold is not None else Config.BREAKER_ERROR_THRESHOLD
+        self.slow_call_seconds = slow_call_seconds if slow_call_seconds is not None else Config.BREAKER_SLOW_CALL_SECONDS
+        self.open_seconds = open_seconds if open_seconds is not None else Config.BREAKER_OPEN_SECONDS
+
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.open_count = 0
+        self.rejected = 0
+        self._calls = deque(maxlen=window or Config.BREAKER_WINDOW)  # (ok, seconds, raised)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check whether a call may be made now. In the half-open state only one
+        probe is let through at a time.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.time() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                self.rejected += 1
+                return False
+            self._probing = True
+            return True
+
+    def record(self, success, seconds):
+        """
+        Record the outcome of a call.
+
+        Args:
+            success: Whether the call returned without raising
+            seconds: Call duration
+        """
+        ok = success and seconds <= self.slow_call_seconds
+        with self._lock:
+            self._calls.append((ok, seconds, not success))
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if ok:
+                    self.state = self.CLOSED
+                    self._calls.clear()
+                    logger.info(f"Circuit breaker {self.name} closed")
+                else:
+                    self._open()
+            elif self.state == self.CLOSED and len(self._calls) >= self.min_calls \
+                    and self._failure_rate() >= self.error_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.time()
+        self.open_count += 1
+        logger.warning(f"Circuit breaker {self.name} opened ({self._failure_rate():.0%} of recent calls failed or were slow)")
+
+    def _failure_rate(self):
+        if not self._calls:
+            return 0.0
+        return sum(1 for ok, _, _ in self._calls if not ok) / len(self._calls)
+
+    def latency_percentile(self, fraction=0.95):
+        """
+        Latency percentile of the successful calls in the window.
+
+        Returns:
+            Seconds, or None if there are none
+        """
+        with self._lock:
+            latencies = sorted(seconds for _, seconds, raised in self._calls if not raised)
+        if not latencies:
+            return None
+        return latencies[max(0, math.ceil(fraction * len(latencies)) - 1)]
+
+    def snapshot(self):
+        """
+        Breaker state for monitoring.
+        """
+        p95 = self.latency_percentile()
+        with self._lock:
+            calls = list(self._calls)
+            return {
+                'name': self.name,
+                'state': self.state,
+                'calls': len(calls),
+                'failure_rate': self._failure_rate(),
+                'errors': sum(1 for _, _, raised in calls if raised),
+                'slow_calls': sum(1 for _, seconds, raised in calls if not raised and seconds > self.slow_call_seconds),
+                'p95_seconds': p95,
+                'open_count': self.open_count,
+                'rejected': self.rejected,
+                'opened_at': self.opened_at,
+                'retry_in': max(0.0, self.open_seconds - (time.time() - self.opened_at))
+                            if self.state == self.OPEN else None
+            }
+
+class PriceSource:
+    """
+    A price upstream. Subclasses implement fetch_prices.
+    """
+    name = None
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(self.name)
+
+    def fetch_prices(self, pairs):
+        """
+        Fetch prices for normalized 'BASE/QUOTE' pairs.
+
+        Returns:
+            Dictionary mapping pair to price (pairs the source can't price are omitted)
+        """
+        raise NotImplementedError
+
+    def call(self, pairs):
+        """
+        fetch_prices with the outcome recorded in the breaker.
+        """
+        started = time.perf_counter()
+        success = False
+        try:
+            prices = self.fetch_prices(pairs)
+            success = True
+            return prices
+        finally:
+            self.breaker.record(success, time.perf_counter() - started)
+
+class CoinGeckoSource(PriceSource):
+    """
+    Batched /simple/price lookup.
+    """
+    name = 'coingecko'
+
+    def fetch_prices(self, pairs):
+        from app.utils.crypto_api import _get_coin_id, get_simple_prices
+        from app.utils.price_oracle import PriceOracle
+
+        pair_keys = {}
+        for pair in pairs:
+            base_currency, quote_currency = pair.split('/')
+            pair_keys[pair] = (_get_coin_id(base_currency), PriceOracle._vs_currency(quote_currency))
+
+        data = get_simple_prices(
+            sorted({coin_id for coin_id, _ in pair_keys.values()}),
+            sorted({vs_currency for _, vs_currency in pair_keys.values()})
+        )
+
+        prices = {}
+        for pair, (coin_id, vs_currency) in pair_keys.items():
+            price = data.get(coin_id, {}).get(vs_currency)
+            if price is not None and price > 0:
+                prices[pair] = float(price)
+        return prices
+
+class BinanceSource(PriceSource):
+    """
+    One bulk /ticker/price request; pairs are priced directly or inverted.
+    """
+    name = 'binance'
+
+    def fetch_prices(self, pairs):
+        from app.utils.binance_api import BINANCE_API_URL
+
+        response = http_client.get(f"{BINANCE_API_URL}/ticker/price")
+        response.raise_for_status()
+        tickers = {item['symbol']: float(item['price']) for item in response.json()}
+
+        prices = {}
+        for pair in pairs:
+            base_currency, quote_currency = pair.split('/')
+            # Binance has no USD book; USDT stands in for it
+            quote_currency = 'USDT' if quote_currency == 'USD' else quote_currency
+            direct = tickers.get(f"{base_currency}{quote_currency}")
+            inverse = tickers.get(f"{quote_currency}{base_currency}")
+            if direct and direct > 0:
+                prices[pair] = direct
+            elif inverse and inverse > 0:
+                prices[pair] = 1.0 / inverse
+        return prices
+
+SOURCE_TYPES = {
+    CoinGeckoSource.name: CoinGeckoSource,
+    BinanceSource.name: BinanceSource
+}
+
+class PriceRouter:
+    """
+    Routes price lookups across sources in preference order with breakers,
+    hedging and a hard deadline.
+    """
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+        self.requests = 0
+        self.hedged = 0
+        self.failovers = 0
+        self.wins = {source.name: 0 for source in self.sources}
+        self._executor = ThreadPoolExecutor(max_workers=Config.PRICE_SOURCE_WORKERS, thread_name_prefix='price-source')
+
+    def hedge_delay(self, source):
+        """
+        How long to wait for a source before hedging: its recent p95 latency.
+        """
+        p95 = source.breaker.latency_percentile()
+        if p95 is None:
+            return Config.PRICE_HEDGE_DELAY
+        return min(max(p95, Config.PRICE_HEDGE_MIN_DELAY), Config.PRICE_SOURCE_TIMEOUT)
+
+    def get_prices(self, pairs, timeout=None):
+        """
+        Get prices for normalized pairs from the first source to answer.
+        Pairs the winning source can't price are asked of the next source.
+
+        Args:
+            pairs: Iterable of 'BASE/QUOTE' pairs
+            timeout: Maximum seconds to wait (defaults to PRICE_SOURCE_TIMEOUT)
+
+        Returns:
+            Dictionary mapping pair to price
+
+        Raises:
+            PriceSourcesUnavailable: If no source answered in time
+        """
+        remaining = sorted(set(pairs))
+        if not remaining:
+            return {}
+        self.requests += 1
+        deadline = time.monotonic() + (timeout or Config.PRICE_SOURCE_TIMEOUT)
+
+        prices = {}
+        answered = False
+        candidates = list(self.sources)
+        while remaining and candidates and time.monotonic() < deadline:
+            result, candidates = self._race(remaining, candidates, deadline)
+            if result is None:
+                break
+            answered = True
+            prices.update(result)
+            remaining = [pair for pair in remaining if pair not in prices]
+
+        if not answered:
+            raise PriceSourcesUnavailable(f"No price source answered for {len(remaining)} pairs")
+        return prices
+
+    def _race(self, pairs, candidates, deadline):
+        """
+        Ask candidates in order, hedging each one after its p95 latency.
+
+        Returns:
+            Tuple of (prices from the first source to answer or None,
+            candidates not yet asked)
+        """
+        in_flight = {}
+        candidates = list(candidates)
+
+        def launch():
+            while candidates:
+                source = candidates.pop(0)
+                if source.breaker.allow():
+                    in_flight[self._executor.submit(source.call, pairs)] = source
+                    return source
+            return None
+
+        current = launch()
+        if current is None:
+            return None, candidates
+
+        while in_flight:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            # Wait for the newest source's p95, then hedge with the next one
+            wait_for = deadline - now
+            if candidates:
+                wait_for = min(wait_for, self.hedge_delay(current))
+            done, _ = wait(in_flight, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                source = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"Price source {source.name} failed: {str(e)}")
+                    self.failovers += 1
+                    continue
+                self.wins[source.name] += 1
+                return result, candidates
+
+            if not done and candidates:
+                hedge = launch()
+                if hedge is not None:
+                    self.hedged += 1
+                    current = hedge
+            elif not in_flight:
+                # Everything in flight failed; fail over straight away
+                current = launch()
+
+        return None, candidates
+
+    def stats(self):
+        """
+        Router counters and every source's breaker state.
+        """
+        return {
+            'requests': self.requests,
+            'hedged': self.hedged,
+            'failovers': self.failovers,
+            'wins': dict(self.wins),
+            'sources': [source.breaker.snapshot() for source in self.sources]
+        }
+
+def _build_router():
+    sources = []
+    for name in Config.PRICE_SOURCES:
+        source_type = SOURCE_TYPES.get(name.strip().lower())
+        if source_type is None:
+            logger.error(f"Unknown price source '{name}' in PRICE_SOURCES")
+            continue
+        sources.append(source_type())
+    return PriceRouter(sources or [CoinGeckoSource()])
+
+# Process-wide router
+price_router = _build_router()
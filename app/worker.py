@@ -0,0 +1,293 @@
+# app/worker.py
+"""
+Background job scheduler.
+Runs order matching, signal resolution, price-cache warming, referral reward
+reconciliation, candle flushing and ledger reconciliation on configurable intervals so they no
+longer piggyback on user requests. Each job takes a database lease lock, so only one worker runs it at
+a time across replicas.
+
+Usage:
+    python -m app.worker
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app import create_app, db
+from app.config import Config
+from app.models.job_lock import JobLock
+
+logger = logging.getLogger(__name__)
+
+def acquire_lock(name, owner, ttl):
+    """
+    Acquire the lease lock for a job.
+
+    Args:
+        name: Job name
+        owner: Identifier of this worker process
+        ttl: Lease length in seconds
+
+    Returns:
+        Boolean indicating whether the lock was acquired
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl)
+
+    try:
+        # Take over a free or expired lease (or renew our own)
+        updated = JobLock.query.filter(
+            JobLock.name == name,
+            (JobLock.expires_at <= now) | (JobLock.owner == owner)
+        ).update({
+            'owner': owner,
+            'expires_at': expires_at,
+            'last_started_at': now
+        }, synchronize_session=False)
+
+        if updated:
+            db.session.commit()
+            return True
+
+        if JobLock.query.filter_by(name=name).first() is not None:
+            # Another worker holds the lease
+            db.session.rollback()
+            return False
+
+        db.session.add(JobLock(name=name, owner=owner, expires_at=expires_at, last_started_at=now))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        # Another worker created the lock row first
+        db.session.rollback()
+        return False
+
+def release_lock(name, owner, duration=None):
+    """
+    Release the lease lock for a job and record its last run.
+
+    Args:
+        name: Job name
+        owner: Identifier of this worker process
+        duration: Duration of the run in seconds
+    """
+    now = datetime.utcnow()
+    try:
+        JobLock.query.filter_by(name=name, owner=owner).update({
+            'owner': None,
+            'expires_at': now,
+            'last_finished_at': now,
+            'last_duration': duration
+        }, synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error releasing lock for job {name}: {str(e)}")
+
+class Job:
+    """
+    A function run on a fixed interval with random jitter. Jobs sharing a
+    lock_name never run at the same time across replicas.
+    """
+
+    def __init__(self, name, func, interval, jitter=None, lock_ttl=None, lock_name=None):
+        self.name = name
+        self.lock_name = lock_name or name
+        self.func = func
+        self.interval = interval
+        self.jitter = Config.WORKER_JITTER if jitter is None else jitter
+        self.lock_ttl = lock_ttl or Config.WORKER_LOCK_TTL
+
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration = None
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.last_run_at = None
+        self.last_result = None
+
+        # Spread the first runs so replicas don't start in lockstep
+        self.next_run = time.time() + random.uniform(0, self.interval * self.jitter)
+
+    def schedule_next(self, now=None):
+        now = now or time.time()
+        spread = self.interval * self.jitter
+        self.next_run = now + max(0.0, self.interval + random.uniform(-spread, spread))
+
+    def record(self, duration, result=None, failed=False):
+        self.runs += 1
+        if failed:
+            self.failures += 1
+        self.last_duration = duration
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        self.last_run_at = time.time()
+        self.last_result = result
+
+    def metrics(self):
+        return {
+            'interval': self.interval,
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'last_duration': self.last_duration,
+            'avg_duration': self.total_duration / self.runs if self.runs else None,
+            'max_duration': self.max_duration,
+            'last_run_at': self.last_run_at,
+            'next_run_in': max(0.0, self.next_run - time.time())
+        }
+
+class Scheduler:
+    """
+    Runs due jobs inside the Flask application context.
+    """
+
+    def __init__(self, app, jobs=None, metrics_log_interval=300):
+        self.app = app
+        self.jobs = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.metrics_log_interval = metrics_log_interval
+        self._stop_event = threading.Event()
+        self._last_metrics_log = time.time()
+
+        for job in jobs or []:
+            self.add_job(job)
+
+    def add_job(self, job):
+        self.jobs[job.name] = job
+        return job
+
+    def run_job(self, job):
+        """
+        Run one job if its lock can be taken, recording its duration.
+
+        Returns:
+            Boolean indicating whether the job ran
+        """
+        with self.app.app_context():
+            try:
+                if not acquire_lock(job.lock_name, self.owner, job.lock_ttl):
+                    job.skipped += 1
+                    logger.debug(f"Job {job.name} skipped: lock held by another worker")
+                    return False
+
+                started = time.perf_counter()
+                failed = False
+                result = None
+                try:
+                    result = job.func()
+                except Exception as e:
+                    failed = True
+                    db.session.rollback()
+                    logger.error(f"Job {job.name} failed: {str(e)}")
+
+                duration = time.perf_counter() - started
+                job.record(duration, result, failed)
+                release_lock(job.lock_name, self.owner, duration)
+
+                logger.debug(f"Job {job.name} finished in {duration:.3f}s")
+                if duration > job.interval:
+                    logger.warning(f"Job {job.name} took {duration:.1f}s, longer than its {job.interval}s interval")
+                return True
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error running job {job.name}: {str(e)}")
+                return False
+            finally:
+                db.session.remove()
+
+    def run_pending(self):
+        """
+        Run every job that is due.
+        """
+        for job in self.jobs.values():
+            if self._stop_event.is_set():
+                break
+            if time.time() >= job.next_run:
+                self.run_job(job)
+                job.schedule_next()
+
+    def metrics(self):
+        return {name: job.metrics() for name, job in self.jobs.items()}
+
+    def log_metrics(self):
+        for name, job in self.jobs.items():
+            metrics = job.metrics()
+            if metrics['runs']:
+                logger.info(
+                    f"Job {name}: {metrics['runs']} runs, {metrics['failures']} failures, "
+                    f"{metrics['skipped']} skipped, avg {metrics['avg_duration']:.3f}s, max {metrics['max_duration']:.3f}s"
+                )
+
+    def run_forever(self):
+        """
+        Run jobs until stop() is called.
+        """
+        logger.info(f"Worker {self.owner} started with jobs: {', '.join(self.jobs)}")
+        while not self._stop_event.is_set():
+            self.run_pending()
+
+            if time.time() - self._last_metrics_log >= self.metrics_log_interval:
+                self.log_metrics()
+                self._last_metrics_log = time.time()
+
+            next_due = min((job.next_run for job in self.jobs.values()), default=time.time() + 1)
+            self._stop_event.wait(min(1.0, max(0.0, next_due - time.time())))
+
+        self.log_metrics()
+        logger.info(f"Worker {self.owner} stopped")
+
+    def stop(self, *args):
+        self._stop_event.set()
+
+def default_jobs():
+    """
+    Build the standard job set from Config intervals.
+    """
+    from app.services.candle_aggregator import flush_candles
+    from app.services.ledger_service import reconcile_wallets
+    from app.services.market_service import warm_price_cache
+    from app.services.matching_engine import process_price_ticks
+    from app.services.order_service import process_open_orders
+    from app.services.referral_service import reconcile_referral_rewards
+    from app.services.signal_engine import resolve_signals
+
+    return [
+        # Tick matching and the full sweep both fill orders; one lease covers both
+        Job('order_ticks', process_price_ticks, Config.WORKER_ORDER_TICK_INTERVAL, lock_name='order_matching'),
+        Job('order_sweep', process_open_orders, Config.WORKER_ORDER_SWEEP_INTERVAL, lock_name='order_matching'),
+        Job('signal_resolution', resolve_signals, Config.WORKER_SIGNAL_RESOLUTION_INTERVAL),
+        Job('price_warm', warm_price_cache, Config.WORKER_PRICE_WARM_INTERVAL),
+        Job('referral_reconcile', reconcile_referral_rewards, Config.WORKER_REFERRAL_RECONCILE_INTERVAL),
+        Job('candle_flush', flush_candles, Config.CANDLE_FLUSH_INTERVAL),
+        Job('ledger_reconcile', reconcile_wallets, Config.WORKER_LEDGER_RECONCILE_INTERVAL)
+    ]
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+
+    # Real-time prices for order matching when the Binance stream is enabled
+    from app.utils.binance_stream import start_ticker_stream
+    start_ticker_stream()
+    
+    # Intraday candles built from ticks, flushed by the candle_flush job
+    from app.services.candle_aggregator import start_candle_aggregator
+    start_candle_aggregator()
+
+    scheduler = Scheduler(app, default_jobs())
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.run_forever()
+
+if __name__ == '__main__':
+    main()
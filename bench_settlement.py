@@ -0,0 +1,108 @@
+# bench_settlement.py
+"""
+Signal settlement benchmark.
+Builds a throwaway SQLite database with one signal followed by N users and
+settles it through admin_service.update_signal_result, then checks that a
+loss larger than 100% only forfeits the stake.
+
+    python bench_settlement.py                     # 50k positions
+    python bench_settlement.py --positions 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+def add_signal(db, followers):
+    from app.models.trade_signal import TradeSignal, TradePosition
+
+    signal = TradeSignal(
+        admin_id=1, currency_pair='BTC/USDT', signal_type='buy', entry_price=100.0,
+        target_price=110.0, stop_loss=95.0, leverage=1,
+        expiry_time=datetime.utcnow() + timedelta(days=1)
+    )
+    db.session.add(signal)
+    db.session.flush()
+
+    db.session.bulk_insert_mappings(TradePosition, [{
+        'user_id': user_id, 'signal_id': signal.id, 'amount': 50.0,
+        'entry_price': 100.0, 'status': 'open'
+    } for user_id in followers])
+    db.session.commit()
+    return signal.id
+
+def build_fixture(db, positions):
+    from app.models.user import User
+    from app.models.wallet import Wallet
+
+    db.session.bulk_insert_mappings(User, [{
+        'unique_id': f"B{user_id:09d}",
+        'username': f"bench{user_id}",
+        'email': f"bench{user_id}@example.com",
+        'phone': f"+{user_id:012d}",
+        'password_hash': 'x',
+        'referral_code': f"R{user_id:09d}"
+    } for user_id in range(1, positions + 1)])
+
+    # Every tenth follower has no USDT wallet yet
+    db.session.bulk_insert_mappings(Wallet, [{
+        'user_id': user_id, 'currency': 'USDT', 'spot_balance': 0.0,
+        'funding_balance': 0.0, 'futures_balance': 100.0
+    } for user_id in range(1, positions + 1) if user_id % 10])
+
+    return add_signal(db, range(1, positions + 1))
+
+def run(positions):
+    path = os.path.join(tempfile.mkdtemp(prefix='settlement_'), 'bench.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+
+    from app import create_app, db
+    from app.models.trade_signal import TradePosition
+    from app.models.transaction import Transaction
+    from app.models.wallet import Wallet
+    from app.services.admin_service import update_signal_result
+    from app.services.ledger_service import reconcile_wallets, trial_balance
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        signal_id = build_fixture(db, positions)
+        print(f"Built {positions:,} open positions in {time.perf_counter() - started:.2f}s")
+
+        # Open ledger accounts for the fixture's wallets so only settlement is timed
+        started = time.perf_counter()
+        reconcile_wallets()
+        print(f"Opened ledger balances in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        success, message = update_signal_result(signal_id, 'profit', 10)
+        duration = time.perf_counter() - started
+        print(f"{message} Settled in {duration:.2f}s ({positions / duration:,.0f} positions/s)")
+
+        # 50 stake + 5 profit per follower on top of any existing balance
+        total = db.session.query(db.func.sum(Wallet.futures_balance)).scalar()
+        expected = positions * 55.0 + (positions - positions // 10) * 100.0
+        ledger = Transaction.query.filter_by(transaction_type='signal_settlement').count()
+        print(f"Futures balances: {total:,.2f} (expected {expected:,.2f}), transactions: {ledger:,}, "
+              f"trial balance: {trial_balance()}")
+
+        # A 150% loss settles at -100%: the stake is lost, nothing more
+        followers = range(1, min(positions, 1000) + 1)
+        signal_id = add_signal(db, followers)
+        before = db.session.query(db.func.sum(Wallet.futures_balance)).scalar()
+        update_signal_result(signal_id, 'loss', 150)
+        after = db.session.query(db.func.sum(Wallet.futures_balance)).scalar()
+        lost = db.session.query(db.func.sum(TradePosition.profit_loss)).filter(
+            TradePosition.signal_id == signal_id).scalar()
+        assert after == before and lost == -50 * len(followers), (before, after, lost)
+        print(f"150% loss on {len(followers):,} positions: {lost:,.2f} P/L, futures balances unchanged")
+
+    os.remove(path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark set-based signal settlement')
+    parser.add_argument('--positions', type=int, default=50000)
+    args = parser.parse_args()
+    run(args.positions)
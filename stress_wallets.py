@@ -0,0 +1,140 @@
+# stress_wallets.py
+"""
+Wallet concurrency stress test.
+Hammers one wallet from many threads with credits, debits, transfers between
+its spot and futures balances and payments to a second user, then checks
+that the balances match the successful operations exactly and that the
+ledger replays cleanly.
+
+    python stress_wallets.py                           # 16 threads x 100 operations
+    python stress_wallets.py --threads 32 --operations 500
+    DATABASE_URL=postgresql://... python stress_wallets.py   # against a real server
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+class ConflictCounter(logging.Handler):
+    """Counts retried conflicts logged by ledger_service.atomic."""
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record):
+        if 'conflicted' in record.getMessage():
+            self.count += 1
+
+def worker(app, seed, operations, results):
+    from app.services.wallet_service import add_balance, subtract_balance, transfer_balance
+
+    rng = random.Random(seed)
+    done = Counter()
+    with app.app_context():
+        for _ in range(operations):
+            operation = rng.choice(('credit', 'debit', 'to_futures', 'to_spot', 'pay'))
+            try:
+                if operation == 'credit':
+                    add_balance(1, 'USDT', 3)
+                    done['credit'] += 1
+                elif operation == 'debit':
+                    success, message, wallet = subtract_balance(1, 'USDT', 2)
+                    done['debit' if success else 'debit_refused'] += 1
+                elif operation == 'to_futures':
+                    success, message = transfer_balance(1, 1, 'USDT', 1, 'spot', 'futures')
+                    done['to_futures' if success else 'transfer_refused'] += 1
+                elif operation == 'to_spot':
+                    success, message = transfer_balance(1, 1, 'USDT', 1, 'futures', 'spot')
+                    done['to_spot' if success else 'transfer_refused'] += 1
+                else:
+                    success, message = transfer_balance(1, 2, 'USDT', 1)
+                    done['pay' if success else 'pay_refused'] += 1
+            except Exception as e:
+                done['failed'] += 1
+                print(f"{operation} failed: {e}", file=sys.stderr)
+    results.append(done)
+
+def run(threads, operations):
+    if 'DATABASE_URL' not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix='stress_'), 'stress.db')
+        os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+    else:
+        path = None
+
+    from app import create_app, db
+    from app.models.ledger import LedgerAccount
+    from app.models.user import User
+    from app.models.wallet import Wallet
+    from app.services.ledger_service import get_balance, trial_balance, verify_account
+
+    conflicts = ConflictCounter()
+    logging.getLogger('app.services.ledger_service').addHandler(conflicts)
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.bulk_insert_mappings(User, [{
+            'unique_id': f"S{user_id:09d}",
+            'username': f"stress{user_id}",
+            'email': f"stress{user_id}@example.com",
+            'phone': f"+{user_id:012d}",
+            'password_hash': 'x',
+            'referral_code': f"T{user_id:09d}"
+        } for user_id in (1, 2)])
+        db.session.commit()
+
+    results = []
+    pool = [
+        threading.Thread(target=worker, args=(app, seed, operations, results))
+        for seed in range(threads)
+    ]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    done = sum(results, Counter())
+    print(f"{threads} threads x {operations} operations in {duration:.2f}s "
+          f"({threads * operations / duration:,.0f} ops/s), {conflicts.count} conflicts retried")
+    print(f"Operations: {dict(sorted(done.items()))}")
+
+    expected_spot = Decimal(3 * done['credit'] - 2 * done['debit'] - done['to_futures'] + done['to_spot'] - done['pay'])
+    expected_futures = Decimal(done['to_futures'] - done['to_spot'])
+    expected_payee = Decimal(done['pay'])
+
+    with app.app_context():
+        wallet = Wallet.query.filter_by(user_id=1, currency='USDT').one()
+        payee = Wallet.query.filter_by(user_id=2, currency='USDT').first()
+        checks = {
+            'spot wallet': (Decimal(str(wallet.spot_balance)), expected_spot),
+            'futures wallet': (Decimal(str(wallet.futures_balance)), expected_futures),
+            'payee wallet': (Decimal(str(payee.spot_balance if payee else 0)), expected_payee),
+            'spot account': (get_balance(1, 'USDT', 'spot'), expected_spot),
+            'futures account': (get_balance(1, 'USDT', 'futures'), expected_futures),
+        }
+        problems = [f"{name}: {actual} != {expected}" for name, (actual, expected) in checks.items() if actual != expected]
+        problems += [problem for account_id, in db.session.query(LedgerAccount.id).all() for problem in verify_account(account_id)]
+        problems += [f"trial balance {currency}: {total}" for currency, total in trial_balance().items() if total]
+        problems += ["operations failed"] if done['failed'] else []
+
+        print(f"Spot {wallet.spot_balance}, futures {wallet.futures_balance}, wallet version {wallet.version}")
+        print("OK: balances exact and ledger consistent" if not problems else "FAILED:\n  " + "\n  ".join(problems))
+
+    if path:
+        os.remove(path)
+    return not problems
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Hammer one wallet from many threads')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--operations', type=int, default=100)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.threads, args.operations) else 1)
@@ -0,0 +1,110 @@
+# upgrade_schema.py
+"""
+Schema upgrade for existing databases.
+db.create_all() only creates missing tables; it never alters one that already
+exists. This script creates any new tables and then brings older tables up to
+the current models:
+
+    wallet.version    INTEGER NOT NULL DEFAULT 1 (optimistic locking counter)
+    money columns     FLOAT -> NUMERIC(28, 8) on wallet, transaction, order,
+                      trade_position and referral_reward
+
+Existing amounts are rounded to 8 places (the Money scale) before their
+column type changes.
+
+Every step checks the live schema first, so running it again is a no-op.
+Changes go through Alembic's batch mode (shipped with Flask-Migrate): SQLite
+tables are rebuilt where SQLite can't alter them, other databases are
+altered in place. Stop the web and worker processes before upgrading.
+
+    python upgrade_schema.py               # apply
+    python upgrade_schema.py --dry-run     # list the pending changes only
+"""
+import argparse
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import Column, Integer, Numeric, inspect, update
+from app.utils.money import SCALE, Money
+
+def add_wallet_version(op, dry_run):
+    """
+    Add wallet.version; existing wallets start at version 1.
+    """
+    columns = {column['name'] for column in inspect(op.get_bind()).get_columns('wallet')}
+    if 'version' in columns:
+        return []
+
+    if not dry_run:
+        with op.batch_alter_table('wallet') as batch:
+            batch.add_column(Column('version', Integer, nullable=False, server_default='1'))
+    return ['wallet.version INTEGER NOT NULL DEFAULT 1']
+
+def convert_money_columns(op, dry_run):
+    """
+    Convert every Money column still stored as a float to NUMERIC(28, 8).
+    """
+    from app import db
+
+    inspector = inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+    changes = []
+    for table in db.metadata.sorted_tables:
+        money = [column.name for column in table.columns if isinstance(column.type, Money)]
+        if not money or table.name not in existing_tables:
+            continue
+
+        reflected = {column['name']: column for column in inspector.get_columns(table.name)}
+        pending = [
+            reflected[name] for name in money
+            if name in reflected and not (isinstance(reflected[name]['type'], Numeric)
+                                          and reflected[name]['type'].scale == SCALE)
+        ]
+        if not pending:
+            continue
+
+        changes.extend(f"{table.name}.{column['name']} {column['type']} -> NUMERIC(28, {SCALE})" for column in pending)
+        if dry_run:
+            continue
+
+        # Drop float noise first so the stored values match what Money writes;
+        # updated_at is kept, the rows' contents don't change
+        rounded = {column['name']: db.func.round(table.c[column['name']], SCALE) for column in pending}
+        if 'updated_at' in table.c and 'updated_at' in reflected:
+            rounded['updated_at'] = table.c.updated_at
+        op.execute(update(table).values(rounded))
+        with op.batch_alter_table(table.name) as batch:
+            for column in pending:
+                batch.alter_column(
+                    column['name'],
+                    type_=Numeric(28, SCALE),
+                    existing_type=column['type'],
+                    existing_nullable=column['nullable'],
+                    existing_server_default=column['default']
+                )
+    return changes
+
+STEPS = [add_wallet_version, convert_money_columns]
+
+def run(dry_run):
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        if not dry_run:
+            db.create_all()
+
+        changes = []
+        with db.engine.begin() as connection:
+            op = Operations(MigrationContext.configure(connection))
+            for step in STEPS:
+                changes.extend(step(op, dry_run))
+
+        for change in changes:
+            print(f"{'Pending' if dry_run else 'Applied'}: {change}")
+        print(f"{len(changes)} change(s) {'pending' if dry_run else 'applied'}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Upgrade an existing database to the current models')
+    parser.add_argument('--dry-run', action='store_true', help='only list the pending changes')
+    args = parser.parse_args()
+    run(args.dry_run)